@@ -2,8 +2,23 @@ import threading
 import json
 import os
 import traceback
-from openai import OpenAI
 from config import *
+import memory_store
+from tariff import tariff
+from message_bus import message_bus
+from lesson_index import get_lesson_index, situation_tokens, tokenize, format_lesson
+from json_stream import JsonObjectStream
+
+# openai 连同其 HTTP 栈导入要 ~0.5s，推迟到第一次调用 LLM 时；测试 / 基准可直接替换这个名字
+OpenAI = None
+_client_lock = threading.Lock()
+
+def _openai_class():
+    global OpenAI
+    if OpenAI is None:
+        from openai import OpenAI as cls
+        OpenAI = cls
+    return OpenAI
 
 # ==============================================================================
 # 🛠️ 全局共享状态 (食物)
@@ -55,6 +70,9 @@ You are {name}, the {role}.
 
 **YESTERDAY'S LESSON**: "{daily_rule}"
 
+[RELEVANT PAST LESSONS]
+{past_lessons}
+
 [URGENT WASTE ALERT]
 **{waste_alert}**
 (If you see a room named here, you MUST go there and turn OFF the AC immediately! It is wasting huge money!)
@@ -82,7 +100,8 @@ Food in Kitchen: {food_info}
 - [Cook]: (Parents Only). Adds 3 food. (Must be in Kitchen).
 - [Adjust_Clothing]: Target "0.3" to "1.5".
 - [Adjust_AC]: Target "RoomName:Temp" or "RoomName:0" (to turn off).
-- [Chat]: Target "Name", Content "Msg".
+- [Optimize_AC]: Let the planner schedule every room's AC for the rest of the day (uses the price schedule, weather forecast and family routine). Any later [Adjust_AC] overrides it for that room.
+- [Chat]: Target "Name", a room name (everyone in that room), "Nearby" (everyone within earshot) or "Everyone" (whole family); put the text in "message".
 - [Move_To]: Target "Room".
 - [Watch_TV]: Target "Sofa".
 - [Play]: Target "ToyBox".
@@ -92,7 +111,7 @@ Food in Kitchen: {food_info}
 ⚠️ DO NOT just "think". OUTPUT THE ACTION.
 - CORRECT: {{ "action": "Cook", "thought": "Cooking now!" }}
 - IF you want to Cook but are not in Kitchen, OUTPUT "Cook" ANYWAY.
-- IF you want to Chat, you must be close to them, or [Move_To] them first.
+- IF you want to Chat with one person, you must be close to them, or [Move_To] them first. Room, "Nearby" and "Everyone" messages need no walking.
 
 [DECISION LOGIC]
 1. **WASTE CHECK**: Is there a WASTE ALERT? If yes, fix it NOW.
@@ -100,7 +119,7 @@ Food in Kitchen: {food_info}
    - If Food=0 and you are Parent: [Cook].
    - If Food=0 and you are Son: Find Mom/Dad and [Chat] "I am hungry".
 3. **WALLET CHECK**: Look at "Spending Sensation". Only react if it says "Above Tolerance" or "BANKRUPT".
-4. **COMFORT CHECK**: If Sensation is NOT "Neutral", adjust AC.
+4. **COMFORT CHECK**: If Sensation is NOT "Neutral", adjust AC. Prefer one [Optimize_AC] over many [Adjust_AC] guesses.
 
 Output JSON: {{"action": "...", "target": "...", "thought": "...", "message": "..."}}
 """
@@ -147,89 +166,74 @@ class AgentBrain:
     def __init__(self, name, role):
         self.name = name
         self.role = role
-        try:
-            self.client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
-        except:
-            self.client = None
-            print(f"Warning: OpenAI client init failed for {name}")
+        self._client = None; self._client_ready = False
 
         self.incoming_messages = []
         self.last_thought = ""
         self.daily_rule = "Balance comfort and cost." 
-        self.memory_file = f"memory_{self.name}.json"
         self.load_memories()
 
+    @property
+    def client(self):
+        """第一次用到时才创建 OpenAI 客户端"""
+        if not self._client_ready:
+            with _client_lock:
+                if not self._client_ready:
+                    try:
+                        self._client = _openai_class()(api_key=API_KEY, base_url=BASE_URL)
+                    except:
+                        self._client = None
+                        print(f"Warning: OpenAI client init failed for {self.name}")
+                    self._client_ready = True
+        return self._client
+
     def load_memories(self):
-        if os.path.exists(self.memory_file):
-            try:
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.daily_rule = data.get("last_rule", self.daily_rule)
-            except Exception as e:
-                print(f"Load Memory Error: {e}")
+        # 第一次读取后由 memory_store 常驻缓存，不会每天重新读盘
+        try:
+            self.daily_rule = memory_store.memory_store.latest_rule(self.name, self.daily_rule)
+        except Exception as e:
+            print(f"Load Memory Error: {e}")
     
+    @property
+    def incoming_messages(self):
+        """收件箱在 message_bus 里 (定长环形缓冲)，这里是只读快照"""
+        return message_bus.inbox(self.name)
+
+    @incoming_messages.setter
+    def incoming_messages(self, msgs): message_bus.replace(self.name, msgs)
+
     def reset_daily_memory(self):
         self.incoming_messages = []
         self.last_thought = "Waking up..."
         self.load_memories()
 
-    def save_memories(self, new_rule):
+    def save_memories(self, new_rule, day=None, bill=None, discomfort=None, meta=None):
         self.daily_rule = new_rule
-        data = {"last_rule": new_rule}
         try:
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-        except: pass
+            memory_store.memory_store.append_rule(self.name, new_rule, day=day, bill=bill, discomfort=discomfort, meta=meta)
+        except Exception as e:
+            print(f"Save Memory Error ({self.name}): {e}")
 
     def receive_message(self, sender, content):
-        msg = f"From {sender}: {content}"
-        self.incoming_messages.append(msg)
-        if len(self.incoming_messages) > 3:
-            self.incoming_messages.pop(0)
-
-    def reflect_and_plan(self, total_bill, avg_discomfort, waste_report, hourly_logs):
-        if not self.client: return
+        message_bus.send(sender, self.name, content)
 
-        expensive_hours = sorted(hourly_logs, key=lambda x: x['cost'], reverse=True)
-        max_cost_hour = expensive_hours[0] if expensive_hours else {'hour': 12, 'cost': 0}
-        
-        uncomfortable_hours = sorted(hourly_logs, key=lambda x: abs(x['avg_pmv']), reverse=True)
-        max_discomfort_hour = uncomfortable_hours[0] if uncomfortable_hours else {'hour': 12, 'avg_pmv': 0}
-        
-        cost_issue = f"High Cost at {max_cost_hour['hour']}:00 (${max_cost_hour['cost']:.2f})."
-        
-        pmv_val = max_discomfort_hour['avg_pmv']
-        sensation = "Neutral"
-        if pmv_val > 1.5: sensation = "TOO HOT"
-        elif pmv_val < -1.5: sensation = "TOO COLD"
-        comfort_issue = f"Worst Comfort at {max_discomfort_hour['hour']}:00 ({sensation}, PMV={pmv_val:.1f})."
-
-        # 🔥🔥🔥 WASTE ANALYSIS & PENALTY CALCULATION 🔥🔥🔥
-        waste_penalty_section = ""
-        total_waste_score = sum(waste_report.values())
-        
-        if total_waste_score > 1.0: # 只有当浪费值超过一定阈值才触发严重惩罚
-            waste_rooms = [r for r, s in waste_report.items() if s > 0.5]
-            waste_str = ", ".join(waste_rooms)
-            waste_penalty_section = f"""
-####################################################################
-[⚠️ CRITICAL WASTE PENALTY ⚠️]
-VIOLATION DETECTED: Air Conditioners were left running in EMPTY rooms!
-Locations: {waste_str}
-Result: A HUGE 'Virtual Fine' has been applied to your conscience.
-CAUSE: You left the room without turning off the AC.
-####################################################################
-"""
-        else:
-            waste_penalty_section = "[Waste Check] Good job. No empty rooms were cooled unnecessarily."
+    def recall_lessons(self, query_tokens):
+        """从历史经验中检索与当前情境最相关的 top-k 条 (不含昨天那条)"""
+        try:
+            recs = get_lesson_index(self.name).search(query_tokens, LESSON_TOP_K, exclude_rule=self.daily_rule)
+        except Exception as e:
+            print(f"Recall Error ({self.name}): {e}")
+            recs = []
+        return "\n".join(format_lesson(r) for r in recs) if recs else "None yet."
 
-        # 动态调整反思逻辑中的权重影响
-        w = COMFORT_VS_COST_WEIGHT
-        weight_guide = ""
-        if w >= 0.8:
-            weight_guide = "Since Weight > 0.8, IGNORE Cost issues unless we are totally bankrupt. FOCUS ON COMFORT."
-        elif w <= 0.2:
-            weight_guide = "Since Weight < 0.2, IGNORE Comfort issues. FOCUS ON SAVING MONEY."
+    def reflect_and_plan(self, summary):
+        """summary 来自 reflection.summarize_day (全家共用，只算一次)"""
+        if not self.client: return
+        total_bill = summary["total_bill"]
+        cost_issue = summary["cost_issue"]; comfort_issue = summary["comfort_issue"]
+        weight_guide = summary["weight_guide"]; waste_penalty_section = summary["waste_penalty_section"]
+        counterfactuals = summary.get("counterfactual_section", "No what-if data.")
+        past_lessons = self.recall_lessons(summary["lesson_query"])
 
         reflection_prompt = f"""
 [REFLECTION TASK]
@@ -244,6 +248,12 @@ Cost vs Comfort Weight: {COMFORT_VS_COST_WEIGHT} (0=Saver, 1=Comfort).
 1. {cost_issue}
 2. {comfort_issue}
 
+[RELEVANT PAST LESSONS] (what you tried on similar days)
+{past_lessons}
+
+[WHAT-IF ANALYSIS] (today replayed with different AC schedules)
+{counterfactuals}
+
 [ANALYSIS]
 Compare your Weight ({COMFORT_VS_COST_WEIGHT}) with the problems.
 1. **IF WASTE PENALTY EXISTS**: Your ONLY priority is to prevent this tomorrow. You MUST make a rule about turning off ACs.
@@ -264,12 +274,14 @@ Output JSON: {{ "new_rule": "..." }}
             content = resp.choices[0].message.content
             res = json.loads(content)
             new_rule = res.get("new_rule", "Balance life.")
-            self.save_memories(new_rule)
+            self.save_memories(new_rule, day=summary["day"], bill=total_bill, discomfort=summary["avg_discomfort"], meta=summary["meta"])
             print(f"[{self.name}] Reflection Complete. New Rule: {new_rule}") # Debug log
         except Exception as e:
             print(f"Reflection Error: {e}")
 
-    def think(self, state_dict):
+    def think(self, state_dict, on_partial=None):
+        """on_partial(已完成字段, 正在输出的 (键, 片段) 或 None)：流式模式下每收到一段回复调用一次，
+        调用方可以在 action/target 齐了之后立即行动，不必等 thought/message 写完"""
         if not self.client:
             return {"action": "Idle", "thought": "No Brain"}
 
@@ -317,6 +329,7 @@ Output JSON: {{ "new_rule": "..." }}
                 house_status_str += f"- {r_name}: {r_data['temp']:.1f}C (Set:{r_data['setpoint']:.0f})\n"
         
         house_status_str += f"\n[WALLET]\nBudget Left: ${budget_left:.2f}\nSpending Sensation: {money_sensation}"
+        house_status_str += f"\nPrice Outlook: {tariff.outlook(h)}"
 
         if is_night:
             prompt = SYSTEM_INSTRUCTION_NIGHT.format(
@@ -328,7 +341,12 @@ Output JSON: {{ "new_rule": "..." }}
             food_info = str(GLOBAL_FOOD.get_count())
 
             role_ins = ROLE_INSTRUCTION_MOM if self.name == "Mom" else (ROLE_INSTRUCTION_SON if self.name == "Son" else ROLE_INSTRUCTION_DAD)
-            msgs_str = "\n".join(self.incoming_messages) if self.incoming_messages else "None."
+            inbox, read_upto = message_bus.read(self.name)
+            msgs_str = "\n".join(inbox) if inbox else "None."
+            past_lessons = self.recall_lessons(
+                situation_tokens(bill=current_bill, pmv=state_dict.get('pmv', 0.0), waste=waste_alert != "None",
+                                 out_temp=state_dict.get('out_temp'), hour=h)
+                + tokenize(f"{state_dict['room']} {state_dict.get('sensation', '')} {money_sensation} {waste_alert}"))
             
             # 🔥 传入 dynamic_tolerance 和修正后的指令
             prompt = SYSTEM_INSTRUCTION_DAY.format(
@@ -340,21 +358,41 @@ Output JSON: {{ "new_rule": "..." }}
                 pmv=state_dict.get('pmv', 0.0), clothing=state_dict.get('clothing', 0.5),
                 room=state_dict['room'], house_status=house_status_str, 
                 food_info=food_info, messages=msgs_str, role_instructions=role_ins,
-                waste_alert=waste_alert
+                waste_alert=waste_alert, past_lessons=past_lessons
             )
 
         try:
-            resp = self.client.chat.completions.create(
-                model="qwen-plus", 
-                messages=[{"role":"system","content":prompt}],
-                response_format={"type":"json_object"},
-                timeout=10
-            )
-            content = resp.choices[0].message.content.replace("```json", "").replace("```", "").strip()
-            decision = json.loads(content)
+            if LLM_STREAM and on_partial is not None:
+                decision = self._stream_decision(prompt, on_partial)
+            else:
+                resp = self.client.chat.completions.create(
+                    model="qwen-plus", 
+                    messages=[{"role":"system","content":prompt}],
+                    response_format={"type":"json_object"},
+                    timeout=10
+                )
+                content = resp.choices[0].message.content.replace("```json", "").replace("```", "").strip()
+                decision = json.loads(content)
             self.last_thought = decision.get("thought", "")
-            if not is_night: self.incoming_messages = []
+            if not is_night: message_bus.consume(self.name, read_upto)   # 只丢掉已读的，思考期间新到的保留
             return decision
         except Exception as e:
             print(f"Thinking Error ({self.name}): {e}")
-            return {"action": "Sleep" if is_night else "Idle", "thought": "Brain freeze..."}
\ No newline at end of file
+            return {"action": "Sleep" if is_night else "Idle", "thought": "Brain freeze..."}
+
+    def _stream_decision(self, prompt, on_partial):
+        stream = self.client.chat.completions.create(
+            model="qwen-plus",
+            messages=[{"role":"system","content":prompt}],
+            response_format={"type":"json_object"},
+            stream=True,
+            timeout=10
+        )
+        parser = JsonObjectStream()
+        for chunk in stream:
+            if not chunk.choices: continue
+            piece = chunk.choices[0].delta.content
+            if not piece: continue
+            parser.feed(piece)
+            on_partial(parser.fields, parser.streaming())
+        return parser.result()
@@ -1,51 +1,104 @@
 import pygame
 import threading
+import time
 import random
 import math
 from config import *
 from simulation import sim_manager
-from map_system import house_map, SpriteLoader
+from setpoint_optimizer import setpoint_optimizer
+from map_system import house_map, frame_atlas
 from agent_brain import AgentBrain, GLOBAL_FOOD
-from physics_utils import calculate_fanger_pmv, pmv_to_comfort_score, get_sensation_string
+from physics_utils import get_sensation_string
+from agent_store import agent_store, STATUS_CODES
+from render_cache import build_bubble
+from world_snapshot import AgentSnapshot
+from frame_profiler import profiler
+from message_bus import message_bus
+
+# 流式决策: 这些动作不需要 target (Watch_TV / Play 固定去沙发 / 玩具箱)，action 一到就能执行；Chat 还要等 message 收全
+_NO_TARGET_ACTIONS = ("Eat", "Cook", "Sleep", "Optimize_AC", "Idle", "Watch_TV", "Play")
+
+def _decision_ready(fields):
+    action = fields.get("action")
+    if action is None: return False
+    action = str(action).strip()
+    if action == "Chat": return "target" in fields and "message" in fields
+    return action in _NO_TARGET_ACTIONS or "target" in fields
+
+def _store_field(name):
+    """把属性映射到 agent_store 的同名数组 (按 self.idx 读写)"""
+    return property(lambda self: float(getattr(agent_store, name)[self.idx]),
+                    lambda self, v: getattr(agent_store, name).__setitem__(self.idx, v))
 
 class Character(pygame.sprite.Sprite):
+    # 数值状态全部存放在 agent_store 中，Character 只是渲染 / LLM 提示词用的视图
+    hunger = _store_field("hunger")
+    energy = _store_field("energy")
+    happiness = _store_field("happiness")
+    clothing_level = _store_field("clothing")
+    current_pmv = _store_field("pmv")
+    visual_comfort = _store_field("comfort")
+    doing_action_timer = _store_field("action_timer")
+
+    @property
+    def pos(self): return pygame.math.Vector2(*agent_store.pos[self.idx])
+    @pos.setter
+    def pos(self, v): agent_store.set_pos(self.idx, v[0], v[1])
+
+    @property
+    def status(self): return self._status
+    @status.setter
+    def status(self, v):
+        self._status = v
+        agent_store.status[self.idx] = STATUS_CODES.get(v, 0)
+
+    @property
+    def target_action(self): return self._target_action
+    @target_action.setter
+    def target_action(self, v):
+        self._target_action = v
+        agent_store.fun[self.idx] = v in ["Play", "Watch_TV"]
+        agent_store.play[self.idx] = v == "Play"
+
+    @property
+    def current_room(self): return agent_store.room_name(self.idx)
+
+    @property
+    def current_sensation(self): return get_sensation_string(self.current_pmv)
+
     def __init__(self, config):
         super().__init__()
+        self.idx = agent_store.add(config["spawn"])
         self.config = config
         self.name = config["name"]
         self.brain = AgentBrain(config["name"], config["role"])
         
-        self.frames = SpriteLoader().get_frames(config["sprite"], config["color"])
+        self.frames = frame_atlas.get_frames(config["sprite"], config["color"])
         self.direction = DIR_DOWN
         self.current_frame = 0
         self.image = self.frames[DIR_DOWN][0]
         self.rect = self.image.get_rect(topleft=config["spawn"])
-        self.pos = pygame.math.Vector2(config["spawn"])
         self.bed_pos = house_map.anchors.get(f"Sleep_{self.name}", config["spawn"])
         
-        self.speed = 8.0 
+        self.speed = AGENT_SPEED  # px/s
         self.ai_thread = None
-        self.last_think_tick = 0
-        self.think_cooldown = 3000 
+        self.sim_time = 0.0       # 该角色累计的仿真秒 (与帧率无关)
+        self.last_think_time = 0.0
+        self.think_cooldown = THINK_COOLDOWN 
 
         self.status = "Idle"
-        self.current_room = "LivingRoom"
-        self.last_room = "LivingRoom" 
+        self.last_room = self.current_room 
         self.path = []
         self.target_action = None
         self.current_thought = "Ready."
         self.bubble_timer = 0
-        
-        self.doing_action_timer = 0
-        
-        self.hunger = 80.0
-        self.energy = 80.0
-        self.happiness = 80.0
-        
-        self.visual_comfort = 1.0 
-        self.current_pmv = 0.0
-        self.current_sensation = "Neutral"
-        self.clothing_level = 0.5 
+        self._bubble_surf = None  # 气泡缓存，只在 current_thought 变化时重建
+        self._bubble_text = None
+        self.has_mail = False     # 收到消息后由总线置位，下一步立即思考
+        message_bus.register(self.name, self, idx=self.idx, notify=self._on_message)
+
+    def _on_message(self, name):
+        self.has_mail = True; self.last_think_time = -9999.0
 
     def reset_state(self):
         self.pos = pygame.math.Vector2(self.bed_pos)
@@ -59,26 +112,16 @@ class Character(pygame.sprite.Sprite):
         self.current_thought = "Waking up to a new day..."
         self.target_action = None
         self.doing_action_timer = 0
-        self.brain.reset_daily_memory()
-        self.update_physics()
+        self.brain.reset_daily_memory(); self.has_mail = False
         print(f"🔄 {self.name} respawned at Bed")
 
-    def get_physio_state(self):
-        clo = self.clothing_level
-        if self.status == "Sleeping": clo = max(clo, 1.0) 
-        met = 1.0 
-        if self.status == "Sleeping": met = 0.7
-        elif self.status == "Moving": met = 1.7
-        elif self.doing_action_timer > 0:
-            if self.target_action == "Play": met = 2.0 
-        return clo, met
-
     def run_ai_thread(self, all_sprites, current_bill, last_hour_cost, waste_alert):
         try:
             with sim_manager.lock: 
                 h = sim_manager.current_hour
+                out_temp = sim_manager.energy_data[3]
                 house_data = {}
-                for room_name in ["LivingRoom", "MasterRoom", "KidsRoom"]:
+                for room_name, _ in HVAC_ZONE_KEYS:
                     t = sim_manager.zone_data.get(room_name, (20,50))[0]
                     sp = sim_manager.get_setpoint(room_name)
                     house_data[room_name] = {"temp": t, "setpoint": sp}
@@ -99,10 +142,24 @@ class Character(pygame.sprite.Sprite):
                 "house_data": house_data,
                 "current_bill": current_bill,       
                 "last_hour_cost": last_hour_cost,
-                "waste_alert": waste_alert # 🔥 传入环境警告
+                "waste_alert": waste_alert, # 🔥 传入环境警告
+                "out_temp": out_temp
             }
-            decision = self.brain.think(state)
-            self.process_decision(decision, all_sprites, h % 24)
+            # 流式: action/target 一齐就开始寻路行动，thought 随后边收边填进气泡
+            hour = h % 24
+            t0 = time.perf_counter()
+            early = {}
+            def on_partial(fields, streaming):
+                if not early and _decision_ready(fields):
+                    early.update(fields)
+                    profiler.record("llm.first_action", (time.perf_counter() - t0) * 1000.0)
+                    self.process_decision(dict(fields), all_sprites, hour)
+                if streaming and streaming[0] == "thought":
+                    self._show_thought(fields.get("action"), streaming[1], bool(early))
+            decision = self.brain.think(state, on_partial)
+            profiler.record("llm.decision", (time.perf_counter() - t0) * 1000.0)
+            if early: self._show_thought(str(early["action"]).strip(), decision.get("thought", "..."), True)
+            else: self.process_decision(decision, all_sprites, hour)
         except Exception as e:
             print(f"AI Error: {e}")
         finally:
@@ -110,6 +167,13 @@ class Character(pygame.sprite.Sprite):
             if self.status == "Thinking": 
                 self.status = "Idle"
 
+    def _show_thought(self, action, thought, dispatched):
+        """把 (流式中的) thought 填进气泡；已开始行动且气泡被换成状态提示 (如 "Going to Kitchen...") 时不覆盖"""
+        action = str(action).strip() if action else None
+        if dispatched and not self.current_thought.startswith(f"{action}: "): return
+        self.current_thought = f"{action}: {thought}" if action else thought
+        self.bubble_timer = BUBBLE_DURATION
+
     def process_decision(self, d, all_sprites, hour):
         action = d.get("action", "Idle").strip()
         target = d.get("target")
@@ -117,13 +181,13 @@ class Character(pygame.sprite.Sprite):
         msg = d.get("message", "")
 
         self.current_thought = f"{action}: {thought}"
-        self.bubble_timer = 300 
+        self.bubble_timer = BUBBLE_DURATION 
         self.target_action = action
         
         try:
             cur_temp = sim_manager.zone_data.get(self.current_room, (25,0))[0]
             sp = sim_manager.get_setpoint(self.current_room)
-            self.brain.record_action(action, cur_temp, sp > 0)
+            self.brain.record_action(action, cur_temp, sp > HVAC_OFF_SETPOINT)
         except: pass
 
         if action == "Adjust_Clothing":
@@ -152,6 +216,22 @@ class Character(pygame.sprite.Sprite):
             self.status = "Idle" 
             return
 
+        if action == "Optimize_AC":
+            try:
+                with sim_manager.lock:
+                    temps = {r: t for r, (t, rh) in sim_manager.zone_data.items()}
+                    out_temp = sim_manager.energy_data[3]
+                occupied = {a.current_room: True for a in all_sprites}
+                plan = setpoint_optimizer.optimize(temps, hour, out_temp=out_temp, occupied_now=occupied)
+                sim_manager.install_plan(plan["schedule"])
+                sim_manager.apply_plan(int(hour))
+                self.current_thought = f"AC plan set (est. ${plan['cost']:.2f} for rest of day)."
+                print(f"🧮 {self.name} optimized AC in {plan['elapsed']*1000:.0f}ms:\n{setpoint_optimizer.describe(plan)}")
+            except Exception as e:
+                print(f"Optimize_AC Error: {e}")
+            self.status = "Idle"
+            return
+
         if action == "Eat":
             if self.current_room == "Kitchen":
                 self.execute_instant_action("Eat")
@@ -174,7 +254,7 @@ class Character(pygame.sprite.Sprite):
         if action == "Play" or action == "Watch_TV":
             target_pos = house_map.anchors.get("ToyBox") if (action=="Play" and self.name=="Son") else house_map.anchors.get("Sofa")
             if target_pos and self.pos.distance_to(pygame.math.Vector2(target_pos)) < 40:
-                self.doing_action_timer = 200 
+                self.doing_action_timer = ACTION_DURATION 
                 self.status = "Busy" 
                 self.current_thought = f"{action}ing... (Fun!)"
             else:
@@ -197,10 +277,23 @@ class Character(pygame.sprite.Sprite):
             return
 
         if action == "Chat":
-            target_sprite = next((s for s in all_sprites if s.name == target), None)
+            target = str(target or "").strip()
+            if target.lower() in ("everyone", "all", "family"):
+                n = message_bus.broadcast(self.name, msg)
+                self.status = "Idle"; self.current_thought = f"Told everyone ({n}): {msg}"
+                return
+            if target.lower() in ("nearby", "near"):
+                n = message_bus.send_near(self.name, CHAT_RADIUS, msg)
+                self.status = "Idle"; self.current_thought = f"Said to those nearby ({n}): {msg}"
+                return
+            if target in house_map.zones:
+                n = message_bus.send_room(self.name, target, msg)
+                self.status = "Idle"; self.current_thought = f"Said in {target} ({n}): {msg}"
+                return
+            target_sprite = message_bus.agent(target)
             if target_sprite:
-                if self.pos.distance_to(target_sprite.pos) < 80: 
-                    target_sprite.brain.receive_message(self.name, msg)
+                if self.pos.distance_to(target_sprite.pos) <= CHAT_RADIUS:
+                    message_bus.send(self.name, target, msg)
                     self.status = "Idle"
                     self.current_thought = f"Said: {msg}"
                 else:
@@ -213,13 +306,13 @@ class Character(pygame.sprite.Sprite):
             dest = house_map.get_target_coord("Move_To", target)
             self._set_path(dest)
         elif action == "Find_Person":
-            target_sprite = next((s for s in all_sprites if s.name == target), None)
+            target_sprite = message_bus.agent(target)
             if target_sprite: self._set_path(target_sprite.pos)
 
     def _set_path(self, target_pos):
         if target_pos:
             t = pygame.math.Vector2(target_pos)
-            self.path = house_map.pathfinder.find_path(self.pos, (t.x, t.y))
+            with profiler.scope("astar"): self.path = house_map.pathfinder.find_path(self.pos, (t.x, t.y))
             if self.path: self.status = "Moving"
             else: self.status = "Idle"
 
@@ -238,11 +331,17 @@ class Character(pygame.sprite.Sprite):
         self.status = "Idle"
         self.target_action = None
 
-    def update(self, all_sprites, current_bill, last_hour_cost, waste_alert):
-        self.update_physics() 
+    def update(self, all_sprites, current_bill, last_hour_cost, waste_alert, dt=SIM_DT, fast_forward=False):
+        """推进一个固定步长 dt (仿真秒)；需求/PMV 已由 agent_store.step 批量更新
+        fast_forward: 夜间快进中，不发起任何 LLM 思考"""
+        with profiler.scope("agent.update"): self._update(all_sprites, current_bill, last_hour_cost, waste_alert, dt, fast_forward)
+
+    def _update(self, all_sprites, current_bill, last_hour_cost, waste_alert, dt, fast_forward=False):
+        self.sim_time += dt
+        self.sync_room() 
 
         # 🔥🔥🔥 强制睡觉逻辑：如果到了 21:00 还没有在睡觉/去床的路上，强制中断
-        with sim_manager.lock: h = sim_manager.current_hour
+        with profiler.lock(sim_manager.lock, "sim_manager"): h = sim_manager.current_hour
         hour = h % 24
         if hour >= 21.0 or hour < 6.0:
             if self.status != "Sleeping" and self.target_action != "Sleep":
@@ -252,9 +351,7 @@ class Character(pygame.sprite.Sprite):
                 self.current_thought = "Go to bed NOW!"
         
         if self.doing_action_timer > 0:
-            self.doing_action_timer -= 1
-            if self.target_action in ["Play", "Watch_TV"]:
-                 self.happiness = min(100, self.happiness + 0.3)
+            self.doing_action_timer -= dt
             if self.doing_action_timer <= 0:
                 self.status = "Idle"; self.target_action = None; self.current_thought = "Done."
             return 
@@ -262,10 +359,11 @@ class Character(pygame.sprite.Sprite):
         if self.status == "Moving" and self.path:
             t = pygame.math.Vector2(self.path[0])
             v = t - self.pos
-            if v.length() < self.speed:
+            step = self.speed * dt
+            if v.length() < step:
                 self.pos = pygame.math.Vector2(self.path.pop(0))
             else:
-                v.normalize_ip(); self.pos += v * self.speed
+                v.normalize_ip(); self.pos += v * step
             self.rect.center = (int(self.pos.x), int(self.pos.y))
             if abs(v.x)>abs(v.y): self.direction = DIR_RIGHT if v.x>0 else DIR_LEFT
             else: self.direction = DIR_DOWN if v.y>0 else DIR_UP
@@ -282,142 +380,89 @@ class Character(pygame.sprite.Sprite):
             elif self.target_action == "Sleep":
                 self.status = "Sleeping"
             elif self.target_action in ["Play", "Watch_TV"]:
-                self.doing_action_timer = 200; self.status = "Busy"
+                self.doing_action_timer = ACTION_DURATION; self.status = "Busy"
             else:
                 self.status = "Idle"
 
-        if self.status == "Sleeping":
-            self.energy = min(100, self.energy + 0.3)
-            self.happiness = min(100, self.happiness + 0.1)
         
-        current_time = pygame.time.get_ticks()
-        if self.ai_thread is None and (current_time - self.last_think_tick > self.think_cooldown):
+        current_time = self.sim_time
+        if not fast_forward and self.ai_thread is None and (current_time - self.last_think_time > self.think_cooldown):
             should_think = False
-            if len(self.brain.incoming_messages) > 0: should_think = True
+            if self.has_mail: should_think = True
             elif self.status == "Idle": should_think = True
             elif self.status == "Sleeping" and random.random() < 0.02: should_think = True
 
             if should_think:
+                self.has_mail = False
                 if self.status != "Sleeping": self.status = "Thinking"
                 self.ai_thread = threading.Thread(target=self.run_ai_thread, args=(all_sprites, current_bill, last_hour_cost, waste_alert))
                 self.ai_thread.start()
-                self.last_think_tick = current_time
+                self.last_think_time = current_time
 
-        if self.bubble_timer > 0: self.bubble_timer -= 1
+        if self.bubble_timer > 0: self.bubble_timer -= dt
 
-    def update_physics(self):
-        new_room = house_map.get_zone_at(self.pos)
+    def sync_room(self):
+        """房间由 agent_store 批量查找，这里只负责"换房间就立即重新思考"的事件"""
+        new_room = self.current_room
         if new_room != self.last_room:
-            self.current_room = new_room; self.last_room = new_room; self.last_think_tick = -9999 
-        else:
-            self.current_room = new_room
-
-        try: 
-            z_data = sim_manager.zone_data.get(self.current_room, (25.0, 50.0))
-            air_temp = z_data[0]; rh = z_data[1]
-        except: 
-            air_temp = 25.0; rh = 50.0
-        
-        clo, met = self.get_physio_state()
-
-        self.current_pmv = calculate_fanger_pmv(ta=air_temp, tr=air_temp, vel=0.1, rh=rh, met=met, clo=clo)
-        self.current_sensation = get_sensation_string(self.current_pmv)
-        base_comfort = pmv_to_comfort_score(self.current_pmv)
-        
-        clothing_penalty = 0.0
-        if self.status != "Sleeping": 
-            if clo > 0.8: clothing_penalty = (clo - 0.8) * 0.1 
-            elif clo < 0.4: clothing_penalty = 0.05 
-            
-        self.visual_comfort = max(0.0, base_comfort - clothing_penalty)
-        
-        if self.status != "Sleeping":
-            self.hunger = max(0, self.hunger - 0.08)
-            self.energy = max(0, self.energy - 0.04)
-            if self.target_action not in ["Play", "Watch_TV"]:
-                self.happiness = max(0, self.happiness - 0.05)
-
-    def draw(self, screen, font):
-        # 1. 绘制角色本身
-        screen.blit(self.image, self.rect)
+            self.last_room = new_room; self.last_think_time = -9999.0 
+
+    def snapshot(self):
+        """当前帧的只读视图，供渲染循环插值绘制"""
+        return AgentSnapshot(
+            name=self.name, x=self.pos.x, y=self.pos.y,
+            direction=self.direction, frame=int(self.current_frame) % 4, status=self.status,
+            hunger=self.hunger, energy=self.energy, clothing=self.clothing_level,
+            comfort=self.visual_comfort, thought=self.current_thought,
+            show_bubble=self.bubble_timer > 0, color=self.config["color"],
+        )
+
+    def draw(self, screen, font, view=None):
+        if view is None: view = self.snapshot()
+        # 1. 绘制角色本身 (位置来自快照，可能是插值后的)
+        image = self.frames[view.direction][view.frame % len(self.frames[view.direction])]
+        rect = image.get_rect(center=(int(view.x), int(view.y)))
+        screen.blit(image, rect)
         
         # 2. 绘制状态点
         c = (0,255,0)
-        if self.status=="Thinking": c=(0,0,255)
-        if self.status=="Sleeping": c=(100,100,100)
-        if self.status=="Busy": c=(255,165,0) 
-        if self.hunger < 30: c = (255, 0, 0)
-        pygame.draw.circle(screen, c, (self.rect.right, self.rect.top), 5)
-        self.draw_ui(screen, font)
-        # 3. 绘制气泡 (透明 + 自动分行)
-        if self.bubble_timer > 0 and self.current_thought:
-            # --- 自动分行逻辑 ---
-            max_width = 180 # 气泡最大宽度
-            words = self.current_thought.split(' ')
-            lines = []
-            current_line = ""
-            
-            for word in words:
-                test_line = current_line + word + " "
-                # 测试这一行加上新词会不会超宽
-                if font.size(test_line)[0] < max_width:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word + " "
-            if current_line: lines.append(current_line)
-            
-            # --- 计算尺寸 ---
-            line_height = font.get_linesize()
-            bubble_width = 0
-            for line in lines:
-                w = font.size(line)[0]
-                if w > bubble_width: bubble_width = w
-            bubble_width += 20 # 左右留白
-            bubble_height = len(lines) * line_height + 16 # 上下留白
-            
-            # --- 创建透明 Surface ---
-            # flags=pygame.SRCALPHA 使其支持 Alpha 通道
-            bubble_surf = pygame.Surface((bubble_width, bubble_height), pygame.SRCALPHA)
-            
-            # 填充背景 (R, G, B, Alpha) -> Alpha=220 代表半透明
-            bubble_surf.fill((255, 255, 240, 220)) 
-            
-            # 画边框
-            pygame.draw.rect(bubble_surf, (50, 50, 50), bubble_surf.get_rect(), 1, border_radius=6)
-            
-            # --- 绘制每一行文字 ---
-            text_y = 8
-            for line in lines:
-                text_surf = font.render(line, True, BLACK) # 文字用黑色
-                bubble_surf.blit(text_surf, (10, text_y))
-                text_y += line_height
+        if view.status=="Thinking": c=(0,0,255)
+        if view.status=="Sleeping": c=(100,100,100)
+        if view.status=="Busy": c=(255,165,0) 
+        if view.hunger < 30: c = (255, 0, 0)
+        pygame.draw.circle(screen, c, (rect.right, rect.top), 5)
+        self.draw_ui(screen, font, view, rect)
+        # 3. 绘制气泡 (透明 + 自动分行，缓存到 thought 变化为止)
+        if view.show_bubble and view.thought:
+            if self._bubble_text != view.thought:
+                with profiler.scope("bubble.build"): self._bubble_surf = build_bubble(font, view.thought)
+                self._bubble_text = view.thought
+            bubble_width, bubble_height = self._bubble_surf.get_size()
             
             # --- 确定屏幕位置并防出界 ---
-            dest_x = self.rect.centerx - bubble_width // 2
-            dest_y = self.rect.top - bubble_height - 10
+            dest_x = rect.centerx - bubble_width // 2
+            dest_y = rect.top - bubble_height - 10
             
             # 屏幕边界检查
             if dest_x < UI_BAR_WIDTH: dest_x = UI_BAR_WIDTH + 5
             if dest_x + bubble_width > WINDOW_WIDTH: dest_x = WINDOW_WIDTH - bubble_width - 5
-            if dest_y < 0: dest_y = self.rect.bottom + 10 # 如果上面没地儿了，就显示在下面
+            if dest_y < 0: dest_y = rect.bottom + 10 # 如果上面没地儿了，就显示在下面
             
-            # --- Blit 到主屏幕 ---
-            screen.blit(bubble_surf, (dest_x, dest_y))
+            screen.blit(self._bubble_surf, (dest_x, dest_y))
 
-    def draw_ui(self, screen, font):
-        x, y = self.rect.centerx-20, self.rect.top-25
+    def draw_ui(self, screen, font, view, rect):
+        x, y = rect.centerx-20, rect.top-25
         w, h = 40, 4
-        comfort_col = (0, 255, 0) if self.visual_comfort > 0.8 else (255, 165, 0)
-        if self.visual_comfort < 0.4: comfort_col = (255, 0, 0)
+        comfort_col = (0, 255, 0) if view.comfort > 0.8 else (255, 165, 0)
+        if view.comfort < 0.4: comfort_col = (255, 0, 0)
         pygame.draw.circle(screen, comfort_col, (x-5, y+10), 4)
 
         pygame.draw.rect(screen, (50,50,50), (x, y, w, h))
-        pygame.draw.rect(screen, (255,140,0), (x, y, w*(self.hunger/100), h))
+        pygame.draw.rect(screen, (255,140,0), (x, y, w*(view.hunger/100), h))
         y += 5
         pygame.draw.rect(screen, (50,50,50), (x, y, w, h))
-        pygame.draw.rect(screen, (0,191,255), (x, y, w*(self.energy/100), h))
+        pygame.draw.rect(screen, (0,191,255), (x, y, w*(view.energy/100), h))
         y += 5
         pygame.draw.rect(screen, (50,50,50), (x, y, w, h))
-        clo_ratio = (self.clothing_level - 0.3) / 1.2
+        clo_ratio = (view.clothing - 0.3) / 1.2
         pygame.draw.rect(screen, (200,200,200), (x, y, w*clo_ratio, h))
\ No newline at end of file
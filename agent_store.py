@@ -0,0 +1,161 @@
+import numpy as np
+from config import *
+from physics_utils import calculate_fanger_pmv_batch
+from spatial_index import SpatialHash
+from lazy_init import lazy_singletons
+
+# ==============================================================================
+# 🧮 智能体状态存储 (Struct-of-Arrays)
+# 所有角色的数值状态放在 NumPy 数组里，需求衰减 / 房间查找 / PMV
+# 每个 tick 一次向量化计算完成；Character 只是按下标读写这些数组的视图
+# 位置另有空间哈希 (近邻查询)，房间另有成员集合与人数 (按房间查询 / 占用统计)，都随变化增量维护
+# ==============================================================================
+
+STATUS_CODES = {"Idle": 0, "Moving": 1, "Sleeping": 2, "Busy": 3, "Thinking": 4}
+STATUS_NAMES = {v: k for k, v in STATUS_CODES.items()}
+
+class AgentStateStore:
+    def __init__(self, zones, capacity=8):
+        self.room_names = list(zones.keys())
+        self.room_index = {r: i for i, r in enumerate(self.room_names)}
+        self.default_room = self.room_index.get("LivingRoom", 0)
+        b = np.array([[r.left, r.top, r.right, r.bottom] for r in zones.values()], dtype=float)
+        self._left, self._top, self._right, self._bottom = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+        self.n = 0
+        self.grid = SpatialHash()
+        self.members = [set() for _ in self.room_names]        # 房间下标 -> set[角色下标]
+        self.room_count = np.zeros(len(self.room_names), dtype=np.int32)
+        self.room_listeners = []   # fn(房间名, 人数)，房间人数变化时调用 (如 waste_tracker)
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old_n = self.n
+        def grow(name, shape, dtype, fill=0):
+            arr = np.full(shape, fill, dtype=dtype)
+            prev = getattr(self, name, None)
+            if prev is not None: arr[:old_n] = prev[:old_n]
+            setattr(self, name, arr)
+        grow("pos", (capacity, 2), float)
+        for name in ("hunger", "energy", "happiness", "clothing", "pmv", "comfort", "action_timer"):
+            grow(name, capacity, float)
+        grow("room", capacity, np.int32, self.default_room)
+        grow("status", capacity, np.int8)
+        grow("fun", capacity, bool)     # target_action 是 Play / Watch_TV
+        grow("play", capacity, bool)    # target_action 是 Play (代谢率更高)
+        self.capacity = capacity
+
+    def add(self, spawn):
+        if self.n == self.capacity: self._alloc(self.capacity * 2)
+        i = self.n
+        self.n += 1
+        self.set_pos(i, spawn[0], spawn[1])
+        self.hunger[i] = 80.0; self.energy[i] = 80.0; self.happiness[i] = 80.0
+        self.clothing[i] = 0.5; self.pmv[i] = 0.0; self.comfort[i] = 1.0
+        self.action_timer[i] = 0.0; self.room[i] = self.default_room
+        self.status[i] = STATUS_CODES["Idle"]; self.fun[i] = False; self.play[i] = False
+        self.members[self.default_room].add(i); self.room_count[self.default_room] += 1
+        self._emit(self.default_room)
+        return i
+
+    def all_asleep(self):
+        """所有角色都在睡觉"""
+        n = self.n
+        return n > 0 and bool(np.all(self.status[:n] == STATUS_CODES["Sleeping"]))
+
+    def occupied_temps_within(self, zone_data, band):
+        """有人的房间温度都在 band = (下限, 上限) 内；zone_data = {room: (temp, rh)}，没有数据的房间不计"""
+        lo, hi = band
+        return all(lo <= zone_data[name][0] <= hi for name, c in zip(self.room_names, self.room_count.tolist())
+                   if c > 0 and name in zone_data)
+
+    def room_name(self, i):
+        return self.room_names[self.room[i]]
+
+    # ---------------- 空间 / 房间索引 ----------------
+    def set_pos(self, i, x, y):
+        self.pos[i] = (x, y)
+        self.grid.update(i, x, y)
+
+    def within(self, i, r):
+        """与角色 i 距离不超过 r 的其他角色下标"""
+        x, y = self.pos[i]
+        return [j for j in self.near(x, y, r) if j != i]
+
+    def near(self, x, y, r):
+        r2 = r * r
+        out = []
+        for j in self.grid.candidates(x, y, r):
+            dx = self.pos[j, 0] - x; dy = self.pos[j, 1] - y
+            if dx * dx + dy * dy <= r2: out.append(j)
+        return out
+
+    def in_room(self, room):
+        """当前在 room 里的角色下标 (房间成员的唯一来源，message_bus.send_room 也读这里)"""
+        i = self.room_index.get(room)
+        return set(self.members[i]) if i is not None else set()
+
+    def occupancy(self):
+        """{房间: 人数}"""
+        return dict(zip(self.room_names, self.room_count.tolist()))
+
+    def _move_room(self, i, old, new):
+        self.members[old].discard(i); self.members[new].add(i)
+        self.room_count[old] -= 1; self.room_count[new] += 1
+        self._emit(old); self._emit(new)
+
+    def _emit(self, r):
+        for fn in self.room_listeners: fn(self.room_names[r], int(self.room_count[r]))
+
+    def reindex(self):
+        """数组被整体覆盖后 (如恢复检查点) 重建空间哈希与房间索引"""
+        n = self.n
+        self.grid.clear()
+        for i in range(n): self.grid.update(i, self.pos[i, 0], self.pos[i, 1])
+        self.members = [set() for _ in self.room_names]
+        for i in range(n): self.members[self.room[i]].add(i)
+        self.room_count = np.bincount(self.room[:n], minlength=len(self.room_names)).astype(np.int32)
+        for r in range(len(self.room_names)): self._emit(r)
+
+    def step(self, dt, zone_data):
+        """一次批量推进: zone_data = {room: (temp, rh)}"""
+        n = self.n
+        if n == 0: return
+        temps = np.array([zone_data.get(r, (25.0, 50.0))[0] for r in self.room_names], dtype=float)
+        rhs = np.array([zone_data.get(r, (25.0, 50.0))[1] for r in self.room_names], dtype=float)
+
+        # 1. 房间查找 (与 HouseMap.get_zone_at 一致: 按顺序取第一个包含该点的区域)
+        x = self.pos[:n, 0:1]; y = self.pos[:n, 1:2]
+        inside = (x >= self._left) & (x < self._right) & (y >= self._top) & (y < self._bottom)
+        room = np.where(inside.any(axis=1), inside.argmax(axis=1), self.default_room)
+        for i in np.flatnonzero(room != self.room[:n]): self._move_room(int(i), int(self.room[i]), int(room[i]))
+        self.room[:n] = room
+
+        # 2. 生理状态 -> PMV / 舒适度
+        status = self.status[:n]
+        sleeping = status == STATUS_CODES["Sleeping"]
+        moving = status == STATUS_CODES["Moving"]
+        busy = self.action_timer[:n] > 0
+        clo = np.where(sleeping, np.maximum(self.clothing[:n], 1.0), self.clothing[:n])
+        met = np.where(sleeping, 0.7, np.where(moving, 1.7, np.where(busy & self.play[:n], 2.0, 1.0)))
+        ta = temps[room]
+        pmv = calculate_fanger_pmv_batch(ta, ta, 0.1, rhs[room], met, clo)
+        self.pmv[:n] = pmv
+        penalty = np.where(sleeping, 0.0, np.where(clo > 0.8, (clo - 0.8) * 0.1, np.where(clo < 0.4, 0.05, 0.0)))
+        self.comfort[:n] = np.maximum(0.0, np.maximum(0.0, 1.0 - np.abs(pmv) / 3.0) - penalty)
+
+        # 3. 需求衰减 / 恢复
+        awake = ~sleeping
+        fun = self.fun[:n]
+        self.hunger[:n] = np.where(awake, np.maximum(0, self.hunger[:n] - HUNGER_DECAY * dt), self.hunger[:n])
+        self.energy[:n] = np.where(awake, np.maximum(0, self.energy[:n] - ENERGY_DECAY * dt), self.energy[:n])
+        happy = np.where(awake & ~fun, np.maximum(0, self.happiness[:n] - HAPPY_DECAY * dt), self.happiness[:n])
+        happy = np.where(busy & fun, np.minimum(100, happy + FUN_GAIN * dt), happy)
+        resting = sleeping & ~busy
+        self.energy[:n] = np.where(resting, np.minimum(100, self.energy[:n] + SLEEP_ENERGY_GAIN * dt), self.energy[:n])
+        self.happiness[:n] = np.where(resting, np.minimum(100, happy + SLEEP_HAPPY_GAIN * dt), happy)
+
+def _default_store():
+    from map_system import house_map   # 房间布局来自地图；只有真正用到 agent_store 时才建图
+    return AgentStateStore(house_map.zones)
+
+__getattr__ = lazy_singletons(__name__, {"agent_store": _default_store})
@@ -0,0 +1,436 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import threading
+import multiprocessing
+from types import SimpleNamespace
+from config import *
+
+# ==============================================================================
+# ⏱️ 热点路径基准测试 (离线可跑：固定随机种子，LLM 与 EnergyPlus 都换成桩)
+#   python benchmark.py                      -> 跑全部项目，结果写入 BENCH_RESULTS_FILE
+#   python benchmark.py --save-baseline      -> 同时把结果存为基线
+#   python benchmark.py --compare            -> 与基线对比，超出容差的项目视为退化 (退出码 1)
+#   python benchmark.py import_time          -> 冷导入耗时预算检查，超预算同样退出码 1
+# 每个项目以 per_op_us (越小越好) 作为对比指标
+# ==============================================================================
+
+# ---------------- 桩: LLM ----------------
+class _StubCompletions:
+    """按提示词类型返回固定格式的 JSON；动作由固定种子的随机数挑选 (stream=True 时按 8 字符一块流式返回)"""
+    DAY_ACTIONS = ["Eat", "Watch_TV", "Play", "Adjust_AC", "Optimize_AC", "Adjust_Clothing", "Move_To", "Chat"]
+
+    def __init__(self):
+        self.rng = random.Random(BENCH_SEED)
+        self.lock = threading.Lock()
+
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        prompt = messages[-1]["content"] if messages else ""
+        with self.lock:
+            if "[REFLECTION TASK]" in prompt:
+                d = {"new_rule": "Turn off the AC in empty rooms and pre-heat during valley hours."}
+            elif "NIGHT TIME" in prompt:
+                d = {"action": "Sleep", "thought": "zzz"}
+            else:
+                action = self.rng.choice(self.DAY_ACTIONS)
+                target = {"Adjust_AC": "LivingRoom:22", "Adjust_Clothing": "0.8", "Move_To": "LivingRoom",
+                          "Chat": "Everyone"}.get(action, "")
+                d = {"action": action, "target": target, "thought": "benchmark", "message": "dinner at 7"}
+        if stream:
+            text = json.dumps(d)
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[i:i + 8]))])
+                         for i in range(0, len(text), 8)])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(d)))])
+
+class StubOpenAI:
+    def __init__(self, *args, **kwargs):
+        self.chat = SimpleNamespace(completions=_StubCompletions())
+
+# ---------------- 桩: EnergyPlus ----------------
+def fake_energyplus(shared_array, pause_event, hold_event=None, ready_event=None, out_dir=EPLUS_OUT_DIR, replay=None,
+                    steps=24 * EPLUS_TIMESTEPS_PER_HOUR, mean_out_temp=-4.0):
+    """与 run_energyplus_process 相同的共享内存协议 (含与智能体锁步)，用 RC 代理模型代替 EnergyPlus 推进 steps 个时间步
+    mean_out_temp: 日均室外温度 (默认冬季，设备容量不足以让卧室整夜保持在睡眠舒适温度)"""
+    from thermal_model import ThermalModel
+    from tariff import tariff
+    from simulation import replay_setpoints, wait_for_agents
+    model = ThermalModel(); meter = tariff.meter()
+    step_h = 1.0 / EPLUS_TIMESTEPS_PER_HOUR
+    n = N_ZONES
+    temps = shared_array[ZONE_T:ZONE_T + n]
+    if ready_event is not None: ready_event.set()
+    if hold_event is not None:
+        while not hold_event.is_set(): time.sleep(0.01)
+    for step in range(steps):
+        while not pause_event.is_set(): time.sleep(0.01)
+        wait_for_agents(replay, shared_array)
+        t_start = time.perf_counter()
+        h = step // EPLUS_TIMESTEPS_PER_HOUR
+        replaying = replay_setpoints(replay, int(shared_array[SLOT_CB_COUNT]) + 1, shared_array)
+        out_t = mean_out_temp + 5.0 * math.sin((h - 9) / 24.0 * 2 * math.pi)
+        temps, kwh = model.step(temps, shared_array[ZONE_SP:ZONE_SP + n], out_t, dt=3600.0 * step_h)
+        total = float(kwh.sum())
+        cost = meter.charge(tariff.step_index(h, step % EPLUS_TIMESTEPS_PER_HOUR + 1), total, total / step_h)
+        shared_array[SLOT_HOUR] = float(h); shared_array[SLOT_OUT_T] = out_t
+        shared_array[ZONE_T:ZONE_T + n] = [float(t) for t in temps]
+        shared_array[ZONE_RH:ZONE_RH + n] = [45.0] * n
+        shared_array[ZONE_KW:ZONE_KW + n] = [float(e) / step_h for e in kwh]
+        if total > 0: shared_array[ZONE_COST:ZONE_COST + n] = [c + cost * float(e) / total for c, e in zip(shared_array[ZONE_COST:ZONE_COST + n], kwh)]
+        shared_array[SLOT_PRICE] = tariff.price_at(h); shared_array[SLOT_POWER] = total / step_h; shared_array[SLOT_BILL] += cost
+        shared_array[SLOT_CB_MS] = (time.perf_counter() - t_start) * 1000.0; shared_array[SLOT_CB_COUNT] += 1
+        if replaying and shared_array[SLOT_CB_COUNT] >= replay["until_step"]: pause_event.clear()
+        if not replaying: time.sleep(BENCH_EPLUS_STEP_S)
+
+def install_stubs():
+    import agent_brain
+    import simulation
+    agent_brain.OpenAI = StubOpenAI
+    simulation.run_energyplus_process = fake_energyplus
+
+# ---------------- 计时工具 ----------------
+def timed(fn, n, repeat=5):
+    """跑 repeat 轮、每轮 n 次，取最快一轮 (排除调度噪声)"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(n): fn()
+        best = min(best, time.perf_counter() - t0)
+    return {"per_op_us": best / n * 1e6, "ops": n}
+
+def _pmv_inputs(n):
+    """游戏里实际出现的输入范围 (室内气流 ~0.1 m/s，辐射温度接近气温)"""
+    rng = random.Random(BENCH_SEED)
+    rows = []
+    for _ in range(n):
+        ta = rng.uniform(10, 32)
+        rows.append((ta, ta + rng.uniform(-2, 2), rng.uniform(0.05, 0.2), rng.uniform(20, 80),
+                     rng.choice([0.7, 1.0, 1.7, 2.0]), rng.uniform(0.3, 1.5)))
+    return rows
+
+# ---------------- 基准项目 ----------------
+def bench_pmv_scalar(n=2000):
+    from physics_utils import calculate_fanger_pmv
+    inputs = _pmv_inputs(n)
+    def run():
+        for args in inputs: calculate_fanger_pmv(*args)
+    r = timed(run, 1); r["per_op_us"] /= n; r["ops"] = n
+    return r
+
+def bench_pmv_legacy(n=2000):
+    from simulation import PMVCalculator
+    inputs = _pmv_inputs(n)
+    def run():
+        for args in inputs: PMVCalculator.calc_pmv(*args)
+    r = timed(run, 1); r["per_op_us"] /= n; r["ops"] = n
+    return r
+
+def bench_pmv_batch(n=2000):
+    import numpy as np
+    from physics_utils import calculate_fanger_pmv_batch
+    cols = [np.array(c) for c in zip(*_pmv_inputs(n))]
+    r = timed(lambda: calculate_fanger_pmv_batch(*cols), 1)
+    r["per_op_us"] /= n; r["ops"] = n
+    return r
+
+def bench_pathfind():
+    from map_system import house_map
+    pts = sorted(house_map.anchors.items())
+    pairs = [(a, b) for (ka, a) in pts for (kb, b) in pts if ka != kb]
+    found = 0
+    def run():
+        nonlocal found
+        found = sum(1 for a, b in pairs if house_map.pathfinder.find_path(a, b))
+    r = timed(run, 1, repeat=3)
+    r["per_op_us"] /= len(pairs); r["ops"] = len(pairs); r["paths_found"] = found
+    return r
+
+def bench_map_draw(frames=200):
+    import pygame
+    from map_system import house_map
+    surface = pygame.Surface((MAP_WIDTH, MAP_HEIGHT))
+    zones = {"LivingRoom": (21.3, 45.0, 22.0), "MasterRoom": (18.7, 40.0, 0.0), "KidsRoom": (19.9, 42.0, 24.0)}
+    return timed(lambda: house_map.draw(surface, zones), frames)
+
+def bench_character_draw(frames=200):
+    import pygame
+    from agent_sprite import Character
+    from render_cache import get_font
+    surface = pygame.Surface((MAP_WIDTH, MAP_HEIGHT))
+    font = get_font("arial", 16)
+    chars = [Character({"name": "Mom", "role": "PROVIDER", "color": (255,100,100), "spawn": (120, 200), "sprite": "Mom"}),
+             Character({"name": "Son", "role": "CONSUMER", "color": (100,255,100), "spawn": (150, 600), "sprite": "Son"})]
+    for c in chars:
+        c.current_thought = "Watch_TV: the living room is a bit chilly, maybe I should put on a sweater"; c.bubble_timer = 1e9
+    views = [c.snapshot() for c in chars]
+    def run():
+        for c, v in zip(chars, views): c.draw(surface, font, v)
+    return timed(run, frames)
+
+def _headless_day():
+    import main as game
+    from agent_store import agent_store
+    game.SIM_TICK_RATE = 0   # 不限速：测的是每个 tick 的真实开销
+    t0 = time.perf_counter()
+    state = game.main(headless=True, max_days=1)
+    elapsed = time.perf_counter() - t0
+    ticks = max(1, state["tick"])
+    return {"per_op_us": elapsed / ticks * 1e6, "ops": ticks, "day_s": elapsed, "agents": agent_store.n}
+
+def bench_headless_day():
+    """整天跑在独立解释器里：绘制项目建的 Character 会留在 agent_store / message_bus，不能带进这一天"""
+    return run_isolated("_headless_day")
+
+# ---------------- 隔离运行 ----------------
+def _isolated_entry(name, args):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    random.seed(BENCH_SEED)
+    import numpy as np; np.random.seed(BENCH_SEED)
+    import pygame; pygame.init()
+    install_stubs()
+    return globals()[name](*args)
+
+def run_isolated(name, *args):
+    """在全新解释器里 (装好桩) 跑 benchmark.<name>(*args)，返回其 JSON 结果；
+    agent_store / message_bus / sim_manager 等进程级单例不会与其他项目互相污染"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo + os.pathsep + os.environ.get("PYTHONPATH", ""), PYGAME_HIDE_SUPPORT_PROMPT="1")
+    code = f"import json, benchmark; print('BENCH_JSON', json.dumps(benchmark._isolated_entry({name!r}, {list(args)!r})))"
+    out = subprocess.run([sys.executable, "-c", code], env=env, stdout=subprocess.PIPE, text=True, check=True).stdout
+    line = next(l for l in reversed(out.splitlines()) if l.startswith("BENCH_JSON "))
+    return json.loads(line[len("BENCH_JSON "):])
+
+def _tick_probe(rate, eplus_steps):
+    """EnergyPlus 桩只跑 eplus_steps 个时间步，关掉 LLM 思考，返回这段建筑时间结束时的智能体状态"""
+    import functools
+    import simulation
+    import agent_sprite
+    import main as game
+    from agent_store import agent_store
+    simulation.run_energyplus_process = functools.partial(fake_energyplus, steps=eplus_steps)
+    agent_sprite.THINK_COOLDOWN = float("inf")
+    game.SIM_TICK_RATE = rate
+    state = game.main(headless=True, max_days=1)
+    n = agent_store.n
+    return {"sim_steps": state["sim_steps"], "ticks": state["tick"],
+            **{k: getattr(agent_store, k)[:n].tolist() for k in ("pos", "hunger", "energy", "happiness", "pmv", "room", "status")}}
+
+def bench_tick_invariance(hours=1):
+    """同一个建筑小时分别以 30 tick/s 和不限速推进，智能体状态必须逐位相同 (物理只跟建筑时钟走)"""
+    t0 = time.perf_counter()
+    throttled = run_isolated("_tick_probe", 30, hours * EPLUS_TIMESTEPS_PER_HOUR)
+    unthrottled = run_isolated("_tick_probe", 0, hours * EPLUS_TIMESTEPS_PER_HOUR)
+    elapsed = time.perf_counter() - t0
+    diff = [k for k in throttled if k != "ticks" and throttled[k] != unthrottled[k]]
+    for k in diff: print(f"   {k}: 30 tick/s {throttled[k]} != unthrottled {unthrottled[k]}")
+    expected = hours * EPLUS_TIMESTEPS_PER_HOUR * SIM_STEPS_PER_EPLUS_STEP
+    failed = [f"{k} differs between 30 tick/s and unthrottled" for k in diff]
+    if throttled["sim_steps"] != expected: failed.append(f"{throttled['sim_steps']} agent steps per {hours} building hour(s), expected {expected}")
+    return {"per_op_us": elapsed / max(1, expected) * 1e6, "ops": expected, "failed": failed}
+
+def _fast_forward_probe(wake_hour):
+    """温和天气下从 0 点跑到起床后一小时，wake_hour 时把 Son 叫醒；返回当天的快进开关记录"""
+    import functools
+    import simulation
+    import agent_sprite
+    import main as game
+    simulation.run_energyplus_process = functools.partial(
+        fake_energyplus, steps=(FAST_FORWARD_WAKE_HOUR + 1) * EPLUS_TIMESTEPS_PER_HOUR, mean_out_temp=12.0)
+    game.SIM_TICK_RATE = 0   # 保留 LLM 思考：已在床边的角色要靠一次思考 (桩在夜里回 Sleep) 才会躺下
+    woke = []; steps = [0]
+    update = agent_sprite.Character.update
+    def waking_update(self, *args, **kwargs):
+        update(self, *args, **kwargs)
+        if self.name != "Son": return
+        steps[0] += 1
+        if not woke and simulation.sim_manager.current_hour >= wake_hour:
+            self.status = "Idle"; self.target_action = None; woke.append(steps[0])
+    agent_sprite.Character.update = waking_update
+    state = game.main(headless=True, max_days=1)
+    return {"woke_step": woke[0] if woke else None, "ticks": state["tick"], "log": state["fast_forward_log"]}
+
+def bench_fast_forward(wake_hour=3):
+    """夜里全家睡着且卧室温度舒适时必须进入快进，有人醒来的那一步必须退出，起床时间后不再快进"""
+    t0 = time.perf_counter()
+    r = run_isolated("_fast_forward_probe", wake_hour)
+    elapsed = time.perf_counter() - t0
+    log = r["log"]
+    for e in log: print(f"   step {e['step']:>5} {e['hour']:5.2f}h {'ON ' if e['on'] else 'OFF'} {e['reason']}")
+    failed = []
+    if not any(e["on"] and e["hour"] < wake_hour for e in log): failed.append("night never fast-forwarded")
+    if r["woke_step"] is None: failed.append("nobody was woken")
+    elif not any(not e["on"] and e["step"] == r["woke_step"] for e in log):
+        failed.append(f"fast-forward did not exit on the step someone woke ({r['woke_step']})")
+    if not any(e["on"] and e["step"] > (r["woke_step"] or 0) for e in log): failed.append("fast-forward did not resume after the wake-up")
+    if log and log[-1]["on"]: failed.append("still fast-forwarding at the end of the run")
+    return {"per_op_us": elapsed / max(1, r["ticks"]) * 1e6, "ops": r["ticks"], "transitions": len(log), "failed": failed}
+
+def _checkpoint_probe(workdir, eplus_steps, resume=None):
+    """在 workdir 里跑 eplus_steps 个 EnergyPlus 时间步 (关掉 LLM 思考)，可从 resume 检查点继续；
+    返回结束时的 agent_store 数组、电费和 EnergyPlus 回调次数"""
+    import functools
+    import simulation
+    import agent_sprite
+    import main as game
+    from agent_store import agent_store
+    os.chdir(workdir)   # 检查点 / 记忆库 / 遥测都落在这里，两次运行共用
+    simulation.run_energyplus_process = functools.partial(fake_energyplus, steps=eplus_steps)
+    agent_sprite.THINK_COOLDOWN = float("inf")
+    game.SIM_TICK_RATE = 0
+    state = game.main(headless=True, max_days=1, resume=resume)
+    arr = simulation.sim_manager.shared_array
+    n = agent_store.n
+    return {"bill": arr[SLOT_BILL], "callbacks": int(arr[SLOT_CB_COUNT]), "ticks": state["tick"],
+            **{k: getattr(agent_store, k)[:n].tolist() for k in
+               ("pos", "hunger", "energy", "happiness", "clothing", "pmv", "comfort", "room", "status", "fun", "play")}}
+
+def bench_checkpoint_resume(hours=4):
+    """跑 hours 个建筑小时，再从中间的检查点恢复跑到同一终点：agent_store、电费、回调次数必须逐位相同"""
+    t0 = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="bench_ckpt_")
+    try:
+        steps = hours * EPLUS_TIMESTEPS_PER_HOUR
+        straight = run_isolated("_checkpoint_probe", workdir, steps)
+        mid = os.path.join(workdir, CHECKPOINT_DIR, f"day001_h{hours // 2:02d}.ckpt")
+        failed = []
+        if not os.path.exists(mid):
+            failed.append(f"no checkpoint at hour {hours // 2}")
+            resumed = straight
+        else:
+            resumed = run_isolated("_checkpoint_probe", workdir, steps, mid)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    elapsed = time.perf_counter() - t0
+    diff = [k for k in straight if k != "ticks" and straight[k] != resumed[k]]
+    for k in diff: print(f"   {k}: straight {straight[k]} != resumed {resumed[k]}")
+    failed += [f"{k} differs after resuming from hour {hours // 2}" for k in diff]
+    return {"per_op_us": elapsed / max(1, steps) * 1e6, "ops": steps, "bill": straight["bill"], "failed": failed}
+
+_IMPORT_PROBE = ("import sys, time; t0 = time.perf_counter(); import {mod}; dt = time.perf_counter() - t0; "
+                 "print(dt * 1000.0, *[m for m in {heavy!r} if m in sys.modules])")
+
+def bench_import_time(repeat=3):
+    """每个模块在全新解释器里冷导入 (取 repeat 次最快)，超出 IMPORT_BUDGETS 或带进了重量级依赖都算失败"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo + os.pathsep + os.environ.get("PYTHONPATH", ""), PYGAME_HIDE_SUPPORT_PROMPT="1")
+    modules, over = {}, []
+    for mod, (budget_ms, heavy) in IMPORT_BUDGETS.items():
+        best, leaked = float("inf"), []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE.format(mod=mod, heavy=tuple(heavy))],
+                                 env=env, capture_output=True, text=True, check=True).stdout.splitlines()[-1].split()
+            best = min(best, float(out[0])); leaked = out[1:]
+        modules[mod] = {"ms": best, "budget_ms": budget_ms, "leaked": leaked}
+        if best > budget_ms or leaked: over.append(mod)
+        print(f"   {mod:<20}{best:>8.1f} ms / {budget_ms} ms" + (f"  (loaded {', '.join(leaked)})" if leaked else "")
+              + ("  ❌" if mod in over else ""))
+    return {"per_op_us": sum(m["ms"] for m in modules.values()) * 1000.0 / len(modules), "ops": len(modules),
+            "modules": modules, "over_budget": over}
+
+BENCHMARKS = {
+    "import_time": bench_import_time,
+    "pmv_scalar": bench_pmv_scalar,
+    "pmv_legacy": bench_pmv_legacy,
+    "pmv_batch": bench_pmv_batch,
+    "pathfind": bench_pathfind,
+    "map_draw": bench_map_draw,
+    "character_draw": bench_character_draw,
+    "headless_day": bench_headless_day,
+    "tick_invariance": bench_tick_invariance,
+    "fast_forward": bench_fast_forward,
+    "checkpoint_resume": bench_checkpoint_resume,
+}
+
+# ---------------- 结果与对比 ----------------
+def compare(results, baseline, tolerance):
+    """返回退化项目列表；同时打印逐项对比表"""
+    regressions = []
+    print(f"\n{'benchmark':<16}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<16}{'-':>14}{r['per_op_us']:>14.2f}{'new':>10}")
+            continue
+        change = r["per_op_us"] / base["per_op_us"] - 1.0
+        flag = " ❌" if change > tolerance else ""
+        print(f"{name:<16}{base['per_op_us']:>14.2f}{r['per_op_us']:>14.2f}{change:>+9.1%}{flag}")
+        if change > tolerance: regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the simulation hot paths")
+    parser.add_argument("names", nargs="*", help=f"只跑这些项目 (默认全部: {', '.join(BENCHMARKS)})")
+    parser.add_argument("--out", default=BENCH_RESULTS_FILE)
+    parser.add_argument("--baseline", default=BENCH_BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果存为基线")
+    parser.add_argument("--compare", action="store_true", help="与基线对比，退化时退出码为 1")
+    parser.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE, help="允许的相对变慢比例")
+    args = parser.parse_args()
+
+    unknown = [n for n in args.names if n not in BENCHMARKS]
+    if unknown: parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    # 始终按表中顺序执行
+    names = [n for n in BENCHMARKS if not args.names or n in args.names]
+    repo = os.path.dirname(os.path.abspath(__file__))
+    out = os.path.abspath(args.out); baseline_path = os.path.abspath(args.baseline)
+
+    # 在临时目录里跑：记忆库 / 遥测 / 日志 / IDF 都不碰真实数据；素材按原路径可见
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    if os.path.isdir(os.path.join(repo, "assets")):
+        shutil.copytree(os.path.join(repo, "assets"), os.path.join(workdir, "assets"))
+    os.chdir(workdir)
+    random.seed(BENCH_SEED)
+    import numpy as np; np.random.seed(BENCH_SEED)
+    import pygame; pygame.init()
+    install_stubs()
+    from map_system import frame_atlas
+    frame_atlas.headless = False   # 绘制项目需要真实帧 (dummy 驱动下仍可 blit)
+
+    results = {}
+    try:
+        for name in names:
+            print(f"⏱️ {name} ...", flush=True)
+            results[name] = BENCHMARKS[name]()
+            print(f"   {results[name]['per_op_us']:.2f} us/op")
+    finally:
+        os.chdir(repo)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "seed": BENCH_SEED,
+              "python": sys.version.split()[0], "platform": platform.platform(), "results": results}
+    with open(out, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+    print(f"📄 Results -> {out}")
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f: json.dump(report, f, indent=2)
+        print(f"📌 Baseline -> {baseline_path}")
+    status = 0
+    over_budget = [m for r in results.values() for m in r.get("over_budget", [])]
+    if over_budget:
+        print(f"❌ Import budget exceeded: {', '.join(over_budget)}")
+        status = 1
+    failed = [f"{name}: {msg}" for name, r in results.items() for msg in r.get("failed", [])]
+    for msg in failed: print(f"❌ {msg}")
+    if failed: status = 1
+    if args.compare:
+        if not os.path.exists(baseline_path):
+            print(f"❌ No baseline at {baseline_path} (run with --save-baseline first)")
+            return 1
+        with open(baseline_path, encoding="utf-8") as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+        print("\n✅ No regressions.")
+    return status
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
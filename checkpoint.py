@@ -0,0 +1,171 @@
+import os
+import glob
+import zlib
+import random
+import pickle
+import queue
+import struct
+import threading
+import numpy as np
+from config import *
+import memory_store
+import lesson_index
+from waste_tracker import waste_tracker
+
+# ==============================================================================
+# 💾 全家状态检查点 (每个整点 / 每天 0 点)
+# 文件 = 8 字节魔数 + 版本号 + zlib(pickle)；仿真线程在锁内只 pickle 出一份快照，压缩与写盘交给后台线程。内容包括：
+#   state_ctx (账单 / 小时日志 ...)、空调浪费区间、agent_store 的全部数组、每个角色的行为状态与大脑、
+#   食物、空调日程、random / numpy 随机数状态、记忆库里此刻可见的反思规则，以及 EnergyPlus 的"重放点"
+# EnergyPlus 无法保存运行中的状态，恢复时从当天 0 点起按记录的 setpoint 改动全速重放到
+# 检查点所在的时间步 (见 simulation.replay_setpoints)，热状态与电表因此与原运行一致
+#   python main.py --resume latest                        -> 从最新检查点继续
+#   python main.py --resume ckpt --checkpoint-dir branch  -> 从某个检查点分叉出新的实验
+# ==============================================================================
+
+MAGIC = b"AIFAMCK\0"
+VERSION = 5
+
+# state_ctx 中只在运行期有意义、不写入检查点的键
+_RUNTIME_KEYS = ("running", "reflection_threads_started", "reflections_ready", "eplus_calls", "fast_forward", "fast_forward_log")
+
+class CheckpointStore:
+    def __init__(self, out_dir=CHECKPOINT_DIR, keep=CHECKPOINT_KEEP):
+        self.out_dir = out_dir
+        self.keep = keep
+        self._queue = queue.Queue()
+        self._thread = None
+
+    # ---------------- 采集 / 恢复 ----------------
+    @staticmethod
+    def capture(state_ctx, agents, sim, store, food):
+        """调用方需持有 world_lock 与 sim.lock；返回可直接 pickle 的 dict"""
+        n = store.n
+        return {
+            "day": state_ctx["day"], "hour": state_ctx["last_logged_hour"],
+            "state_ctx": {k: v for k, v in state_ctx.items() if k not in _RUNTIME_KEYS},
+            "store": {name: getattr(store, name)[:n].copy() for name in
+                      ("pos", "hunger", "energy", "happiness", "clothing", "pmv", "comfort",
+                       "action_timer", "room", "status", "fun", "play")},
+            "agents": {a.name: {
+                "status": a.status, "target_action": a.target_action, "direction": a.direction,
+                "current_frame": a.current_frame, "sim_time": a.sim_time, "last_think_time": a.last_think_time,
+                "last_room": a.last_room, "path": [(p[0], p[1]) for p in a.path],
+                "current_thought": a.current_thought, "bubble_timer": a.bubble_timer,
+                "brain": {"daily_rule": a.brain.daily_rule, "incoming_messages": list(a.brain.incoming_messages),
+                          "last_thought": a.brain.last_thought},
+            } for a in agents},
+            "food": food.get_count(),
+            "waste": waste_tracker.state(),
+            "ac_plan": {room: dict(hours) for room, hours in sim.ac_plan.items()},
+            "eplus": {"until_step": sim.callback_stats[1], "trace": list(sim.setpoint_trace)},
+            "rng": {"random": random.getstate(), "numpy": np.random.get_state()},
+            "memory": memory_store.memory_store.snapshot([a.name for a in agents]),
+        }
+
+    @staticmethod
+    def restore(ckpt, state_ctx, agents, sim, store, food, household=None):
+        """在新建好的世界上覆盖检查点状态 (EnergyPlus 由 replay_plan 另行重放)
+        household: 分叉实验的记忆库家庭编号 (None = 原地继续，沿用检查点里的)"""
+        memory_store.memory_store.rewind(ckpt["memory"], household)
+        lesson_index.reset()
+        state_ctx.update(ckpt["state_ctx"])
+        state_ctx["eplus_calls"] = ckpt["eplus"]["until_step"]
+        for name, arr in ckpt["store"].items(): getattr(store, name)[:len(arr)] = arr
+        store.reindex()
+        waste_tracker.load_state(ckpt["waste"])
+        for a in agents:
+            s = ckpt["agents"].get(a.name)
+            if s is None: continue
+            a.target_action = s["target_action"]
+            a.direction = s["direction"]; a.current_frame = s["current_frame"]
+            a.sim_time = s["sim_time"]; a.last_think_time = s["last_think_time"]; a.last_room = s["last_room"]
+            a.status = s["status"]
+            if s["status"] == "Thinking":
+                # 存档时正在等 LLM 回复的思考线程无法恢复，恢复后立即重新思考
+                a.status = "Idle"; a.last_think_time = -9999.0
+            a.path = [tuple(p) for p in s["path"]]
+            a.current_thought = s["current_thought"]; a.bubble_timer = s["bubble_timer"]
+            a.rect.center = (int(a.pos.x), int(a.pos.y))
+            a.brain.daily_rule = s["brain"]["daily_rule"]
+            a.brain.incoming_messages = list(s["brain"]["incoming_messages"])
+            a.brain.last_thought = s["brain"]["last_thought"]
+            a.has_mail = bool(s["brain"]["incoming_messages"])
+        with food.lock:
+            food.servings = ckpt["food"]
+            GLOBAL_GAME_STATE["food_servings"] = food.servings
+        sim.install_plan(ckpt["ac_plan"])
+        random.setstate(ckpt["rng"]["random"])
+        np.random.set_state(ckpt["rng"]["numpy"])
+
+    @staticmethod
+    def replay_plan(ckpt):
+        """传给 sim_manager.start(replay=...) 的 EnergyPlus 重放参数"""
+        return {"until_step": ckpt["eplus"]["until_step"], "trace": list(ckpt["eplus"]["trace"])}
+
+    # ---------------- 读写 ----------------
+    def path_for(self, day, hour):
+        return os.path.join(self.out_dir, f"day{day:03d}_h{hour:02d}.ckpt")
+
+    def save(self, ckpt):
+        return self._write(ckpt["day"], ckpt["hour"], pickle.dumps(ckpt, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def save_async(self, ckpt):
+        """仿真线程侧: 在 world_lock 内调用，pickle 即定格快照 (之后世界怎么变都不影响)，压缩写盘在后台"""
+        self._queue.put((ckpt["day"], ckpt["hour"], pickle.dumps(ckpt, protocol=pickle.HIGHEST_PROTOCOL)))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """等后台把排队的检查点写完"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=10.0)
+            self._thread = None
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None: return
+            try: self._write(*job)
+            except Exception as e: print(f"Checkpoint error: {e}")
+
+    def _write(self, day, hour, raw):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = self.path_for(day, hour)
+        body = zlib.compress(raw)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC); f.write(struct.pack("<I", VERSION)); f.write(body)
+        os.replace(tmp, path)
+        self.prune()
+        return path
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f: data = f.read()
+        if data[:len(MAGIC)] != MAGIC: raise ValueError(f"{path} is not a checkpoint file")
+        version, = struct.unpack_from("<I", data, len(MAGIC))
+        if version != VERSION: raise ValueError(f"{path}: unsupported checkpoint version {version}")
+        return pickle.loads(zlib.decompress(data[len(MAGIC) + 4:]))
+
+    def latest(self):
+        files = sorted(glob.glob(os.path.join(self.out_dir, "day*_h*.ckpt")))
+        return files[-1] if files else None
+
+    def resolve(self, name):
+        """--resume 参数: "latest" 或具体文件路径"""
+        path = self.latest() if name == "latest" else name
+        if not path or not os.path.exists(path): raise FileNotFoundError(f"No checkpoint found: {name}")
+        return path
+
+    def prune(self):
+        """每天 0 点的检查点永久保留，其余只留最近 keep 个"""
+        if self.keep <= 0: return
+        hourly = [p for p in sorted(glob.glob(os.path.join(self.out_dir, "day*_h*.ckpt"))) if not p.endswith("_h00.ckpt")]
+        for p in hourly[:-self.keep]:
+            try: os.remove(p)
+            except OSError: pass
+
+checkpoints = CheckpointStore()
@@ -9,13 +9,36 @@ COMFORT_VS_COST_WEIGHT = 1
 # 家庭每日电费预算 (超过这个值，全家都会觉得"穷"并感到恐慌)
 DAILY_BUDGET_LIMIT = 20.0 
 
+# 电价方案 (tariff.py 在仿真开始前编译成逐时间步的电价向量)
+# hours 中的小时为 EnergyPlus 的 hour (0-23)，未列出的小时取 default 档位
+TARIFF_NAME = "beijing_tou"
+TARIFFS = {
+    "beijing_tou": {
+        "bands": {"valley": 0.30, "flat": 0.90, "peak": 1.50},
+        "default": "flat",
+        "hours": {
+            "weekday": {"valley": [1, 2, 3, 4, 5, 6, 7], "peak": [11, 12, 13, 14, 15, 19, 20, 21]},
+            "weekend": None,       # None = 与工作日相同
+        },
+        "seasons": [],             # 例: [{"months": [7, 8], "bands": {"peak": 1.80}}] 覆盖对应月份的档位价格
+        "tiers": [],               # 阶梯电价 [(当日累计 kWh 门槛, 超出部分每 kWh 加价)]
+        "demand_charge": 0.0,      # 需量电费: 每 kW 当日最大功率
+    },
+    "flat": {"bands": {"flat": 0.60}, "default": "flat", "hours": {"weekday": {}}},
+}
+
 # ================= 🔧 基础配置 =================
 API_KEY = "xxx" 
 BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+LLM_STREAM = True   # 决策流式返回: action/target 一到就开始行动，thought 边收边显示 (False = 等完整回复)
 
 EPLUS_DIR = r"C:\EnergyPlusV23-1-0" #找到你安装的Energyplus版本
 WEATHER_FILE = "CHN_Beijing.Beijing.545110_CSWD.epw" # 对应的天气文件
 IDF_NAME = "Merged_House.idf"
+RUN_MONTH, RUN_DAY = 1, 1   # 仿真日期 (IDF RunPeriod 与天气预报共用)
+RUN_WEEKDAY = "Monday"      # 仿真当天是星期几 (IDF RunPeriod 与电价的工作日/周末共用)
+EPLUS_TIMESTEPS_PER_HOUR = 6  # IDF Timestep
+EPLUS_OUT_DIR = "out_sim"   # 实际输出目录为 out_sim_0 / out_sim_1 (新旧进程轮流使用)
 
 # --- 尺寸配置 ---
 MAP_WIDTH = 1024
@@ -25,12 +48,31 @@ WINDOW_WIDTH = MAP_WIDTH + UI_BAR_WIDTH
 WINDOW_HEIGHT = MAP_HEIGHT
 
 # 运行参数
-FPS = 30
+FPS = 30                # 渲染帧率
+SIM_TICK_RATE = 30      # 仿真循环 tick/s (0 = 不限速，全速跑)
 GRID_SIZE = 32
 SPRITE_SCALE = 3
+SPRITE_CACHE_DIR = ".sprite_cache"  # 缩放后帧的磁盘缓存
 ANIMATION_SPEED = 0.1
 MOVE_SPEED = 3.0
 
+# ⏱️ 固定步长物理 (单位: 仿真秒，数值由原先 30 FPS 下的"每帧"参数换算)
+SIM_DT = 1.0 / 30            # 每个物理步长代表的仿真秒数
+MAX_CATCHUP_STEPS = 8        # 单个 tick 最多补多少步，防止慢帧后雪崩
+HUNGER_DECAY = 2.4           # 饥饿值 %/s (原 0.08/帧)
+ENERGY_DECAY = 1.2           # 精力 %/s (原 0.04/帧)
+HAPPY_DECAY = 1.5            # 快乐 %/s (原 0.05/帧)
+FUN_GAIN = 9.0               # 娱乐时快乐 %/s
+SLEEP_ENERGY_GAIN = 9.0      # 睡觉时精力 %/s
+SLEEP_HAPPY_GAIN = 3.0       # 睡觉时快乐 %/s
+SPATIAL_CELL_SIZE = 64       # 角色空间哈希的格子边长 px
+CHAT_RADIUS = 80.0           # 点对点聊天需要的距离 px
+AGENT_SPEED = 240.0          # 行走速度 px/s (原 8 px/帧)
+ACTION_DURATION = 200 / 30   # 娱乐动作持续 s
+BUBBLE_DURATION = 10.0       # 气泡显示 s
+THINK_COOLDOWN = 3.0         # 两次思考最小间隔 s
+TEXT_CACHE_SIZE = 512   # 文字渲染缓存容量 (LRU)
+
 # 颜色
 WHITE = (255, 255, 255); BLACK = (0, 0, 0); GRAY = (200, 200, 200)
 FLOOR_COLOR = (240, 230, 210); WALL_COLOR = (40, 40, 50)
@@ -41,11 +83,102 @@ UI_BG_COLOR = (30, 30, 40)
 DIR_DOWN, DIR_LEFT, DIR_RIGHT, DIR_UP = 0, 1, 2, 3
 
 # ==================================================================================
-# 🌡️ 共享内存索引定义
-# 0: Hour, 1-3: Temp, 4-6: Setpoint, 7: Price, 8: Power, 9: Bill, 10-12: Humidity
-# 13: Outdoor Temp
+# 🏠 代理热力学模型参数 (与 IDF 中的房间尺寸 / 围护结构 / IdealLoads 容量对应)
+# ua: 围护结构传热 W/K, c: 有效热容 J/K, hvac_w: 空调容量 W
+# ==================================================================================
+THERMAL_ZONE_PARAMS = {
+    "LivingRoom": {"ua": 290.0, "c": 5.0e6, "hvac_w": 3000.0, "gain_w": 150.0},
+    "MasterRoom": {"ua": 105.0, "c": 1.6e6, "hvac_w": 1500.0, "gain_w": 60.0},
+    "KidsRoom":   {"ua": 105.0, "c": 1.6e6, "hvac_w": 1500.0, "gain_w": 60.0},
+}
+HVAC_COP = 3.0           # 空调能效比 (热量 kWh -> 电量 kWh)
+HVAC_EQUIPMENT = {       # 每个房间的空调设备模型: 制热 / 制冷 COP，开机待机功率 W
+    "LivingRoom": {"heat_cop": HVAC_COP, "cool_cop": HVAC_COP, "standby_w": 10.0},
+    "MasterRoom": {"heat_cop": HVAC_COP, "cool_cop": HVAC_COP, "standby_w": 5.0},
+    "KidsRoom":   {"heat_cop": HVAC_COP, "cool_cop": HVAC_COP, "standby_w": 5.0},
+}
+HVAC_OFF_SETPOINT = 1.0  # setpoint <= 这个值 = 空调关 (EnergyPlus 执行器、待机计费、代理模型、浪费追踪共用)
+THERMAL_DT = 600.0       # 代理模型步长 s (与 EnergyPlus Timestep=6 对应)
+COUNTERFACTUAL_WORKERS = 4    # 反事实推演进程数
+COUNTERFACTUAL_TIMEOUT = 8.0  # 日终反思中等待反事实结果的上限 s
+
+# 🧮 MPC 空调日程优化 ([Optimize_AC])
+OCCUPANCY_PLAN = {           # 家庭作息：每个房间有人的小时
+    "LivingRoom": list(range(7, 22)),
+    "MasterRoom": list(range(0, 7)) + list(range(21, 24)),
+    "KidsRoom":   list(range(0, 7)) + list(range(21, 24)),
+}
+MPC_SETPOINTS = (0.0,) + tuple(float(t) for t in range(16, 27))  # 候选 setpoint (0 = 关机)
+MPC_TEMP_GRID = (5.0, 32.0, 0.5)  # 动态规划的室温网格 (最低, 最高, 步长) °C
+MPC_DISCOMFORT_COST = 3.0    # 权重为 1 时，一个有人房间 |PMV|=1 持续一小时折合多少元
+
+# ⏱️ 帧耗时分析器 (frame_profiler.py)
+PROFILER_TOGGLE_KEY = "f3"       # 显示 / 隐藏耗时叠加层
+PROFILER_CAPTURE_KEY = "f4"      # 录制接下来 N 帧的 cProfile + Chrome trace
+PROFILER_WINDOW = 240            # 每个计时项保留的滚动样本数
+PROFILER_CAPTURE_FRAMES = 300
+PROFILER_HIST_BINS = 12
+PROFILE_DIR = "profiles"
+
+# 🕰️ 建筑时钟：智能体物理与 EnergyPlus 锁步推进，每个 EnergyPlus 时间步 (10 分钟) 固定对应
+# SIM_STEPS_PER_EPLUS_STEP 个 SIM_DT 物理步，与 tick 率 / 帧率 / 快进无关；EnergyPlus 等智能体走完这些步再算下一步
+EPLUS_STEP_DELAY = 0.8           # 每个 EnergyPlus 时间步对应的智能体仿真秒数 (正常速度下约等于墙钟秒数)
+SIM_STEPS_PER_EPLUS_STEP = round(EPLUS_STEP_DELAY / SIM_DT)
+
+# ⏩ 夜间快进：全家都在睡且有人的房间都在睡眠舒适温度内时，仿真循环不再限速，跳过渲染与 LLM 调用
+# (睡眠时 met 0.7 / clo 1.0 的 PMV 在常见卧室温度下就已接近 -3 的截断值，无法用 |PMV| 判断睡得舒不舒服，改看室温)
+FAST_FORWARD_SLEEP_TEMP = (16.0, 26.0)   # 盖被睡觉的舒适室温 °C，任何有人的房间超出即退出快进
+FAST_FORWARD_WAKE_HOUR = 6       # 到这个钟点退出快进 (强制睡觉时段为 21:00-06:00)
+FAST_FORWARD_FPS = 4             # 快进期间窗口只刷新一行进度
+
+# 💾 检查点 (checkpoint.py)
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_EVERY_HOURS = 1       # 每隔几个仿真小时存一次 (0 = 只在每天 0 点存)
+CHECKPOINT_KEEP = 48             # 保留最近多少个非 0 点的检查点 (每天 0 点的永久保留)
+EPLUS_REPLAY_TIMEOUT = 600.0     # 恢复时 EnergyPlus 重放到检查点的最长等待 s
+
+# ⏱️ 基准测试 (benchmark.py)
+BENCH_SEED = 1234
+BENCH_RESULTS_FILE = "benchmark_results.json"
+BENCH_BASELINE_FILE = "benchmark_baseline.json"
+BENCH_TOLERANCE = 0.15       # 比基线慢超过 15% 视为退化
+BENCH_EPLUS_STEP_S = 0.01    # EnergyPlus 桩每个时间步模拟的计算耗时 s
+IMPORT_BUDGETS = {           # 模块: (新进程冷导入上限 ms, 导入后不应被顺带加载的重量级依赖)
+    "thermal_model":      (150, ("openai", "pygame", "pyenergyplus")),
+    "simulation":         (200, ("openai", "pygame", "pyenergyplus")),
+    "setpoint_optimizer": (200, ("openai", "pygame", "pyenergyplus")),
+    "reflection":         (200, ("openai", "pygame", "pyenergyplus")),
+    "agent_brain":        (200, ("openai", "pygame", "pyenergyplus")),
+    "agent_store":        (200, ("openai", "pygame", "pyenergyplus")),
+    "map_system":         (400, ("openai", "pyenergyplus")),
+}
+
+# ==================================================================================
+# 🏠 EnergyPlus 房间表 (IDF 生成 / 句柄表 / 共享内存槽位都由它驱动，加房间只需加一行)
+# room: IDF Zone 名, key: 日程名前缀, geometry: (x, y, w, d, h) m, capacity: IdealLoads 容量 W
+# idf_heat_sp: IDF 中制热日程的默认值, init_sp: 每天开始时共享内存里的 setpoint
+# 另需在 THERMAL_ZONE_PARAMS / HVAC_EQUIPMENT 中给出该房间的参数
 # ==================================================================================
-SHARED_ARRAY_SIZE = 17 
+HVAC_ZONES = [
+    {"room": "LivingRoom", "key": "Living", "geometry": (0, 0, 10, 10, 3), "capacity": 3000, "idf_heat_sp": 20.0, "init_sp": 22.0},
+    {"room": "MasterRoom", "key": "Master", "geometry": (10, 0, 5, 5, 3),  "capacity": 1500, "idf_heat_sp": 18.0, "init_sp": 20.0},
+    {"room": "KidsRoom",   "key": "Kids",   "geometry": (10, 5, 5, 5, 3),  "capacity": 1500, "idf_heat_sp": 22.0, "init_sp": 24.0},
+]
+HVAC_ZONE_KEYS = [(z["room"], z["key"]) for z in HVAC_ZONES]  # (房间, 句柄前缀)
+ZONE_INDEX = {z["room"]: i for i, z in enumerate(HVAC_ZONES)}
+N_ZONES = len(HVAC_ZONES)
+
+# ==================================================================================
+# 🌡️ 共享内存布局: 8 个全局槽位，之后每个逐房间的量占连续 N_ZONES 个槽位 (顺序同 HVAC_ZONES)
+# ==================================================================================
+SLOT_HOUR, SLOT_PRICE, SLOT_POWER, SLOT_BILL, SLOT_OUT_T = 0, 1, 2, 3, 4
+SLOT_CB_MS, SLOT_CB_COUNT, SLOT_SIM_STEPS = 5, 6, 7   # EnergyPlus 回调耗时 ms / 回调次数 / 智能体已走的物理步数 (锁步用)
+ZONE_T = 8                       # 室温
+ZONE_SP = ZONE_T + N_ZONES       # 制热 setpoint (<= HVAC_OFF_SETPOINT = 空调关)
+ZONE_RH = ZONE_SP + N_ZONES      # 相对湿度
+ZONE_KW = ZONE_RH + N_ZONES      # 房间空调功率 kW
+ZONE_COST = ZONE_KW + N_ZONES    # 房间当天累计电费
+SHARED_ARRAY_SIZE = ZONE_COST + N_ZONES
 
 # 全局游戏状态 (用于地图显示食物)
 GLOBAL_GAME_STATE = {
@@ -54,4 +187,24 @@ GLOBAL_GAME_STATE = {
 
 # 记忆存储文件
 MEMORY_FILE = "agent_evolution.json"
-CSV_LOG_FILE = "pareto_data.csv"
\ No newline at end of file
+MEMORY_DB_FILE = "agent_memory.db"   # 所有家庭/角色的反思历史 (SQLite WAL)
+HOUSEHOLD_ID = "default"             # 多户并行仿真时用于区分记忆
+MESSAGE_INBOX_SIZE = 3               # 每个角色收件箱保留的最新消息条数
+LESSON_TOP_K = 3                     # 每次决策/反思检索的历史经验条数
+REFLECTION_DEADLINE = 20.0           # 日终反思全局等待上限 (秒)，超时的结果稍后再生效
+REFLECTION_WORKERS = 8               # 并发反思线程数
+CSV_LOG_FILE = "pareto_data.csv"
+
+# 空调浪费 (空房间开着空调，单位: EnergyPlus 仿真小时)
+WASTE_PENALTY_HOURS = 2.0     # 全家当天累计超过此值 -> 反思里触发严重惩罚
+WASTE_ROOM_HOURS = 1.0        # 单个房间超过此值 -> 列为浪费地点
+
+# 遥测日志 (每个仿真步长一行，每天一个文件)
+TELEMETRY_DIR = "telemetry"
+TELEMETRY_FORMAT = "parquet"   # "parquet" 或 "arrow" (未安装 pyarrow 时自动退化为 csv)
+TELEMETRY_FLUSH_ROWS = 1024    # 攒够多少行交给后台线程写一次
+
+# Pareto 分析 (输入为 CSV_LOG_FILE 中的每日汇总，全部目标均为最小化)
+PARETO_OBJECTIVES = ("bill", "avg_discomfort", "waste_total")
+PARETO_STATE_FILE = ".pareto_state.json"
+PARETO_FRONTIER_FILE = "pareto_frontier.csv"
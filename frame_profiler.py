@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import threading
+import cProfile
+from collections import deque
+from config import *
+
+# ==============================================================================
+# ⏱️ 帧耗时分析器
+# 各子系统用 profiler.scope("名字") 包住热点代码，耗时 (ms) 进入每个名字的滚动窗口；
+# F3 打开屏幕叠加层 (均值 / p95 / 最大值 + 分布直方图)，F4 录制接下来 N 帧：
+# 渲染线程与仿真线程各一份 cProfile (.render.prof / .sim.prof，可用 pstats / snakeviz 查看)
+# + 所有线程的 Chrome trace (.json，拖进 chrome://tracing 或 Perfetto)。关闭时 scope() 返回空操作，几乎没有开销
+# ==============================================================================
+
+class _NullScope:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NULL_SCOPE = _NullScope()
+
+class _Scope:
+    __slots__ = ("prof", "name", "t0")
+    def __init__(self, prof, name):
+        self.prof = prof; self.name = name
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+    def __exit__(self, *exc):
+        self.prof.record(self.name, (time.perf_counter() - self.t0) * 1000.0, self.t0)
+        return False
+
+class _LockScope:
+    """计时等待锁的时间 (记为 lock.<名字>)，然后持有锁直到退出"""
+    __slots__ = ("prof", "lock", "name", "t0")
+    def __init__(self, prof, lock, name):
+        self.prof = prof; self.lock = lock; self.name = name
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        self.lock.acquire()
+        self.prof.record(self.name, (time.perf_counter() - self.t0) * 1000.0, self.t0)
+        return self
+    def __exit__(self, *exc):
+        self.lock.release()
+        return False
+
+class FrameProfiler:
+    def __init__(self, window=PROFILER_WINDOW, out_dir=PROFILE_DIR):
+        self.enabled = False
+        self.window = window
+        self.out_dir = out_dir
+        self.samples = {}            # 名字 -> deque[ms]
+        self._capture = None         # 录制中: {"frames_left", "events", "t0", "stamp"}
+        self._local = threading.local()   # 本线程正在跑的 (cProfile, 所属录制, 线程名)
+
+    # ---------------- 埋点 ----------------
+    def scope(self, name):
+        return _Scope(self, name) if self.enabled else _NULL_SCOPE
+
+    def lock(self, lock, name):
+        return _LockScope(self, lock, f"lock.{name}") if self.enabled else lock
+
+    def record(self, name, ms, start=None):
+        if not self.enabled: return
+        q = self.samples.get(name)
+        if q is None: q = self.samples.setdefault(name, deque(maxlen=self.window))
+        q.append(ms)
+        cap = self._capture
+        if cap is not None and start is not None:
+            cap["events"].append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                  "ts": (start - cap["t0"]) * 1e6, "dur": ms * 1000.0})
+
+    # ---------------- 控制 ----------------
+    def toggle(self):
+        self.enabled = not self.enabled
+        if not self.enabled: self.samples.clear()
+        return self.enabled
+
+    def start_capture(self, frames=PROFILER_CAPTURE_FRAMES):
+        """从下一帧起录制 frames 帧；在渲染线程调用 (cProfile 只跟踪当前线程，仿真线程由 thread_tick 跟上)"""
+        if self._capture is not None: return
+        self.enabled = True
+        self._capture = {"frames_left": frames, "events": [], "t0": time.perf_counter(),
+                         "stamp": time.strftime("%Y%m%d-%H%M%S")}
+        self._begin_thread(self._capture, "render")
+        print(f"🎬 Profiling next {frames} frames...")
+
+    def thread_tick(self, name):
+        """渲染线程以外的循环 (仿真线程) 每轮调用一次：录制开始后在本线程也打开 cProfile，
+        录制结束后停下并单独落盘为 frames_<时间>.<name>.prof"""
+        cur = getattr(self._local, "prof", None)
+        cap = self._capture
+        if cur is None:
+            if cap is not None: self._begin_thread(cap, name)
+        elif cur[1] is not cap:
+            print(f"💾 Profile ({name}) -> {self._end_thread()}")
+
+    def _begin_thread(self, cap, name):
+        prof = cProfile.Profile()
+        self._local.prof = (prof, cap, name)
+        prof.enable()
+
+    def _end_thread(self):
+        prof, cap, name = self._local.prof
+        prof.disable(); self._local.prof = None
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"frames_{cap['stamp']}.{name}.prof")
+        prof.dump_stats(path)
+        return path
+
+    def end_frame(self):
+        """渲染循环每帧末尾调用；录制满 N 帧后落盘 (仿真线程的 .prof 由它自己在下一轮写出)"""
+        cap = self._capture
+        if cap is None: return
+        cap["frames_left"] -= 1
+        if cap["frames_left"] > 0: return
+        self._capture = None
+        prof_path = self._end_thread()
+        trace_path = os.path.join(self.out_dir, f"frames_{cap['stamp']}.trace.json")
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": cap["events"], "displayTimeUnit": "ms"}, f)
+        print(f"💾 Profile -> {prof_path} | Chrome trace -> {trace_path}")
+
+    # ---------------- 统计与显示 ----------------
+    def stats(self):
+        """[(名字, 样本数, 均值, p95, 最大值, 直方图)]，按均值从大到小"""
+        rows = []
+        for name, q in list(self.samples.items()):
+            vals = sorted(q)
+            if not vals: continue
+            n = len(vals); hi = vals[-1]
+            hist = [0] * PROFILER_HIST_BINS
+            for v in vals: hist[min(PROFILER_HIST_BINS - 1, int(v / hi * PROFILER_HIST_BINS)) if hi > 0 else 0] += 1
+            rows.append((name, n, sum(vals) / n, vals[min(n - 1, int(n * 0.95))], hi, hist))
+        return sorted(rows, key=lambda r: r[2], reverse=True)
+
+    def draw(self, screen, font, x=10, y=10):
+        import pygame
+        from render_cache import text_cache
+        rows = self.stats()
+        line_h = font.get_linesize()
+        w, h = 470, (len(rows) + 2) * line_h + 10
+        panel = pygame.Surface((w, h), pygame.SRCALPHA); panel.fill((0, 0, 0, 190))
+        screen.blit(panel, (x, y))
+        title = "PROFILER  [F3 hide | F4 capture]" + ("  ● REC" if self._capture else "")
+        screen.blit(text_cache.render(font, title, SELECTION_COLOR), (x + 6, y + 4))
+        screen.blit(text_cache.render(font, f"{'scope':<20}{'mean':>7}{'p95':>7}{'max':>7}  ms", GRAY), (x + 6, y + 4 + line_h))
+        for i, (name, n, mean, p95, hi, hist) in enumerate(rows):
+            ry = y + 4 + (i + 2) * line_h
+            c = RED if p95 > 1000.0 / FPS else WHITE
+            # 数值每帧都变，直接渲染，不进共享的文字缓存 (否则会把 HUD 的常用文字挤出 LRU)
+            screen.blit(font.render(f"{name[:20]:<20}{mean:>7.2f}{p95:>7.2f}{hi:>7.2f}", True, c), (x + 6, ry))
+            top = max(hist)
+            for b, cnt in enumerate(hist):   # 迷你直方图
+                bh = int(cnt / top * (line_h - 4)) if top else 0
+                pygame.draw.rect(screen, GREEN, (x + w - 8 - (PROFILER_HIST_BINS - b) * 5, ry + line_h - 2 - bh, 4, bh))
+
+profiler = FrameProfiler()
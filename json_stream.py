@@ -0,0 +1,96 @@
+import json
+
+# ==============================================================================
+# 🧩 流式 JSON 对象解析
+# LLM 按 token 流式返回 {"action": ..., "target": ..., "thought": ..., "message": ...}；
+# 每喂入一段文本就推进状态机，某个字段的值一闭合就出现在 fields 里，
+# 正在流式输出的字符串值可以用 streaming() 取到当前片段 (用于边收边显示 thought)
+# 只解析顶层对象；嵌套的数组 / 对象作为原始文本收集，闭合后再整体 json.loads
+# ==============================================================================
+
+_OBJ, _KEY, _COLON, _VALUE, _STR, _RAW, _NEXT, _DONE = range(8)
+
+def _decode(raw, partial=False):
+    if partial:
+        # 去掉尚未收全的转义 (结尾的 \ 或不完整的 \uXXXX)
+        cut = raw.rfind("\\")
+        if cut != -1 and (cut == len(raw) - 1 or (raw[cut + 1] == "u" and len(raw) - cut < 6)): raw = raw[:cut]
+    try: return json.loads(f'"{raw}"')
+    except ValueError: return raw
+
+class JsonObjectStream:
+    def __init__(self):
+        self.fields = {}       # 已经完整的字段
+        self.state = _OBJ
+        self.key = None        # 当前值所属的键
+        self.in_key = False    # 字符串状态下: 正在读键还是值
+        self.esc = False
+        self.cur = []          # 当前字符串 / 原始值的字符
+        self.depth = 0; self.raw_str = False; self.raw_esc = False
+        self.chunks = []
+
+    @property
+    def done(self): return self.state == _DONE
+
+    def feed(self, text):
+        """喂入一段文本，返回本段内新完成的键列表"""
+        self.chunks.append(text)
+        completed = []
+        for ch in text:
+            st = self.state
+            if st == _STR:
+                if self.esc: self.esc = False
+                elif ch == "\\": self.esc = True
+                elif ch == '"':
+                    raw = "".join(self.cur); self.cur = []
+                    if self.in_key:
+                        self.key = _decode(raw); self.state = _COLON
+                    else:
+                        self.fields[self.key] = _decode(raw); completed.append(self.key); self.state = _NEXT
+                    continue
+                self.cur.append(ch)
+            elif st == _RAW:
+                if self.raw_str:
+                    if self.raw_esc: self.raw_esc = False
+                    elif ch == "\\": self.raw_esc = True
+                    elif ch == '"': self.raw_str = False
+                elif ch == '"': self.raw_str = True
+                elif ch in "[{": self.depth += 1
+                elif ch in "]}" and self.depth > 0: self.depth -= 1
+                elif ch in ",}" and self.depth == 0:
+                    raw = "".join(self.cur).strip(); self.cur = []
+                    try: self.fields[self.key] = json.loads(raw)
+                    except ValueError: self.fields[self.key] = raw
+                    completed.append(self.key)
+                    self.state = _KEY if ch == "," else _DONE
+                    continue
+                self.cur.append(ch)
+            elif st == _OBJ:
+                if ch == "{": self.state = _KEY
+            elif st == _KEY:
+                if ch == '"': self.in_key = True; self.state = _STR
+                elif ch == "}": self.state = _DONE
+            elif st == _COLON:
+                if ch == ":": self.state = _VALUE
+            elif st == _VALUE:
+                if ch == '"': self.in_key = False; self.state = _STR
+                elif not ch.isspace():
+                    self.state = _RAW; self.cur = [ch]
+                    self.depth = 1 if ch in "[{" else 0; self.raw_str = False; self.raw_esc = False
+            elif st == _NEXT:
+                if ch == ",": self.state = _KEY
+                elif ch == "}": self.state = _DONE
+        return completed
+
+    def streaming(self):
+        """(键, 目前收到的字符串片段)；当前没有正在输出的字符串值时为 None"""
+        if self.state != _STR or self.in_key: return None
+        return self.key, _decode("".join(self.cur), partial=True)
+
+    def result(self):
+        """完整结果：优先按整段文本解析，失败时退回已完成的字段"""
+        text = "".join(self.chunks).replace("```json", "").replace("```", "").strip()
+        try: return json.loads(text)
+        except ValueError:
+            if self.fields: return dict(self.fields)
+            raise
@@ -0,0 +1,22 @@
+import sys
+import threading
+
+# ==============================================================================
+# 🐢 模块级单例延迟构造 (PEP 562 模块 __getattr__)
+# 用法: __getattr__ = lazy_singletons(__name__, {"house_map": HouseMap})
+# 第一次访问 (包括 from x import house_map) 时才构造，随后写回模块字典，
+# 之后的访问走普通属性查找，没有额外开销。导入模块本身不再付出构造代价
+# ==============================================================================
+
+_lock = threading.RLock()   # 可重入：一个单例的构造过程里可能用到另一个单例
+
+def lazy_singletons(module_name, factories):
+    module = sys.modules[module_name]
+    def __getattr__(name):
+        factory = factories.get(name)
+        if factory is None:
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+        with _lock:
+            if name not in module.__dict__: module.__dict__[name] = factory()
+        return module.__dict__[name]
+    return __getattr__
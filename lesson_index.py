@@ -0,0 +1,125 @@
+import re
+import math
+import threading
+from collections import defaultdict, Counter
+from config import *
+import memory_store
+
+# ==============================================================================
+# 📚 过往经验检索 (本地 BM25)
+# 每条历史规则 + 当天结果 (电费/体感/浪费/天气) 作为一篇文档；
+# think / reflect 时用当前情境检索 top-k 条，提示词长度与历史长度无关
+# ==============================================================================
+
+_WORD_RE = re.compile(r"[a-z]+")
+_STOPWORDS = {"the", "a", "an", "to", "and", "or", "of", "in", "on", "at", "is", "are", "be", "if",
+              "it", "for", "with", "when", "i", "we", "you", "my", "our", "your", "this", "that", "than"}
+
+def tokenize(text):
+    return [w for w in _WORD_RE.findall(str(text).lower()) if w not in _STOPWORDS and len(w) > 1]
+
+def situation_tokens(bill=None, pmv=None, waste=None, out_temp=None, hour=None):
+    """把数值情境离散成标签词，文档与查询共用同一套"""
+    toks = []
+    if bill is not None:
+        toks.append("bill_over" if bill > DAILY_BUDGET_LIMIT else ("bill_mid" if bill > DAILY_BUDGET_LIMIT * 0.5 else "bill_low"))
+    if pmv is not None:
+        toks.append("feel_hot" if pmv > 0.5 else ("feel_cold" if pmv < -0.5 else "feel_neutral"))
+    if waste:
+        toks.append("waste_alert")
+    if out_temp is not None:
+        toks.append("weather_cold" if out_temp < 10 else ("weather_hot" if out_temp > 28 else "weather_mild"))
+    if hour is not None:
+        h = int(hour) % 24
+        toks.append("time_night" if h >= 22 or h < 6 else ("time_morning" if h < 12 else ("time_afternoon" if h < 18 else "time_evening")))
+    return toks
+
+def lesson_tokens(rec):
+    meta = rec.get("meta") or {}
+    return tokenize(rec["rule"]) + situation_tokens(
+        bill=rec.get("bill"), pmv=meta.get("worst_pmv"), waste=meta.get("waste", 0) > WASTE_PENALTY_HOURS,
+        out_temp=meta.get("out_temp"), hour=meta.get("worst_hour"))
+
+def format_lesson(rec):
+    parts = [f"Day {rec['day']}" if rec.get("day") is not None else "Earlier"]
+    if rec.get("bill") is not None: parts.append(f"bill ${rec['bill']:.2f}")
+    meta = rec.get("meta") or {}
+    if meta.get("worst_pmv") is not None: parts.append(f"worst PMV {meta['worst_pmv']:.1f}")
+    if meta.get("waste"): parts.append(f"waste {meta['waste']:.1f}h")
+    if meta.get("out_temp") is not None: parts.append(f"outdoor {meta['out_temp']:.0f}C")
+    return f"- ({', '.join(parts)}) {rec['rule']}"
+
+class LessonIndex:
+    """倒排索引 + BM25，增量添加，检索只遍历查询词的倒排表"""
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.docs = []
+        self.ids = set()
+        self.doc_len = []
+        self.postings = defaultdict(dict)   # term -> {doc_id: tf}
+        self.total_len = 0
+
+    def add(self, rec):
+        toks = lesson_tokens(rec)
+        with self.lock:
+            if rec.get("id") in self.ids: return
+            self.ids.add(rec.get("id"))
+            doc_id = len(self.docs)
+            self.docs.append(rec)
+            self.doc_len.append(len(toks))
+            self.total_len += len(toks)
+            for t, tf in Counter(toks).items(): self.postings[t][doc_id] = tf
+
+    def search(self, query_tokens, k=LESSON_TOP_K, exclude_rule=None):
+        with self.lock:
+            n = len(self.docs)
+            if n == 0: return []
+            avg_len = self.total_len / n
+            scores = defaultdict(float)
+            for t in set(query_tokens):
+                plist = self.postings.get(t)
+                if not plist: continue
+                idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_id, tf in plist.items():
+                    norm = tf + self.K1 * (1 - self.B + self.B * self.doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (self.K1 + 1) / norm
+            # 同分时新的经验优先
+            ranked = sorted(scores.items(), key=lambda x: (-x[1], -x[0]))
+            out = []
+            for doc_id, _ in ranked:
+                rec = self.docs[doc_id]
+                if exclude_rule is not None and rec["rule"] == exclude_rule: continue
+                out.append(rec)
+                if len(out) >= k: break
+            return out
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_subscribed = False
+
+def get_lesson_index(agent, household=None):
+    """首次使用时从记忆库全量建索引，之后靠 memory_store 的写入回调增量更新"""
+    global _subscribed
+    store = memory_store.memory_store
+    key = (household or store.household, agent)
+    with _indexes_lock:
+        if not _subscribed:
+            store.subscribe(_on_new_memory); _subscribed = True
+        idx = _indexes.get(key)
+        if idx is None:
+            idx = LessonIndex()
+            for rec in store.history(agent, key[0]): idx.add(rec)
+            _indexes[key] = idx
+        return idx
+
+def reset():
+    """记忆库 rewind 之后丢掉已建的索引，下次使用时按新的可见范围重建"""
+    with _indexes_lock: _indexes.clear()
+
+def _on_new_memory(household, agent, rec):
+    with _indexes_lock:
+        idx = _indexes.get((household, agent))
+    if idx is not None: idx.add(rec)
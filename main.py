@@ -1,26 +1,36 @@
 import pygame
 import sys
 import os
+import time
+import argparse
 import multiprocessing
 import threading
 import traceback 
 from config import *
 from simulation import sim_manager
-from map_system import house_map
+from map_system import house_map, frame_atlas
 from agent_sprite import Character 
+from agent_store import agent_store
+from telemetry import telemetry
+from reflection import summarize_day, reflection_pipeline
 from agent_brain import GLOBAL_FOOD
+from render_cache import text_cache, get_font
+from world_snapshot import WorldSnapshot, SnapshotBuffer, interpolation_alpha, interpolate_agents
+from frame_profiler import profiler
+from checkpoint import checkpoints
+from waste_tracker import waste_tracker
 
 class Button:
     def __init__(self, x, y, w, h, text, callback):
         self.rect = pygame.Rect(x, y, w, h)
-        self.text = text; self.callback = callback; self.hover = False; self.enabled = True; self.font = pygame.font.SysFont("arial", 18, bold=True)
+        self.text = text; self.callback = callback; self.hover = False; self.enabled = True; self.font = get_font("arial", 18, bold=True)
     def update_text(self, new_text): self.text = new_text
     def set_enabled(self, val): self.enabled = val
     def draw(self, screen):
         color = (0, 180, 0) if (self.hover and self.enabled) else ((50, 50, 50) if self.enabled else (60, 60, 60))
         pygame.draw.rect(screen, color, self.rect, border_radius=8)
         pygame.draw.rect(screen, (200, 200, 200), self.rect, 2, border_radius=8)
-        txt_surf = self.font.render(self.text, True, WHITE)
+        txt_surf = text_cache.render(self.font, self.text, WHITE)
         screen.blit(txt_surf, (self.rect.centerx - txt_surf.get_width()//2, self.rect.centery - txt_surf.get_height()//2))
     def handle_event(self, event):
         if not self.enabled: return False
@@ -28,18 +38,32 @@ class Button:
         elif event.type == pygame.MOUSEBUTTONDOWN and self.hover: self.callback(); return True
         return False
 
-def main():
+def main(headless=False, max_days=None, resume=None, checkpoint_dir=None):
+    """max_days: 无窗口模式下跑完这么多天 (含日终反思) 后返回 state_ctx，None = 一直跑
+    resume: 检查点文件路径或 "latest"；checkpoint_dir: 本次运行的检查点目录 (从检查点分叉实验时用)"""
     pygame.init()
-    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-    pygame.display.set_caption(f"AI Family: Waste Detection & Social Cooking")
-    clock = pygame.time.Clock()
-    
-    font = pygame.font.SysFont("arial", 16)
-    title_font = pygame.font.SysFont("arial", 24, bold=True)
-    game_surface = pygame.Surface((MAP_WIDTH, MAP_HEIGHT))
+    if not headless:
+        screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        pygame.display.set_caption(f"AI Family: Waste Detection & Social Cooking")
+        clock = pygame.time.Clock()
+        
+        font = get_font("arial", 16)
+        title_font = get_font("arial", 24, bold=True)
+        profiler_font = get_font("couriernew", 14)
+        game_surface = pygame.Surface((MAP_WIDTH, MAP_HEIGHT))
+        night_overlay = pygame.Surface((MAP_WIDTH, MAP_HEIGHT), pygame.SRCALPHA)
+        night_overlay.fill((0, 0, 0, 150))
     
-    sim_manager.start()
+    if checkpoint_dir: checkpoints.out_dir = checkpoint_dir
+    ckpt = None
+    if resume:
+        path = checkpoints.resolve(resume)
+        ckpt = checkpoints.load(path)
+        print(f"💾 Resuming from {path} (Day {ckpt['day']} {ckpt['hour']:02d}:00)")
+    # 恢复时 EnergyPlus 从当天 0 点全速重放到检查点的时间步
+    sim_manager.start(replay=checkpoints.replay_plan(ckpt) if ckpt else None)
     
+    frame_atlas.headless = headless
     sprites = pygame.sprite.Group()
     roster = [
         {"name": "Mom", "role": "PROVIDER", "color": (255,100,100), "spawn": (120, 200), "sprite": "Mom"}, 
@@ -49,12 +73,28 @@ def main():
     
     agent_list = [Character(cfg) for cfg in roster]
     for a in agent_list: sprites.add(a)
+
+    # 🗑️ 浪费追踪只在有人进出房间 / setpoint 改变时更新，时钟是 EnergyPlus 时间步 (小时)
+    waste_tracker.bind(clock=lambda: sim_manager.callback_stats[1] / EPLUS_TIMESTEPS_PER_HOUR,
+                       costs=lambda: sim_manager.zone_cost)
+    agent_store.room_listeners.append(waste_tracker.on_occupancy)
+    sim_manager.setpoint_listeners.append(waste_tracker.on_setpoint)
+    def start_waste_day():
+        waste_tracker.start_day({r: sim_manager.get_setpoint(r) for r in waste_tracker.rooms}, agent_store.occupancy())
+    start_waste_day()
     
     state_ctx = {
-        "running": True, "mode": 0, "day": 1,
-        "waste": {"LivingRoom": 0.0, "MasterRoom": 0.0, "KidsRoom": 0.0},
+        "running": True, "mode": 0, "day": 1, "tick": 0,
+        "waste": {room: 0.0 for room, _ in HVAC_ZONE_KEYS},       # 日终由 waste_tracker 汇总 (小时)
+        "waste_cost": {room: 0.0 for room, _ in HVAC_ZONE_KEYS},  # 空房间空调实际花掉的钱
         "pmv_sum": 0, "pmv_count": 0, "last_h": 0.0, 
         "reflection_threads_started": False, "reflections_ready": False,
+        "waste_alert": "None",
+        "run_id": telemetry.run_id,   # 遥测目录 / 日汇总里的运行编号，原地恢复时沿用检查点里的
+        "eplus_calls": 0,   # 已计入分析器的 EnergyPlus 回调次数
+        "sim_steps": 0,     # 当天智能体已走的物理步数 (与 EnergyPlus 锁步)
+        "fast_forward": False,  # 夜间快进中
+        "fast_forward_log": [],  # 当天快进的开关记录 {"step", "hour", "on", "reason"}
         
         "hourly_log": [],      
         "prev_bill": 0.0,      
@@ -62,171 +102,344 @@ def main():
         "last_logged_hour": -1
     }
 
+    if ckpt:
+        # 原地继续同一次运行；指定新的检查点目录即分叉出新实验，用新的运行编号，反思规则也记在新的家庭编号下
+        checkpoints.restore(ckpt, state_ctx, agent_list, sim_manager, agent_store, GLOBAL_FOOD,
+                            household=f"{HOUSEHOLD_ID}@{telemetry.run_id}" if checkpoint_dir else None)
+        if checkpoint_dir: state_ctx['run_id'] = telemetry.run_id
+        else: telemetry.run_id = state_ctx['run_id']
+        sim_manager.publish_sim_steps(state_ctx['sim_steps'])
+        sim_manager.wait_replay()
+
+    # 仿真线程与渲染线程共享 sprites/state_ctx，所有修改都在 world_lock 内进行
+    world_lock = threading.Lock()
+    snapshots = SnapshotBuffer()
+    # 恢复时当天的遥测另写一个分段，原运行已写下的 day 文件保持不变
+    telemetry.start_day(state_ctx['day'], from_hour=ckpt['hour'] if ckpt else None)
+
     def start_next_day():
-        print(f"🔄 Starting Day {state_ctx['day'] + 1}...")
-        sim_manager.restart()
-        for s in sprites: s.reset_state()
-        state_ctx['mode'] = 0; state_ctx['day'] += 1
-        state_ctx['last_h'] = 0.0 
-        state_ctx['waste'] = {k: 0.0 for k in state_ctx['waste']}
-        state_ctx['pmv_sum'] = 0; state_ctx['pmv_count'] = 0
-        state_ctx['reflection_threads_started'] = False; state_ctx['reflections_ready'] = False
-        
-        state_ctx['hourly_log'] = []
-        state_ctx['prev_bill'] = 0.0
-        state_ctx['last_hour_cost'] = 0.0
-        state_ctx['last_logged_hour'] = -1
-        
-        btn_next.set_enabled(False); btn_next.update_text("Day in Progress...")
+        with world_lock:
+            print(f"🔄 Starting Day {state_ctx['day'] + 1}...")
+            sim_manager.restart()
+            for s in sprites: s.reset_state()
+            start_waste_day()
+            state_ctx['mode'] = 0; state_ctx['day'] += 1; state_ctx['fast_forward'] = False; state_ctx['sim_steps'] = 0
+            state_ctx['fast_forward_log'] = []
+            telemetry.start_day(state_ctx['day'])
+            state_ctx['last_h'] = 0.0 
+            state_ctx['waste'] = {k: 0.0 for k in state_ctx['waste']}
+            state_ctx['waste_cost'] = {k: 0.0 for k in state_ctx['waste_cost']}
+            state_ctx['pmv_sum'] = 0; state_ctx['pmv_count'] = 0
+            state_ctx['reflection_threads_started'] = False; state_ctx['reflections_ready'] = False
+            
+            state_ctx['hourly_log'] = []
+            state_ctx['prev_bill'] = 0.0
+            state_ctx['last_hour_cost'] = 0.0
+            state_ctx['last_logged_hour'] = -1
 
-    btn_next = Button(60, WINDOW_HEIGHT - 80, 200, 50, "Day in Progress...", start_next_day)
-    btn_next.set_enabled(False) 
+    def set_fast_forward(on, reason):
+        state_ctx['fast_forward'] = on
+        state_ctx['fast_forward_log'].append({"step": state_ctx['sim_steps'], "hour": state_ctx['last_h'], "on": on, "reason": reason})
+        print(f"⏩ Night fast-forward ON ({reason})" if on else f"▶️ Night fast-forward OFF ({reason})")
 
-    while state_ctx["running"]:
-        dt = clock.tick(30) / 1000.0 
-        
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT: state_ctx["running"] = False
-            btn_next.handle_event(event)
+    def update_fast_forward(hour, zones):
+        """全家熟睡且有人的房间都在睡眠舒适温度内 -> 快进；有人醒来 / 室温越界 / 到起床时间 -> 立即恢复"""
+        night = hour >= 21 or hour < FAST_FORWARD_WAKE_HOUR
+        asleep = night and agent_store.all_asleep()
+        quiet = asleep and agent_store.occupied_temps_within(zones, FAST_FORWARD_SLEEP_TEMP)
+        if quiet == state_ctx['fast_forward']: return
+        if quiet: set_fast_forward(True, f"everyone asleep at {hour:02d}:00")
+        elif not night: set_fast_forward(False, f"morning {hour:02d}:00")
+        elif not asleep: set_fast_forward(False, f"someone woke at {hour:02d}:00")
+        else: set_fast_forward(False, f"room left the sleep comfort band at {hour:02d}:00")
 
+    def step_world(dt):
+        """推进一个固定物理步长 dt (仿真秒，不涉及任何绘制)"""
         try:
-            with sim_manager.lock:
+            with profiler.lock(sim_manager.lock, "sim_manager"):
                 h = sim_manager.current_hour
                 price, power, bill, out_temp = sim_manager.energy_data
                 zones = sim_manager.zone_data
+                zone_power = sim_manager.zone_power; zone_cost = sim_manager.zone_cost
+                cb_ms, cb_count = sim_manager.callback_stats
+                setpoints = {room: sim_manager.get_setpoint(room) for room in zones}
         except:
-            h = 12.0; bill = 0; zones = {}; out_temp = 0.0
+            h = 12.0; price = 0.0; power = 0.0; bill = 0; zones = {}; out_temp = 0.0
+            zone_power = {}; zone_cost = {}; setpoints = {}; cb_ms = 0.0; cb_count = state_ctx['eplus_calls']
+        if cb_count != state_ctx['eplus_calls']:
+            # EnergyPlus 回调在子进程里计时，这里把最新一次的耗时并入分析器
+            state_ctx['eplus_calls'] = cb_count
+            profiler.record("eplus.callback", cb_ms)
+
+        # 🔥 浪费警告 (空调开着但房间没人)：waste_tracker 只在事件发生时重建，这里直接取缓存
+        waste_alert_str = waste_tracker.alert()
+        state_ctx['waste_alert'] = waste_alert_str
 
         current_hour_int = int(h)
-        if current_hour_int != state_ctx['last_logged_hour']:
+        new_hour = current_hour_int != state_ctx['last_logged_hour']
+        if new_hour:
+            sim_manager.apply_plan(current_hour_int)
             delta = bill - state_ctx['prev_bill']
             if delta < 0: delta = 0 
             
+            counts = agent_store.occupancy()
             current_pmvs = [s.current_pmv for s in sprites]
             avg_pmv = sum(current_pmvs) / max(1, len(current_pmvs))
             
             state_ctx['hourly_log'].append({
                 'hour': current_hour_int, 
                 'cost': delta,
-                'avg_pmv': avg_pmv 
+                'avg_pmv': avg_pmv,
+                'out_temp': out_temp,
+                # 以下供反事实推演分叉使用 (该小时开始时的状态)
+                'price': price,
+                'temps': {room: t for room, (t, rh) in zones.items()},
+                'setpoints': dict(setpoints),
+                'occupied': {room: counts.get(room, 0) > 0 for room in zones}
             })
             
             state_ctx['last_hour_cost'] = delta 
             state_ctx['prev_bill'] = bill
             state_ctx['last_logged_hour'] = current_hour_int
 
-        # 🔥🔥🔥 实时计算浪费警告 (Waste Alert) 🔥🔥🔥
-        # 逻辑：如果房间空调开着 (Setpoint > 0) 且房间里没人 -> 这是一个严重的警告
-        occupancy = {k: False for k in zones.keys()}
-        for s in sprites: occupancy[s.current_room] = True
-        
-        waste_warnings = []
-        for room, (temp, rh) in zones.items():
-            sp = sim_manager.get_setpoint(room)
-            if sp > 0 and not occupancy.get(room, False):
-                # 累积浪费分数/时间
-                state_ctx['waste'][room] += dt * 0.1
-                # 生成警告信息
-                waste_warnings.append(f"{room} AC is ON but EMPTY!")
-
-        waste_alert_str = "None"
-        if waste_warnings:
-            waste_alert_str = " | ".join(waste_warnings)
-
-        ep_process_dead = (sim_manager.p is not None) and (not sim_manager.p.is_alive())
+        # EnergyPlus 跑完退出后，智能体要先走完最后一个建筑时间步对应的步数才算日终
+        ep_process_dead = (sim_manager.p is not None) and (not sim_manager.p.is_alive()) \
+            and (sim_manager.step_budget(state_ctx['sim_steps']) or 0) <= 0
         time_limit_reached = (h > 23.5)
 
         if (ep_process_dead or time_limit_reached) and state_ctx["mode"] == 0:
             state_ctx["mode"] = 1
+            if state_ctx['fast_forward']: set_fast_forward(False, "end of day")
             if not ep_process_dead: sim_manager.pause_time()
+            hours, money, _ = waste_tracker.report()
+            state_ctx['waste'] = hours; state_ctx['waste_cost'] = money
             print(f"\n🌙 End of Day. Bill: {bill:.2f}")
-            print(f"🗑️ Waste Report: {state_ctx['waste']}") # 打印当日浪费情况
+            print(f"🗑️ Waste Report (h): " + ", ".join(f"{r} {w:.2f}" for r, w in hours.items())) # 打印当日浪费情况
+            print(f"💸 Waste Cost: " + ", ".join(f"{r} ${c:.2f}" for r, c in state_ctx['waste_cost'].items()))
+            summary = {"day": state_ctx['day'], "weight": COMFORT_VS_COST_WEIGHT, "bill": bill,
+                       "avg_discomfort": state_ctx['pmv_sum'] / max(1, state_ctx['pmv_count'])}
+            for room, w in state_ctx['waste'].items(): summary[f"waste_{room}"] = w
+            summary["waste_total"] = sum(state_ctx['waste'].values())
+            for room, c in state_ctx['waste_cost'].items(): summary[f"waste_cost_{room}"] = c
+            summary["daily_rule"] = " | ".join(f"{s.name}: {s.brain.daily_rule}" for s in sprites)
+            try: telemetry.append_day_summary(summary)
+            except Exception as e: print(f"Summary log error: {e}")
 
         state_ctx['last_h'] = h
 
         if state_ctx["mode"] == 0:
+            state_ctx['sim_steps'] += 1
+            # 需求衰减 / 房间 / PMV 一次性向量化计算，再逐个跑行为逻辑
+            with profiler.scope("agent_store.step"): agent_store.step(dt, zones)
             # 🔥 将 waste_alert_str 传递给 sprites
-            sprites.update(agent_list, bill, state_ctx['last_hour_cost'], waste_alert_str)
+            sprites.update(agent_list, bill, state_ctx['last_hour_cost'], waste_alert_str, dt, state_ctx['fast_forward'])
+            update_fast_forward(current_hour_int, zones)
             total_comfort = sum([s.visual_comfort for s in sprites])
             state_ctx['pmv_sum'] += (1.0 - total_comfort/len(sprites))
             state_ctx['pmv_count'] += 1
+
+            row = {"day": state_ctx['day'], "tick": state_ctx['tick'], "hour": float(h),
+                   "price": price, "power": power, "bill": bill, "out_temp": out_temp}
+            for room, (temp, rh) in zones.items():
+                row[f"{room}_temp"] = temp; row[f"{room}_rh"] = rh; row[f"{room}_sp"] = setpoints[room]
+                row[f"{room}_kw"] = zone_power.get(room, 0.0); row[f"{room}_cost"] = zone_cost.get(room, 0.0)
+            for s in sprites:
+                row[f"{s.name}_pmv"] = s.current_pmv; row[f"{s.name}_room"] = s.current_room
+                row[f"{s.name}_action"] = s.target_action or ""
+            telemetry.record(row)
+
+            # 💾 整点检查点：本步全部推进完再存，恢复后从下一步继续；锁内只采集，压缩写盘在后台线程
+            if new_hour and current_hour_int >= 0 and (current_hour_int == 0 or
+                    (CHECKPOINT_EVERY_HOURS and current_hour_int % CHECKPOINT_EVERY_HOURS == 0)):
+                try:
+                    with sim_manager.lock:
+                        ckpt = checkpoints.capture(state_ctx, agent_list, sim_manager, agent_store, GLOBAL_FOOD)
+                    checkpoints.save_async(ckpt)
+                except Exception as e: print(f"Checkpoint error: {e}")
+
+        if state_ctx["mode"] == 1 and not state_ctx["reflection_threads_started"]:
+            state_ctx["reflection_threads_started"] = True
+            # 反思与下一天 EnergyPlus 的 IDF 生成/启动/预热并行进行
+            sim_manager.prepare_next()
+            avg_discomfort = state_ctx['pmv_sum'] / max(1, state_ctx['pmv_count'])
+            waste_report = dict(state_ctx['waste']); hourly_log = list(state_ctx['hourly_log']); day = state_ctx['day']
+            waste_cost = dict(state_ctx['waste_cost'])
+            brains = [s.brain for s in sprites]
+
+            def run_reflections():
+                try:
+                    # 全家共用的当日分析 (含反事实推演) 只算一次，再并发分发给每个角色
+                    summary = summarize_day(bill, avg_discomfort, waste_report, hourly_log, day, waste_cost=waste_cost)
+                    reflection_pipeline.run(brains, summary, REFLECTION_DEADLINE)
+                except Exception as e:
+                    print(f"Thread Error: {e}")
+                    traceback.print_exc()
+                finally:
+                    state_ctx["reflections_ready"] = True
+            
+            threading.Thread(target=run_reflections, daemon=True).start()
+
+    def make_snapshot():
+        with profiler.lock(sim_manager.lock, "sim_manager"):
+            h = sim_manager.current_hour
+            price, power, bill, out_temp = sim_manager.energy_data
+            zones = {z: (t, rh, sim_manager.get_setpoint(z)) for z, (t, rh) in sim_manager.zone_data.items()}
+        return WorldSnapshot(
+            tick=state_ctx['tick'], stamp=time.perf_counter(), day=state_ctx['day'], mode=state_ctx['mode'], hour=h,
+            zones=zones, price=price, power=power, bill=bill, out_temp=out_temp, food=GLOBAL_FOOD.get_count(),
+            waste_alert=state_ctx['waste_alert'], reflections_ready=state_ctx['reflections_ready'],
+            fast_forward=state_ctx['fast_forward'],
+            agents=tuple(s.snapshot() for s in sprites),
+        )
+
+    def sim_loop():
+        """仿真循环：按 SIM_TICK_RATE 独立推进并发布快照 (0 = 不限速)
+        物理永远以 SIM_DT 为步长，且与 EnergyPlus 锁步: 第 k 个建筑时间步算完之前，智能体最多走
+        k * SIM_STEPS_PER_EPLUS_STEP 步，EnergyPlus 也要等智能体走完才算下一步。
+        tick 率 / 快进只决定推进得多快 (限速时用累加器把墙钟时间换算成步数)，不改变每个建筑时间步里发生什么"""
+        tick_interval = 1.0 / SIM_TICK_RATE if SIM_TICK_RATE > 0 else 0.0
+        last = time.perf_counter()
+        accumulator = 0.0
+        while state_ctx["running"]:
+            profiler.thread_tick("sim")   # F4 录制期间仿真线程也跑 cProfile
+            now = time.perf_counter()
+            throttled = tick_interval and not state_ctx["fast_forward"]
+            if throttled:
+                accumulator += now - last
+                steps = int(accumulator / SIM_DT)
+                if steps > MAX_CATCHUP_STEPS:
+                    steps = MAX_CATCHUP_STEPS; accumulator = 0.0
+                else:
+                    accumulator -= steps * SIM_DT
+            else:
+                steps = MAX_CATCHUP_STEPS
+            last = now
+            budget = sim_manager.step_budget(state_ctx['sim_steps']) if state_ctx["mode"] == 0 else None
+            if budget is not None and steps > budget:
+                # 建筑时钟还没走到，多出来的墙钟时间留到下个 tick (最多攒 MAX_CATCHUP_STEPS 步)
+                if throttled: accumulator = min(accumulator + (steps - max(0, budget)) * SIM_DT, MAX_CATCHUP_STEPS * SIM_DT)
+                steps = max(0, budget)
+                if steps == 0:
+                    if sim_manager.p.is_alive():   # 等 EnergyPlus 算完这个时间步
+                        time.sleep(tick_interval if throttled else 0.0005); continue
+                    steps = 1   # EnergyPlus 已结束且步数已走完: 这一步只用来收尾 (step_world 切到日终)
+            with profiler.lock(world_lock, "world"):
+                with profiler.scope("sim.tick"):
+                    for _ in range(steps): step_world(SIM_DT)
+                    sim_manager.publish_sim_steps(state_ctx['sim_steps'])
+                    state_ctx['tick'] += 1
+                    snapshots.publish(make_snapshot())
+            # 无窗口模式下没有按钮，反思结束后自动进入下一天
+            if headless and state_ctx["mode"] == 1 and state_ctx["reflections_ready"]:
+                if max_days and state_ctx["day"] >= max_days: state_ctx["running"] = False
+                else: start_next_day()
+            if throttled:
+                remain = tick_interval - (time.perf_counter() - now)
+                if remain > 0: time.sleep(remain)
+
+    if headless:
+        try: sim_loop()
+        except KeyboardInterrupt: state_ctx["running"] = False
+        telemetry.close(); checkpoints.close()
+        pygame.quit()
+        return state_ctx
+
+    btn_next = Button(60, WINDOW_HEIGHT - 80, 200, 50, "Day in Progress...", start_next_day)
+    btn_next.set_enabled(False) 
+
+    sim_thread = threading.Thread(target=sim_loop, daemon=True)
+    sim_thread.start()
+
+    while state_ctx["running"]:
+        clock.tick(FAST_FORWARD_FPS if state_ctx["fast_forward"] else FPS)
+        
+        frame_start = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT: state_ctx["running"] = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.key.key_code(PROFILER_TOGGLE_KEY): profiler.toggle()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.key.key_code(PROFILER_CAPTURE_KEY): profiler.start_capture()
+            btn_next.handle_event(event)
+
+        prev, snap = snapshots.latest()
+        if snap is None: continue
+        if snap.fast_forward:
+            # ⏩ 快进期间不画地图和角色，只显示进度
+            screen.fill(UI_BG_COLOR)
+            ff_surf = text_cache.render(title_font, f"Night fast-forward... Day {snap.day} | {snap.hour:02d}:00", WHITE)
+            screen.blit(ff_surf, (WINDOW_WIDTH//2 - ff_surf.get_width()//2, WINDOW_HEIGHT//2))
+            pygame.display.flip()
+            profiler.end_frame()
+            continue
+        frame_atlas.ensure_display_format()
+        h, bill, out_temp = snap.hour, snap.bill, snap.out_temp
+        views = interpolate_agents(prev, snap, interpolation_alpha(prev, snap))
         
         screen.fill(UI_BG_COLOR)
-        house_map.draw(game_surface)
-        for s in sprites: s.draw(game_surface, font)
+        house_map.draw(game_surface, snap.zones)
+        sprite_by_name = {s.name: s for s in sprites}
+        with profiler.scope("render.agents"):
+            for v in views: sprite_by_name[v.name].draw(game_surface, font, v)
         
-        if state_ctx["mode"] == 1:
-            overlay = pygame.Surface((MAP_WIDTH, MAP_HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 150))
-            game_surface.blit(overlay, (0,0))
-            status_txt = "Analyzing Behavior..." if not state_ctx["reflections_ready"] else "Evolution Complete."
-            status_surf = title_font.render(status_txt, True, WHITE)
+        if snap.mode == 1:
+            game_surface.blit(night_overlay, (0,0))
+            status_txt = "Analyzing Behavior..." if not snap.reflections_ready else "Evolution Complete."
+            status_surf = text_cache.render(title_font, status_txt, WHITE)
             game_surface.blit(status_surf, (MAP_WIDTH//2 - status_surf.get_width()//2, MAP_HEIGHT//2))
 
         screen.blit(game_surface, (UI_BAR_WIDTH, 0))
             
         x, y = 20, 30
-        screen.blit(title_font.render(f"Day {state_ctx['day']} | {h:.1f}h", True, WHITE), (x, y)); y+=40
+        screen.blit(text_cache.render(title_font, f"Day {snap.day} | {h:.1f}h", WHITE), (x, y)); y+=40
         out_c = (100, 200, 255) if out_temp < 10 else ((255, 100, 100) if out_temp > 28 else WHITE)
-        screen.blit(font.render(f"Outdoor: {out_temp:.1f}C", True, out_c), (x, y)); y+=30
-        screen.blit(font.render(f"Food: {GLOBAL_FOOD.get_count()}", True, WHITE), (x, y)); y+=30
+        screen.blit(text_cache.render(font, f"Outdoor: {out_temp:.1f}C", out_c), (x, y)); y+=30
+        screen.blit(text_cache.render(font, f"Food: {snap.food}", WHITE), (x, y)); y+=30
         
         budget_left = DAILY_BUDGET_LIMIT - bill
         b_col = GREEN if budget_left > 10 else (RED if budget_left < 0 else (255, 165, 0))
-        screen.blit(font.render(f"Budget Left: ${budget_left:.2f}", True, b_col), (x, y)); y+=20
-        screen.blit(font.render(f"Spent: ${bill:.2f}", True, WHITE), (x, y)); y+=30
+        screen.blit(text_cache.render(font, f"Budget Left: ${budget_left:.2f}", b_col), (x, y)); y+=20
+        screen.blit(text_cache.render(font, f"Spent: ${bill:.2f}", WHITE), (x, y)); y+=30
 
-        avg_comf = sum([s.visual_comfort for s in sprites]) / len(sprites)
+        avg_comf = sum([v.comfort for v in views]) / len(views)
         comf_c = GREEN if avg_comf > 0.8 else ((255, 255, 0) if avg_comf > 0.5 else RED)
-        screen.blit(font.render(f"Avg Comfort: {avg_comf:.2f}", True, comf_c), (x, y)); y+=30
+        screen.blit(text_cache.render(font, f"Avg Comfort: {avg_comf:.2f}", comf_c), (x, y)); y+=30
         
         # 显示严重警告
-        if waste_alert_str != "None":
-             screen.blit(font.render(f"⚠️ WASTE: {waste_alert_str}", True, RED), (x, y)); y+=30
+        if snap.waste_alert != "None":
+             screen.blit(text_cache.render(font, f"⚠️ WASTE: {snap.waste_alert}", RED), (x, y)); y+=30
 
         y += 20
-        screen.blit(font.render("--- Agent Activity ---", True, SELECTION_COLOR), (x, y)); y+=25
-        for s in sprites:
-            thought_full = s.current_thought
+        screen.blit(text_cache.render(font, "--- Agent Activity ---", SELECTION_COLOR), (x, y)); y+=25
+        for v in views:
+            thought_full = v.thought
             if len(thought_full) > 35: thought_full = thought_full[:32] + "..."
-            txt = f"{s.name}: {thought_full}"
-            screen.blit(font.render(txt, True, s.config['color']), (x, y)); y+=20
+            txt = f"{v.name}: {thought_full}"
+            screen.blit(text_cache.render(font, txt, v.color), (x, y)); y+=20
             
-        if state_ctx["mode"] == 1:
-            if not state_ctx["reflection_threads_started"]:
-                state_ctx["reflection_threads_started"] = True
-                avg_discomfort = state_ctx['pmv_sum'] / max(1, state_ctx['pmv_count'])
-                
-                btn_next.update_text("Reflecting...")
-                btn_next.set_enabled(False)
-
-                def run_reflections():
-                    try:
-                        threads = []
-                        for s in sprites:
-                            # 传递 waste (state_ctx['waste']) 给反思模块
-                            t = threading.Thread(target=s.brain.reflect_and_plan, args=(bill, avg_discomfort, state_ctx['waste'], state_ctx['hourly_log']))
-                            threads.append(t)
-                            t.start()
-                        for t in threads: t.join()
-                    except Exception as e:
-                        print(f"Thread Error: {e}")
-                        traceback.print_exc()
-                    finally:
-                        state_ctx["reflections_ready"] = True
-                
-                threading.Thread(target=run_reflections, daemon=True).start()
-
-            if state_ctx["reflections_ready"] and not btn_next.enabled:
-                btn_next.update_text("START NEXT DAY")
-                btn_next.set_enabled(True)
+        if snap.mode == 0:
+            btn_next.update_text("Day in Progress..."); btn_next.set_enabled(False)
+        elif not snap.reflections_ready:
+            btn_next.update_text("Reflecting..."); btn_next.set_enabled(False)
+        elif not btn_next.enabled:
+            btn_next.update_text("START NEXT DAY")
+            btn_next.set_enabled(True)
                 
         btn_next.draw(screen)
-        pygame.display.flip()
+        if profiler.enabled: profiler.draw(screen, profiler_font, UI_BAR_WIDTH + 10, 10)
+        profiler.record("frame", (time.perf_counter() - frame_start) * 1000.0, frame_start)
+        with profiler.scope("render.flip"): pygame.display.flip()
+        profiler.end_frame()
     
+    sim_thread.join(timeout=2.0)
+    telemetry.close(); checkpoints.close()
     pygame.quit()
     sys.exit()
 
 if __name__ == "__main__":
     multiprocessing.freeze_support() 
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AI Family simulation")
+    parser.add_argument("--headless", action="store_true", help="不开窗口，只跑仿真循环")
+    parser.add_argument("--days", type=int, default=None, help="无窗口模式下跑完 N 天后退出")
+    parser.add_argument("--resume", default=None, help="从检查点继续: 文件路径或 latest")
+    parser.add_argument("--checkpoint-dir", default=None, help=f"检查点目录 (默认 {CHECKPOINT_DIR})，分叉实验时指定新目录")
+    args = parser.parse_args()
+    main(headless=args.headless, max_days=args.days, resume=args.resume, checkpoint_dir=args.checkpoint_dir)
@@ -2,8 +2,14 @@ import pygame
 import heapq
 import random
 import os
+import hashlib
+import pickle
+import threading
 from config import *
-from simulation import sim_manager 
+import simulation
+from render_cache import text_cache, get_font
+from frame_profiler import profiler
+from lazy_init import lazy_singletons
 
 class SpriteLoader:
     def get_frames(self, n, c): 
@@ -44,6 +50,72 @@ class SpriteLoader:
             f.append(dfs)
         return f
 
+# ==============================================================================
+# 🗂️ 进程级共享帧图集
+# 每张 sprite sheet 只加载/缩放一次，缩放结果按 (文件哈希, SPRITE_SCALE) 缓存到磁盘；
+# 窗口创建后再统一 convert_alpha，无窗口模式完全跳过图片处理
+# ==============================================================================
+_to_bytes = getattr(pygame.image, "tobytes", None) or pygame.image.tostring
+_from_bytes = getattr(pygame.image, "frombytes", None) or pygame.image.fromstring
+
+class FrameAtlas:
+    def __init__(self, cache_dir=SPRITE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.headless = False
+        self.lock = threading.Lock()
+        self._frames = {}
+        self._pending = []     # 还没 convert_alpha 的帧集合
+        self._placeholder = None
+
+    def get_frames(self, n, c):
+        key = (n, tuple(c))
+        with self.lock:
+            frames = self._frames.get(key)
+            if frames is None:
+                frames = self._load(n, c)
+                self._frames[key] = frames
+                if not self.headless: self._pending.append(frames)
+            return frames
+
+    def _load(self, n, c):
+        if self.headless:
+            if self._placeholder is None:
+                s = pygame.Surface((48, 48)); s.fill(c)
+                self._placeholder = [[s] * 4 for _ in range(4)]
+            return self._placeholder
+        p = f"assets/{n}.png"
+        if not os.path.exists(p): return SpriteLoader().dummy(c)
+
+        with open(p, 'rb') as f: digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        cache_path = os.path.join(self.cache_dir, f"{n}_{digest}_x{SPRITE_SCALE}.bin")
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f: data = pickle.load(f)
+                return [[_from_bytes(b, size, "RGBA") for size, b in d] for d in data]
+            except Exception as e:
+                print(f"Sprite cache corrupt, rebuilding: {e}")
+
+        frames = SpriteLoader().load_smart(p)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data = [[(s.get_size(), _to_bytes(s, "RGBA")) for s in d] for d in frames]
+            tmp = cache_path + ".tmp"
+            with open(tmp, 'wb') as f: pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except Exception as e:
+            print(f"Sprite cache write failed: {e}")
+        return frames
+
+    def ensure_display_format(self):
+        """窗口存在后把待处理帧转换为显示格式 (原地替换，所有角色共享)"""
+        if not self._pending: return
+        if not (pygame.display.get_init() and pygame.display.get_surface()): return
+        with self.lock:
+            pending, self._pending = self._pending, []
+        for frames in pending:
+            for d in frames:
+                for i, s in enumerate(d): d[i] = s.convert_alpha()
+
 class Node:
     def __init__(self, gp): self.gp=gp; self.g=0; self.h=0; self.f=0; self.parent=None
     def __lt__(self, o): return self.f < o.f
@@ -80,10 +152,23 @@ class PathFinder:
             return self.grid[gc][gr] == 0
         return False
 
+    def nearest_free(self, gp, max_r=3):
+        """离格子 gp 最近的可走格子 (按切比雪夫距离一圈圈往外找)，找不到返回 None"""
+        for r in range(1, max_r + 1):
+            for c in range(gp[0] - r, gp[0] + r + 1):
+                for rr in range(gp[1] - r, gp[1] + r + 1):
+                    if max(abs(c - gp[0]), abs(rr - gp[1])) == r and 0 <= c < self.cols and 0 <= rr < self.rows \
+                            and self.grid[c][rr] == 0: return (c, rr)
+        return None
+
     def find_path(self, start, end):
         sg=(int(start[0]//self.gs),int(start[1]//self.gs))
         eg=(int(end[0]//self.gs),int(end[1]//self.gs))
-        if self.grid[sg[0]][sg[1]]==1 or self.grid[eg[0]][eg[1]]==1: return []
+        if self.grid[eg[0]][eg[1]]==1: return []
+        # 起点落在家具里 (例如出生在床上) 时先走到最近的空格，否则这个角色永远动不了
+        if self.grid[sg[0]][sg[1]]==1:
+            sg = self.nearest_free(sg)
+            if sg is None: return []
         opens=[]; closed=set(); heapq.heappush(opens,Node(sg))
         steps = 0
         while opens and steps < 4000:
@@ -163,39 +248,43 @@ class HouseMap:
             return base_pos
         return (500, 400)
 
-    def draw(self, screen):
+    def draw(self, screen, zones=None):
+        """zones: {room: (temp, rh, setpoint)}，通常来自世界快照；为空时直接读取仿真"""
+        with profiler.scope("map.draw"): self._draw(screen, zones)
+
+    def _draw(self, screen, zones):
         screen.fill(FLOOR_COLOR)
-        with sim_manager.lock:
-            zone_data = sim_manager.zone_data
-            sps = {"LivingRoom": sim_manager.get_setpoint("LivingRoom"), "MasterRoom": sim_manager.get_setpoint("MasterRoom"), "KidsRoom": sim_manager.get_setpoint("KidsRoom")}
-        font_room = pygame.font.SysFont("arial", 20, bold=True)
-        font_furn = pygame.font.SysFont("arial", 14, italic=True)
+        if zones is None:
+            sim = simulation.sim_manager
+            with sim.lock:
+                zones = {z: (t, rh, sim.get_setpoint(z)) for z, (t, rh) in sim.zone_data.items()}
+        font_room = get_font("arial", 20, bold=True)
+        font_furn = get_font("arial", 14, italic=True)
 
         for z_name, rect in self.zones.items():
-            t, rh = zone_data.get(z_name, (20.0, 50.0))
+            t, rh, sp_val = zones.get(z_name, (20.0, 50.0, 0.0))
             color_int = int(max(0, min(255, (t - 15) * 20)))
             zone_color = (color_int, 100, 255 - color_int, 50) 
             s = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
             s.fill(zone_color)
             screen.blit(s, rect.topleft)
             
-            sp_val = sps.get(z_name)
-            sp_txt = f"Set:{sp_val:.0f}" if sp_val > 0 else "OFF"
+            sp_txt = f"Set:{sp_val:.0f}" if sp_val > HVAC_OFF_SETPOINT else "OFF"
             
-            txt_surf = font_room.render(z_name, True, (50,50,50))
+            txt_surf = text_cache.render(font_room, z_name, (50,50,50))
             bg_rect = txt_surf.get_rect(topleft=(rect.x + 40, rect.y + 10))
             pygame.draw.rect(screen, (255,255,255,180), bg_rect)
             screen.blit(txt_surf, (rect.x + 40, rect.y + 10))
             
             info_text = f"{t:.1f}C / {rh:.0f}% ({sp_txt})"
-            info_surf = font_furn.render(info_text, True, BLACK)
+            info_surf = text_cache.render(font_furn, info_text, BLACK)
             screen.blit(info_surf, (rect.x + 40, rect.y + 35))
 
         for w in self.walls: pygame.draw.rect(screen, WALL_COLOR, w)
         for f in self.furniture: 
             pygame.draw.rect(screen, (139,69,19), f["rect"])
             pygame.draw.rect(screen, (100,50,0), f["rect"], 3)
-            t = font_furn.render(f["name"], True, (255,255,220))
+            t = text_cache.render(font_furn, f["name"], (255,255,220))
             screen.blit(t, (f["rect"].centerx - t.get_width()//2, f["rect"].centery - t.get_height()//2))
             
             # 🔥🔥🔥 绘制桌子上的食物 (红点)
@@ -205,4 +294,5 @@ class HouseMap:
                     for i in range(min(5, food_cnt)):
                         pygame.draw.circle(screen, (255, 0, 0), (f["rect"].x + 20 + i*15, f["rect"].y + 20), 5)
 
-house_map = HouseMap()
\ No newline at end of file
+# house_map / frame_atlas 在第一次被访问时才构造
+__getattr__ = lazy_singletons(__name__, {"house_map": HouseMap, "frame_atlas": FrameAtlas})
\ No newline at end of file
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from config import *
+from lazy_init import lazy_singletons
+
+# ==============================================================================
+# 🧠 持久化记忆库 (SQLite WAL, 只追加)
+# 每条反思规则连同当天的日期/电费/不适度 (及天气/浪费等 meta) 一起保存，永不覆盖；
+# 多线程 / 多进程 (多户家庭) 并发写入由 SQLite 事务保证原子性，
+# 每个 (household, agent) 第一次读取后常驻内存缓存
+# 从检查点恢复时 (rewind) 只能看到存档那一刻可见的规则 + 恢复之后新写的，
+# 原运行在存档之后写入的规则不会混进来；分叉实验换一个 household，反思不会写回原实验
+# ==============================================================================
+
+class MemoryStore:
+    def __init__(self, path=MEMORY_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache = {}   # (household, agent) -> [记录...] (按写入顺序)
+        self._views = {}   # (household, agent) -> (存档时可见的 id 列表, 恢复时库里最大 id)
+        self.household = HOUSEHOLD_ID   # 本次运行读写的家庭 (分叉实验时改掉)
+        self._listeners = []  # 新记录写入后的回调 fn(household, agent, rec)
+        with self._conn() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                household TEXT NOT NULL, agent TEXT NOT NULL,
+                day INTEGER, rule TEXT NOT NULL,
+                bill REAL, discomfort REAL, created REAL NOT NULL)""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rules_agent ON rules (household, agent, id)")
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(rules)")}
+            if "meta" not in cols: conn.execute("ALTER TABLE rules ADD COLUMN meta TEXT")
+
+    def _conn(self):
+        # sqlite3 连接不能跨线程共享，每个线程各开一个
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def history(self, agent, household=None):
+        household = household or self.household
+        key = (household, agent)
+        with self._lock:
+            if key in self._cache: return list(self._cache[key])
+            view = self._views.get(key)
+        cols = "SELECT id, day, rule, bill, discomfort, created, meta FROM rules"
+        if view is None:
+            rows = self._conn().execute(f"{cols} WHERE household=? AND agent=? ORDER BY id", (household, agent)).fetchall()
+        else:
+            ids, floor = view
+            rows = self._conn().execute(
+                f"{cols} WHERE id IN (SELECT value FROM json_each(?)) OR (household=? AND agent=? AND id>?) ORDER BY id",
+                (json.dumps(ids), household, agent, floor)).fetchall()
+        recs = [{"id": r[0], "day": r[1], "rule": r[2], "bill": r[3], "discomfort": r[4], "created": r[5],
+                 "meta": json.loads(r[6]) if r[6] else {}} for r in rows]
+        if not recs and view is None: recs = self._import_legacy(agent, household)
+        with self._lock:
+            self._cache.setdefault(key, recs)
+            return list(self._cache[key])
+
+    def latest_rule(self, agent, default=None, household=None):
+        recs = self.history(agent, household)
+        return recs[-1]["rule"] if recs else default
+
+    def subscribe(self, fn):
+        self._listeners.append(fn)
+
+    def append_rule(self, agent, rule, day=None, bill=None, discomfort=None, meta=None, household=None):
+        household = household or self.household
+        created = time.time()
+        meta = meta or {}
+        conn = self._conn()
+        with conn:   # 单条 INSERT 即一个事务，并发写由 SQLite 串行化
+            cur = conn.execute(
+                "INSERT INTO rules (household, agent, day, rule, bill, discomfort, created, meta) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (household, agent, day, rule, bill, discomfort, created, json.dumps(meta, ensure_ascii=False)))
+        rec = {"id": cur.lastrowid, "day": day, "rule": rule, "bill": bill, "discomfort": discomfort, "created": created, "meta": meta}
+        with self._lock:
+            if (household, agent) in self._cache: self._cache[(household, agent)].append(rec)
+        for fn in self._listeners:
+            try: fn(household, agent, rec)
+            except Exception as e: print(f"Memory listener error: {e}")
+        return rec
+
+    # ---------------- 检查点 ----------------
+    def snapshot(self, agents):
+        """存档: 当前家庭 + 每个角色此刻可见的规则 id"""
+        return {"household": self.household, "rules": {a: [r["id"] for r in self.history(a)] for a in agents}}
+
+    def rewind(self, snap, household=None):
+        """恢复: 之后只看得到存档时可见的规则和恢复后新写的；household 给分叉实验用 (默认沿用存档里的)"""
+        household = household or snap["household"]
+        floor = self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM rules").fetchone()[0]
+        with self._lock:
+            self.household = household
+            self._cache.clear()
+            for agent, ids in snap["rules"].items(): self._views[(household, agent)] = (list(ids), floor)
+
+    def _import_legacy(self, agent, household):
+        """迁移旧版 memory_{name}.json 里唯一保存的 last_rule"""
+        legacy = f"memory_{agent}.json"
+        if not os.path.exists(legacy): return []
+        try:
+            with open(legacy, 'r', encoding='utf-8') as f: rule = json.load(f).get("last_rule")
+        except Exception as e:
+            print(f"Legacy Memory Error: {e}")
+            return []
+        return [self.append_rule(agent, rule, household=household)] if rule else []
+
+# 第一次访问时才打开 (或创建) MEMORY_DB_FILE，导入本模块不碰磁盘
+__getattr__ = lazy_singletons(__name__, {"memory_store": MemoryStore})
@@ -0,0 +1,102 @@
+import threading
+from collections import deque
+from config import *
+
+# ==============================================================================
+# 📨 家庭消息总线
+# 每个角色一个定长环形收件箱 (满了丢最旧的)，按名字建索引；房间成员直接读 agent_store 的房间集合：
+#   send -> 点对点   send_room -> 同一房间里的所有人   send_near -> 身边 r 以内的人 (空间哈希)   broadcast -> 全家
+# 投递是 O(收件人数) 的，不扫描全部角色；投递后回调收件人的 notify (唤醒它重新思考)，
+# 角色不必每帧轮询收件箱。每条消息带全局递增序号：读的时候记下最后一条的序号，
+# 读完只删到这个序号为止 (收件箱满了挤掉旧消息也不会误删读之后才到的)
+# ==============================================================================
+
+class MessageBus:
+    def __init__(self, capacity=MESSAGE_INBOX_SIZE):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self._inboxes = {}   # 名字 -> deque[(序号, str)]
+        self._seq = 0        # 最近一条消息的序号
+        self._agents = {}    # 名字 -> 角色对象
+        self._notify = {}    # 名字 -> fn(名字)
+        self._names = {}     # agent_store 下标 -> 名字
+        self._idx = {}       # 名字 -> agent_store 下标
+
+    # ---------------- 成员 ----------------
+    def register(self, name, agent=None, idx=None, notify=None):
+        """idx: 角色在 agent_store 中的下标 (按房间 / 按距离投递时用)"""
+        with self.lock:
+            self._inbox(name)
+            self._agents[name] = agent
+            if idx is not None: self._names[idx] = name; self._idx[name] = idx
+            if notify is not None: self._notify[name] = notify
+
+    def agent(self, name):
+        """名字 -> 角色 (O(1))，不存在时为 None"""
+        return self._agents.get(name)
+
+    # ---------------- 投递 ----------------
+    def send(self, sender, recipient, content):
+        """点对点；收件人不存在时返回 False"""
+        if recipient not in self._agents: return False
+        self._deliver([recipient], f"From {sender}: {content}")
+        return True
+
+    def send_room(self, sender, room, content):
+        """发给当前在 room 里的所有人 (不含自己)，返回收件人数"""
+        from agent_store import agent_store   # 房间成员只由 agent_store 维护一份
+        members = agent_store.in_room(room)
+        with self.lock: names = [n for n in (self._names.get(i) for i in members) if n is not None and n != sender]
+        self._deliver(names, f"From {sender} (in {room}): {content}")
+        return len(names)
+
+    def send_near(self, sender, radius, content):
+        """发给与 sender 距离不超过 radius 的所有人 (agent_store 空间哈希查询)，返回收件人数"""
+        from agent_store import agent_store
+        i = self._idx.get(sender)
+        if i is None: return 0
+        near = agent_store.within(i, radius)
+        with self.lock: names = [n for n in (self._names.get(j) for j in near) if n is not None]
+        self._deliver(names, f"From {sender} (nearby): {content}")
+        return len(names)
+
+    def broadcast(self, sender, content):
+        with self.lock: names = [n for n in self._agents if n != sender]
+        self._deliver(names, f"From {sender} (to everyone): {content}")
+        return len(names)
+
+    def _deliver(self, names, msg):
+        with self.lock:
+            self._seq += 1
+            for n in names: self._inbox(n).append((self._seq, msg))
+            callbacks = [(n, self._notify[n]) for n in names if n in self._notify]
+        for n, fn in callbacks: fn(n)   # 在锁外回调，收件人可以直接读收件箱
+
+    # ---------------- 收件箱 ----------------
+    def _inbox(self, name):
+        box = self._inboxes.get(name)
+        if box is None: box = self._inboxes[name] = deque(maxlen=self.capacity)
+        return box
+
+    def inbox(self, name):
+        with self.lock: return [m for _, m in self._inboxes.get(name, ())]
+
+    def read(self, name):
+        """(消息列表, 最后一条的序号)；序号交给 consume，收件箱为空时为 0"""
+        with self.lock:
+            box = self._inboxes.get(name)
+            return ([m for _, m in box], box[-1][0]) if box else ([], 0)
+
+    def consume(self, name, upto):
+        """丢掉序号 <= upto 的消息 (已经读过的)，读的期间新到的消息保留"""
+        with self.lock:
+            box = self._inboxes.get(name)
+            while box and box[0][0] <= upto: box.popleft()
+
+    def replace(self, name, msgs):
+        with self.lock:
+            box = self._inbox(name); box.clear()
+            for m in msgs:
+                self._seq += 1; box.append((self._seq, m))
+
+message_bus = MessageBus()
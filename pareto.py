@@ -0,0 +1,127 @@
+import os
+import csv
+import json
+import glob
+import argparse
+from config import *
+
+# ==============================================================================
+# 📊 Pareto 前沿分析 (舒适度 vs 电费)
+# 扫描每日运行汇总 (CSV_LOG_FILE)，增量维护非支配解集合：
+# 每个文件只读新追加的字节，历史结果不重复加载
+# ==============================================================================
+
+def dominates(a, b, objectives):
+    """a 在所有目标上都不差于 b，且至少一个目标严格更好 (全部为最小化)"""
+    better = False
+    for k in objectives:
+        if a[k] > b[k]: return False
+        if a[k] < b[k]: better = True
+    return better
+
+class ParetoFrontier:
+    def __init__(self, objectives=PARETO_OBJECTIVES):
+        self.objectives = tuple(objectives)
+        self.points = []
+
+    def add(self, rec):
+        """插入一条结果，返回它是否进入前沿 (O(前沿大小))"""
+        for p in self.points:
+            if dominates(p, rec, self.objectives) or all(p[k] == rec[k] for k in self.objectives):
+                return False
+        self.points = [p for p in self.points if not dominates(rec, p, self.objectives)]
+        self.points.append(rec)
+        return True
+
+    def sorted_points(self):
+        return sorted(self.points, key=lambda p: tuple(p[k] for k in self.objectives))
+
+class RunLogScanner:
+    """记住每个文件读到的字节偏移，下次只解析新追加的完整行"""
+    def __init__(self, state_file=PARETO_STATE_FILE, objectives=PARETO_OBJECTIVES):
+        self.state_file = state_file
+        self.offsets = {}
+        self.headers = {}
+        self.rows_seen = 0
+        self.frontier = ParetoFrontier(objectives)
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f: st = json.load(f)
+                if tuple(st.get("objectives", ())) == self.frontier.objectives:
+                    self.offsets = st["offsets"]; self.headers = st["headers"]
+                    self.rows_seen = st["rows_seen"]; self.frontier.points = st["frontier"]
+            except Exception as e:
+                print(f"Pareto state ignored: {e}")
+
+    def scan(self, paths):
+        new_rows = 0
+        for path in paths:
+            try: size = os.path.getsize(path)
+            except OSError: continue
+            offset = self.offsets.get(path, 0)
+            if size < offset: offset = 0; self.headers.pop(path, None)  # 文件被重写，从头开始
+            if size == offset: continue
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+            end = chunk.rfind(b"\n") + 1   # 只消费完整的行，写了一半的留到下次
+            if end == 0: continue
+            lines = chunk[:end].decode('utf-8').splitlines()
+            if path not in self.headers:
+                self.headers[path] = next(csv.reader([lines[0]])); lines = lines[1:]
+            header = self.headers[path]
+            for values in csv.reader(lines):
+                if not values: continue
+                rec = self._parse(dict(zip(header, values)))
+                if rec is None: continue
+                self.frontier.add(rec)
+                new_rows += 1
+            self.offsets[path] = offset + end
+        self.rows_seen += new_rows
+        return new_rows
+
+    def _parse(self, row):
+        rec = dict(row)
+        try:
+            for k in self.frontier.objectives: rec[k] = float(row[k])
+        except (KeyError, ValueError):
+            return None
+        return rec
+
+    def save(self):
+        if not self.state_file: return
+        st = {"objectives": list(self.frontier.objectives), "offsets": self.offsets, "headers": self.headers,
+              "rows_seen": self.rows_seen, "frontier": self.frontier.points}
+        tmp = self.state_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(st, f, ensure_ascii=False)
+        os.replace(tmp, self.state_file)
+
+def export_frontier(frontier, path):
+    points = frontier.sorted_points()
+    cols = []
+    for p in points:
+        for k in p:
+            if k not in cols: cols.append(k)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        w = csv.DictWriter(f, fieldnames=cols)
+        w.writeheader()
+        w.writerows(points)
+    return len(points)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pareto frontier over daily run summaries")
+    parser.add_argument("paths", nargs="*", default=[CSV_LOG_FILE], help="汇总 CSV (支持通配符)")
+    parser.add_argument("--out", default=PARETO_FRONTIER_FILE)
+    parser.add_argument("--state", default=PARETO_STATE_FILE, help="增量状态文件 ('' 表示每次全量)")
+    parser.add_argument("--objectives", default=",".join(PARETO_OBJECTIVES))
+    args = parser.parse_args()
+
+    paths = sorted({p for pat in args.paths for p in (glob.glob(pat) or [pat])})
+    scanner = RunLogScanner(args.state, tuple(args.objectives.split(",")))
+    new_rows = scanner.scan(paths)
+    scanner.save()
+    n = export_frontier(scanner.frontier, args.out)
+    print(f"📊 {new_rows} new results ({scanner.rows_seen} total) -> {n} Pareto-optimal rows in {args.out}")
+
+if __name__ == "__main__":
+    main()
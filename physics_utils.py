@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 def calculate_fanger_pmv(ta, tr, vel, rh, met, clo):
     """
@@ -115,6 +116,48 @@ def calculate_fanger_pmv(ta, tr, vel, rh, met, clo):
     # 强力钳制 (Fanger模型只在 -3 到 +3 有效)
     return max(-3.0, min(3.0, pmv))
 
+def calculate_fanger_pmv_batch(ta, tr, vel, rh, met, clo, clip=True):
+    """
+    calculate_fanger_pmv 的 NumPy 向量化版本 (参数可为数组或标量，按元素广播)
+    迭代与收敛判据与标量版一致，已收敛的元素不再更新
+    clip=False 时不钳制到 ±3 (优化器需要在极冷/极热区间仍有梯度)
+    """
+    ta, tr, vel, rh, met, clo = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (ta, tr, vel, rh, met, clo)))
+    valid = (ta >= -50) & (ta <= 100)
+    rh = np.clip(rh, 0, 100)
+
+    pa = rh * 10 * np.exp(16.6536 - 4030.183 / (ta + 235))
+    icl = 0.155 * clo
+    m = met * 58.15
+    mw = m
+    fcl = np.where(icl <= 0.078, 1.0 + 1.29 * icl, 1.05 + 0.645 * icl)
+    tra = tr + 273
+    h_cf = 12.1 * np.sqrt(vel)
+    t_skin = 35.7 - 0.028 * mw
+
+    t_cl = ta + (35.5 - ta) / (3.5 * icl + 0.1)
+    h_c = h_cf.copy()
+    active = np.ones(ta.shape, dtype=bool)
+    for _ in range(100):
+        h_c_i = np.maximum(h_cf, 2.38 * np.abs(t_cl - ta)**0.25)
+        rad_loss = 3.96 * 10**(-8) * fcl * ((t_cl + 273)**4 - tra**4)
+        conv_loss = fcl * h_c_i * (t_cl - ta)
+        t_cl_new = t_skin - icl * (rad_loss + conv_loss)
+
+        h_c = np.where(active, h_c_i, h_c)
+        done = active & (np.abs(t_cl_new - t_cl) < 0.001)
+        t_cl = np.where(done, t_cl_new, np.where(active, (t_cl + t_cl_new) / 2, t_cl))
+        active &= ~done
+        if not active.any(): break
+
+    rad_loss = 3.96 * 10**(-8) * fcl * ((t_cl + 273)**4 - tra**4)
+    conv_loss = fcl * h_c * (t_cl - ta)
+    load_err = (mw - 3.05 * 0.001 * (5733 - 6.99 * mw - pa) - 0.42 * (mw - 58.15)
+                - 1.7 * 10**(-5) * m * (5867 - pa) - 0.0014 * m * (34 - ta) - rad_loss - conv_loss)
+    pmv = (0.303 * np.exp(-0.036 * m) + 0.028) * load_err
+    if clip: pmv = np.clip(pmv, -3.0, 3.0)
+    return np.where(valid, pmv, 0.0)
+
 def pmv_to_comfort_score(pmv):
     """
     将 PMV (-3 到 +3) 转换为 0-1 的舒适度分数
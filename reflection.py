@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from config import *
+from lesson_index import situation_tokens, tokenize
+import simulation
+
+# ==============================================================================
+# 🌙 日终反思流水线
+# 1. 全家共用的当日分析 (最贵时段 / 最不舒适时段 / 浪费 / 反事实推演) 只算一次
+# 2. 每个角色的 LLM 反思并发提交，受全局 deadline 约束
+# 3. deadline 到了就放行下一天；没回来的继续跑，回来后照常写入记忆并生效
+# ==============================================================================
+
+def summarize_day(total_bill, avg_discomfort, waste_report, hourly_logs, day=None, waste_cost=None):
+    expensive_hours = sorted(hourly_logs, key=lambda x: x['cost'], reverse=True)
+    max_cost_hour = expensive_hours[0] if expensive_hours else {'hour': 12, 'cost': 0}
+    
+    uncomfortable_hours = sorted(hourly_logs, key=lambda x: abs(x['avg_pmv']), reverse=True)
+    max_discomfort_hour = uncomfortable_hours[0] if uncomfortable_hours else {'hour': 12, 'avg_pmv': 0}
+    
+    cost_issue = f"High Cost at {max_cost_hour['hour']}:00 (${max_cost_hour['cost']:.2f})."
+    
+    pmv_val = max_discomfort_hour['avg_pmv']
+    sensation = "Neutral"
+    if pmv_val > 1.5: sensation = "TOO HOT"
+    elif pmv_val < -1.5: sensation = "TOO COLD"
+    comfort_issue = f"Worst Comfort at {max_discomfort_hour['hour']}:00 ({sensation}, PMV={pmv_val:.1f})."
+
+    out_temps = [x['out_temp'] for x in hourly_logs if 'out_temp' in x]
+    day_meta = {
+        "waste": sum(waste_report.values()), "worst_pmv": pmv_val, "worst_hour": max_discomfort_hour['hour'],
+        "peak_cost_hour": max_cost_hour['hour'],
+        "waste_cost": sum((waste_cost or {}).values()),
+        "out_temp": sum(out_temps) / len(out_temps) if out_temps else None,
+    }
+
+    # 🔥🔥🔥 WASTE ANALYSIS & PENALTY CALCULATION 🔥🔥🔥
+    total_waste_score = sum(waste_report.values())
+    if total_waste_score > WASTE_PENALTY_HOURS: # 只有当空房间开空调的总时长超过阈值才触发严重惩罚
+        waste_rooms = [r for r, s in waste_report.items() if s > WASTE_ROOM_HOURS]
+        waste_str = ", ".join(waste_rooms)
+        waste_money = ", ".join(f"{r} ${c:.2f}" for r, c in (waste_cost or {}).items() if c > 0) or "n/a"
+        waste_penalty_section = f"""
+####################################################################
+[⚠️ CRITICAL WASTE PENALTY ⚠️]
+VIOLATION DETECTED: Air Conditioners were left running in EMPTY rooms!
+Locations: {waste_str}
+Money Spent Heating/Cooling Empty Rooms: {waste_money}
+Result: A HUGE 'Virtual Fine' has been applied to your conscience.
+CAUSE: You left the room without turning off the AC.
+####################################################################
+"""
+    else:
+        waste_penalty_section = "[Waste Check] Good job. No empty rooms were cooled unnecessarily."
+
+    # 动态调整反思逻辑中的权重影响
+    w = COMFORT_VS_COST_WEIGHT
+    weight_guide = ""
+    if w >= 0.8:
+        weight_guide = "Since Weight > 0.8, IGNORE Cost issues unless we are totally bankrupt. FOCUS ON COMFORT."
+    elif w <= 0.2:
+        weight_guide = "Since Weight < 0.2, IGNORE Comfort issues. FOCUS ON SAVING MONEY."
+
+    # 反事实推演：从最贵的时段分叉，并行重放几种不同的空调日程
+    cf_engine = simulation.cf_engine
+    try:
+        from_hour, candidates = cf_engine.propose(hourly_logs)
+        what_ifs = cf_engine.what_if(hourly_logs, from_hour, candidates, timeout=COUNTERFACTUAL_TIMEOUT) if candidates else []
+    except Exception as e:
+        print(f"Counterfactual Error: {e}")
+        what_ifs = []
+
+    return {
+        "day": day, "total_bill": total_bill, "avg_discomfort": avg_discomfort,
+        "cost_issue": cost_issue, "comfort_issue": comfort_issue,
+        "waste_penalty_section": waste_penalty_section, "weight_guide": weight_guide,
+        "what_ifs": what_ifs, "counterfactual_section": cf_engine.describe(what_ifs),
+        "meta": day_meta,
+        "lesson_query": situation_tokens(bill=total_bill, pmv=pmv_val, waste=total_waste_score > WASTE_PENALTY_HOURS,
+                                         out_temp=day_meta["out_temp"], hour=max_discomfort_hour['hour'])
+                        + tokenize(f"{cost_issue} {comfort_issue} {sensation}"),
+    }
+
+class ReflectionPipeline:
+    def __init__(self, max_workers=REFLECTION_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reflect")
+        self.pending = []   # 超过 deadline 仍在运行的 future
+
+    def run(self, brains, summary, deadline=REFLECTION_DEADLINE):
+        """并发反思，最多等待 deadline 秒；返回 (按时完成数, 仍在运行数)"""
+        t0 = time.perf_counter()
+        futures = {self.executor.submit(b.reflect_and_plan, summary): b.name for b in brains}
+        done, not_done = wait(futures, timeout=deadline)
+        for f in done:
+            if f.exception() is not None: print(f"Reflection Error ({futures[f]}): {f.exception()}")
+        self.pending = [f for f in self.pending if not f.done()] + list(not_done)
+        if not_done:
+            late = ", ".join(futures[f] for f in not_done)
+            print(f"⏱️ Reflection deadline ({deadline:.1f}s) hit, continuing without: {late}")
+        print(f"🧠 {len(done)}/{len(futures)} reflections applied in {time.perf_counter() - t0:.1f}s")
+        return len(done), len(not_done)
+
+reflection_pipeline = ReflectionPipeline()
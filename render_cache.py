@@ -0,0 +1,77 @@
+import pygame
+from collections import OrderedDict
+from config import *
+
+# ==============================================================================
+# 🖋️ 文字渲染缓存 (HUD / 标签 / 气泡)
+# font.render 每帧重复调用代价很高，这里按 (font, text, color) 缓存渲染结果
+# ==============================================================================
+
+_FONT_CACHE = {}
+
+def get_font(name="arial", size=16, bold=False, italic=False):
+    """SysFont 查找很慢 (会扫描系统字体)，同一参数只创建一次"""
+    key = (name, size, bold, italic)
+    font = _FONT_CACHE.get(key)
+    if font is None:
+        font = pygame.font.SysFont(name, size, bold=bold, italic=italic)
+        _FONT_CACHE[key] = font
+    return font
+
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self._surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        # key 中直接持有 font 对象，避免 id() 被回收后复用导致串字
+        key = (font, text, tuple(color), antialias)
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self._surfaces[key] = surf
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._surfaces.clear()
+
+text_cache = TextCache()
+
+def wrap_text(font, text, max_width):
+    """按空格分词自动换行 (只在文字变化时调用)"""
+    lines = []
+    current_line = ""
+    for word in text.split(' '):
+        test_line = current_line + word + " "
+        if font.size(test_line)[0] < max_width:
+            current_line = test_line
+        else:
+            lines.append(current_line)
+            current_line = word + " "
+    if current_line: lines.append(current_line)
+    return lines
+
+def build_bubble(font, text, max_width=180):
+    """生成半透明对话气泡 Surface"""
+    lines = wrap_text(font, text, max_width)
+    line_height = font.get_linesize()
+    bubble_width = max((font.size(line)[0] for line in lines), default=0) + 20 # 左右留白
+    bubble_height = len(lines) * line_height + 16 # 上下留白
+
+    bubble_surf = pygame.Surface((bubble_width, bubble_height), pygame.SRCALPHA)
+    bubble_surf.fill((255, 255, 240, 220))
+    pygame.draw.rect(bubble_surf, (50, 50, 50), bubble_surf.get_rect(), 1, border_radius=6)
+
+    text_y = 8
+    for line in lines:
+        bubble_surf.blit(font.render(line, True, BLACK), (10, text_y))
+        text_y += line_height
+    return bubble_surf
@@ -0,0 +1,118 @@
+import os
+import time
+import numpy as np
+from config import *
+from thermal_model import ThermalModel, occupant_met_clo
+from physics_utils import calculate_fanger_pmv_batch
+from tariff import tariff
+
+# ==============================================================================
+# 🧮 MPC 空调日程优化器 ([Optimize_AC])
+# 在热力学代理模型上做动态规划：状态 = 室温网格，决策 = 每小时的 setpoint，
+# 目标 = 电费 + 权重 × 有人房间的 |PMV|。各房间在代理模型中互不耦合，
+# 所有房间、网格点、候选 setpoint 一次性向量化计算
+# ==============================================================================
+
+_forecast_cache = {}
+
+def load_weather_forecast(path=WEATHER_FILE, month=RUN_MONTH, day=RUN_DAY):
+    """从 EPW 读取仿真当天 24 小时的室外干球温度；文件缺失或格式异常时返回 None"""
+    key = (path, month, day)
+    if key in _forecast_cache: return _forecast_cache[key]
+    temps = None
+    if os.path.exists(path):
+        try:
+            temps = [None] * 24
+            with open(path, encoding="latin-1") as f:
+                for line in f.readlines()[8:]:   # EPW 前 8 行为文件头
+                    fields = line.split(",")
+                    if int(fields[1]) == month and int(fields[2]) == day:
+                        temps[int(fields[3]) - 1] = float(fields[6])   # EPW 小时为 1-24
+            if any(t is None for t in temps): temps = None
+        except Exception as e:
+            print(f"Weather forecast error: {e}")
+            temps = None
+    _forecast_cache[key] = temps
+    return temps
+
+class SetpointOptimizer:
+    def __init__(self, model=None, setpoints=MPC_SETPOINTS, grid=MPC_TEMP_GRID):
+        self.model = model or ThermalModel()
+        self.rooms = self.model.rooms
+        self.actions = np.array(setpoints, dtype=float)
+        lo, hi, step = grid
+        self.grid = np.arange(lo, hi + step / 2, step)
+        self.sub_steps = max(1, int(round(3600.0 / THERMAL_DT)))
+
+    def _hour_tables(self, hour, out_temp, price, occupied, discomfort_cost):
+        """从每个网格温度出发、执行每个候选 setpoint 一小时：返回 (末温, 阶段代价)，形状 (网格, 候选, 房间)"""
+        n_z = len(self.rooms)
+        temps = np.broadcast_to(self.grid[:, None, None], (len(self.grid), len(self.actions), n_z))
+        sp = np.broadcast_to(self.actions[None, :, None], temps.shape)
+        met, clo = occupant_met_clo(hour)
+        cost = np.zeros(temps.shape)
+        for _ in range(self.sub_steps):
+            temps, kwh = self.model.step(temps, sp, out_temp)
+            pmv = np.abs(calculate_fanger_pmv_batch(temps, temps, 0.1, 50, met, clo, clip=False))
+            cost = cost + kwh * price + discomfort_cost * occupied * pmv / self.sub_steps
+        return temps, cost
+
+    def optimize(self, temps, start_hour, out_temp=0.0, out_temps=None, weight=COMFORT_VS_COST_WEIGHT,
+                 occupancy_plan=OCCUPANCY_PLAN, prices=None, occupied_now=None):
+        """计算从 start_hour 到当天结束的逐房间 setpoint 日程
+        out_temps / prices 为长度 24 的逐小时序列 (缺省取 EPW 预报 / 电价引擎的整点电价，
+        没有 EPW 时假定室外温度保持当前的 out_temp)；occupied_now 为当前小时的实际占用 (覆盖作息表)"""
+        t0 = time.perf_counter()
+        start_hour = int(start_hour) % 24
+        hours = list(range(start_hour, 24))
+        if out_temps is None: out_temps = load_weather_forecast() or [out_temp] * 24
+        if prices is None: prices = tariff.hourly()
+        discomfort_cost = weight * MPC_DISCOMFORT_COST
+
+        def occupied(h):
+            if h == start_hour and occupied_now is not None:
+                return np.array([1.0 if occupied_now.get(r) else 0.0 for r in self.rooms])
+            return np.array([1.0 if h in occupancy_plan.get(r, ()) else 0.0 for r in self.rooms])
+
+        # 1. 逆向递推：value[g, z] = 从该小时起、房间 z 处于网格温度 g 时的最小剩余代价
+        tables = [self._hour_tables(h, out_temps[h], prices[h], occupied(h), discomfort_cost) for h in hours]
+        value = np.zeros((len(self.grid), len(self.rooms)))
+        q_tables = [None] * len(hours)
+        for i in range(len(hours) - 1, -1, -1):
+            next_t, stage = tables[i]
+            future = np.stack([np.interp(next_t[..., z], self.grid, value[:, z]) for z in range(len(self.rooms))], axis=-1)
+            q_tables[i] = stage + future
+            value = q_tables[i].min(axis=1)
+
+        # 2. 从真实室温正向展开：每小时在 Q 表中插值取最优 setpoint，并用代理模型推进
+        cur = np.array([temps.get(r, 20.0) for r in self.rooms], dtype=float)
+        schedule = {r: {} for r in self.rooms}
+        cost = 0.0; discomfort = 0.0
+        for i, h in enumerate(hours):
+            q = np.stack([[np.interp(cur[z], self.grid, q_tables[i][:, a, z]) for a in range(len(self.actions))]
+                          for z in range(len(self.rooms))])
+            sp = self.actions[q.argmin(axis=1)]
+            for z, r in enumerate(self.rooms): schedule[r][h] = float(sp[z])
+            met, clo = occupant_met_clo(h); occ = occupied(h)
+            for _ in range(self.sub_steps):
+                cur, kwh = self.model.step(cur, sp, out_temps[h])
+                cost += float(kwh.sum()) * prices[h]
+                discomfort += float((occ * np.abs(calculate_fanger_pmv_batch(cur, cur, 0.1, 50, met, clo, clip=False))).sum()) / self.sub_steps
+        return {"schedule": schedule, "start_hour": start_hour, "cost": cost, "discomfort": discomfort,
+                "elapsed": time.perf_counter() - t0}
+
+    def describe(self, plan):
+        """把日程压缩成一行一房间的区段描述，例如 LivingRoom: 7-10h 22C, 11-15h OFF"""
+        lines = []
+        for r, sched in plan["schedule"].items():
+            segs = []; prev = None
+            for h in sorted(sched):
+                if prev is not None and sched[h] == prev[1] and h == prev[2] + 1:
+                    prev = (prev[0], prev[1], h); segs[-1] = prev
+                else:
+                    prev = (h, sched[h], h); segs.append(prev)
+            lines.append(f"{r}: " + ", ".join(f"{a if a == b else f'{a}-{b}'}h {'OFF' if sp <= HVAC_OFF_SETPOINT else f'{sp:.0f}C'}"
+                                              for a, sp, b in segs))
+        return "\n".join(lines)
+
+setpoint_optimizer = SetpointOptimizer()
@@ -5,15 +5,38 @@ import math
 import multiprocessing
 import threading 
 import ctypes
+import signal
+from concurrent.futures import ProcessPoolExecutor, wait
 from config import *
+from tariff import tariff
+from lazy_init import lazy_singletons
 
 # ==================================================================================
-# 🌡️ 共享内存索引
-# 0: Hour, 1-3: Temp, 4-6: Setpoint, 7: Price, 8: Power, 9: Bill
-# 10-12: Humidity, 13: Outdoor Temp
+# 🌡️ 共享内存布局见 config (SLOT_* 全局槽位，ZONE_* 为逐房间块的起点，房间顺序同 HVAC_ZONES)
 # ==================================================================================
 
-def run_energyplus_process(shared_array, pause_event):
+def replay_setpoints(replay, step, shared_array):
+    """检查点恢复: 第 step 个正式时间步 (从 1 起) 之前发生的 setpoint 改动全部写回共享内存。
+    replay = {"until_step": N, "trace": [(已完成的回调数, 槽位, 值), ...], "pos": 下一条}
+    返回 True 表示仍在重放 (step <= N，调用方应跳过节流；走完第 N 步后由调用方暂停，等主进程放行)"""
+    if replay is None or step > replay["until_step"]: return False
+    trace = replay["trace"]; i = replay.get("pos", 0)
+    while i < len(trace) and trace[i][0] < step:
+        shared_array[trace[i][1]] = trace[i][2]; i += 1
+    replay["pos"] = i
+    return True
+
+def wait_for_agents(replay, shared_array):
+    """锁步: 开始第 k+1 个正式时间步前，等主进程的智能体走完前 k 步对应的物理步数 (重放检查点时不等)"""
+    done = int(shared_array[SLOT_CB_COUNT])
+    if replay is not None and done < replay["until_step"]: return
+    need = done * SIM_STEPS_PER_EPLUS_STEP
+    while shared_array[SLOT_SIM_STEPS] < need: time.sleep(0.001)
+
+def run_energyplus_process(shared_array, pause_event, hold_event=None, ready_event=None, out_dir=EPLUS_OUT_DIR, replay=None):
+    """hold_event 未置位时：照常完成初始化与 warmup，然后停在第一个正式时间步等待放行
+    (用于在日终反思期间预热下一天)；ready_event 在到达第一个正式时间步时置位。
+    replay: 从检查点恢复时，按记录的 setpoint 改动全速重放当天前 N 个时间步 (见 replay_setpoints)"""
     if os.name == 'nt':
         try: os.add_dll_directory(EPLUS_DIR)
         except: pass
@@ -26,8 +49,15 @@ def run_energyplus_process(shared_array, pause_event):
     from pyenergyplus.api import EnergyPlusAPI
     
     api = EnergyPlusAPI()
+    meter = tariff.meter()
     state = api.state_manager.new_state()
     handles = {"init": False}
+    n = N_ZONES
+    step_h = 1.0 / EPLUS_TIMESTEPS_PER_HOUR
+    equipment = [HVAC_EQUIPMENT[z["room"]] for z in HVAC_ZONES]
+    heat_k = [1.0 / 3.6e6 / eq["heat_cop"] for eq in equipment]    # 热量 J -> 电量 kWh
+    cool_k = [1.0 / 3.6e6 / eq["cool_cop"] for eq in equipment]
+    standby_kwh = [eq["standby_w"] / 1000.0 * step_h for eq in equipment]
 
     def generate_robust_idf():
         print("📝 Generating IDF (1 Day)...")
@@ -59,8 +89,8 @@ def run_energyplus_process(shared_array, pause_event):
         idf_str += to_idf_obj("Building", ["GameHouse", "0.0", "Suburbs", ".04", ".4", "FullExterior", "25", "6"])
         idf_str += to_idf_obj("Site:Location", ["Beijing", "39.9", "116.4", "8.0", "31.3"])
         idf_str += to_idf_obj("GlobalGeometryRules", ["UpperLeftCorner", "CounterClockwise", "World"])
-        idf_str += to_idf_obj("Timestep", ["6"]) 
-        idf_str += to_idf_obj("RunPeriod", ["GameRun", "1", "1", "", "1", "1", "", "Monday", "Yes", "Yes", "No", "Yes", "Yes"])
+        idf_str += to_idf_obj("Timestep", [str(EPLUS_TIMESTEPS_PER_HOUR)]) 
+        idf_str += to_idf_obj("RunPeriod", ["GameRun", str(RUN_MONTH), str(RUN_DAY), "", str(RUN_MONTH), str(RUN_DAY), "", RUN_WEEKDAY, "Yes", "Yes", "No", "Yes", "Yes"])
         idf_str += to_idf_obj("Site:GroundTemperature:BuildingSurface", ["5.0"] * 12)
         
         idf_str += to_idf_obj("Material", ["Concrete", "MediumRough", "0.1", "1.0", "2000", "1000", "0.9", "0.7", "0.7"])
@@ -73,141 +103,123 @@ def run_energyplus_process(shared_array, pause_event):
         idf_str += to_idf_obj("ScheduleTypeLimits", ["ControlType", "0", "4", "Discrete"])
         
         idf_str += to_idf_obj("Schedule:Compact", ["AlwaysOn", "ControlType", "Through: 12/31", "For: AllDays", "Until: 24:00", "4"])
-        idf_str += to_idf_obj("Schedule:Compact", ["Living_Heat_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "20.0"])
-        idf_str += to_idf_obj("Schedule:Compact", ["Master_Heat_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "18.0"])
-        idf_str += to_idf_obj("Schedule:Compact", ["Kids_Heat_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "22.0"])
-        idf_str += to_idf_obj("Schedule:Compact", ["Living_Cool_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "26.0"])
-        idf_str += to_idf_obj("Schedule:Compact", ["Master_Cool_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "26.0"])
-        idf_str += to_idf_obj("Schedule:Compact", ["Kids_Cool_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "26.0"])
-        
-        idf_str += to_idf_obj("ThermostatSetpoint:DualSetpoint", ["LivingRoom_Therm", "Living_Heat_Sch", "Living_Cool_Sch"])
-        idf_str += to_idf_obj("ThermostatSetpoint:DualSetpoint", ["MasterRoom_Therm", "Master_Heat_Sch", "Master_Cool_Sch"])
-        idf_str += to_idf_obj("ThermostatSetpoint:DualSetpoint", ["KidsRoom_Therm", "Kids_Heat_Sch", "Kids_Cool_Sch"])
+        for z in HVAC_ZONES:
+            idf_str += to_idf_obj("Schedule:Compact", [f"{z['key']}_Heat_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", f"{z['idf_heat_sp']:.1f}"])
+            idf_str += to_idf_obj("Schedule:Compact", [f"{z['key']}_Cool_Sch", "Temperature", "Through: 12/31", "For: AllDays", "Until: 24:00", "26.0"])
+            idf_str += to_idf_obj("ThermostatSetpoint:DualSetpoint", [f"{z['room']}_Therm", f"{z['key']}_Heat_Sch", f"{z['key']}_Cool_Sch"])
 
-        idf_str += add_room_geometry("LivingRoom", 0, 0, 10, 10, 3, 3000)
-        idf_str += add_room_geometry("MasterRoom", 10, 0, 5, 5, 3, 1500)
-        idf_str += add_room_geometry("KidsRoom", 10, 5, 5, 5, 3, 1500)
+        for z in HVAC_ZONES:
+            idf_str += add_room_geometry(z["room"], *z["geometry"], z["capacity"])
         
         # 显式指定室外温度，且使用 timestep 频率
         idf_str += to_idf_obj("Output:Variable", ["Environment", "Site Outdoor Air Drybulb Temperature", "timestep"])
         
         idf_str += to_idf_obj("Output:Variable", ["*", "Zone Mean Air Temperature", "hourly"])
         idf_str += to_idf_obj("Output:Variable", ["*", "Zone Air Relative Humidity", "hourly"])
-        idf_str += to_idf_obj("Output:Variable", ["*", "Zone Air System Sensible Heating Energy", "hourly"])
-        idf_str += to_idf_obj("Output:Variable", ["*", "Zone Air System Sensible Cooling Energy", "hourly"])
+        # Ideal Loads 送风的总制热 / 制冷量 (含潜热)，逐时间步读取后按设备 COP 折算为电量
+        idf_str += to_idf_obj("Output:Variable", ["*", "Zone Ideal Loads Supply Air Total Heating Energy", "timestep"])
+        idf_str += to_idf_obj("Output:Variable", ["*", "Zone Ideal Loads Supply Air Total Cooling Energy", "timestep"])
         
         with open(IDF_NAME, 'w') as f: f.write(idf_str)
 
+    def resolve_handles():
+        """句柄表只在第一次回调时按 HVAC_ZONES 解析一次，之后每个时间步按数组循环读写"""
+        var = api.exchange.get_variable_handle; act = api.exchange.get_actuator_handle
+        rooms = [z["room"] for z in HVAC_ZONES]; keys = [z["key"] for z in HVAC_ZONES]
+        handles["temp"] = [var(state, "Zone Mean Air Temperature", r) for r in rooms]
+        handles["rh"] = [var(state, "Zone Air Relative Humidity", r) for r in rooms]
+        handles["heat_j"] = [var(state, "Zone Ideal Loads Supply Air Total Heating Energy", f"{r}_HVAC") for r in rooms]
+        handles["cool_j"] = [var(state, "Zone Ideal Loads Supply Air Total Cooling Energy", f"{r}_HVAC") for r in rooms]
+        handles["heat_sp"] = [act(state, "Schedule:Compact", "Schedule Value", f"{k}_Heat_Sch") for k in keys]
+        handles["cool_sp"] = [act(state, "Schedule:Compact", "Schedule Value", f"{k}_Cool_Sch") for k in keys]
+        for name in ("temp", "rh", "heat_j", "cool_j", "heat_sp", "cool_sp"):
+            for room, hd in zip(rooms, handles[name]):
+                if hd == -1: print(f"❌ Error: EnergyPlus handle '{name}' not found for {room}")
+
+        # 搜寻室外温度句柄
+        handles["Outdoor_T"] = var(state, "Site Outdoor Air Drybulb Temperature", "Environment")
+        
+        # 如果没找到 (-1)，尝试备用 Key
+        if handles["Outdoor_T"] == -1:
+            print("❌ Error: Outdoor Temp handle is -1. Dumping available output variables...")
+            handles["Outdoor_T"] = var(state, "Site Outdoor Air Drybulb Temperature", "")
+            if handles["Outdoor_T"] != -1:
+                print("✅ Found Outdoor Temp with empty key!")
+
     def callback(state):
         while not pause_event.is_set(): time.sleep(0.1)
+        t_start = time.perf_counter()
         
         try:
             if not handles["init"]:
-                # ... 句柄获取 ...
-                handles["Living_T"] = api.exchange.get_variable_handle(state, "Zone Mean Air Temperature", "LivingRoom")
-                handles["Master_T"] = api.exchange.get_variable_handle(state, "Zone Mean Air Temperature", "MasterRoom")
-                handles["Kids_T"]   = api.exchange.get_variable_handle(state, "Zone Mean Air Temperature", "KidsRoom")
-                handles["Living_RH"] = api.exchange.get_variable_handle(state, "Zone Air Relative Humidity", "LivingRoom")
-                handles["Master_RH"] = api.exchange.get_variable_handle(state, "Zone Air Relative Humidity", "MasterRoom")
-                handles["Kids_RH"]   = api.exchange.get_variable_handle(state, "Zone Air Relative Humidity", "KidsRoom")
-                handles["Living_Heat_J"] = api.exchange.get_variable_handle(state, "Zone Air System Sensible Heating Energy", "LivingRoom")
-                handles["Living_Cool_J"] = api.exchange.get_variable_handle(state, "Zone Air System Sensible Cooling Energy", "LivingRoom")
-                handles["Master_Heat_J"] = api.exchange.get_variable_handle(state, "Zone Air System Sensible Heating Energy", "MasterRoom")
-                handles["Master_Cool_J"] = api.exchange.get_variable_handle(state, "Zone Air System Sensible Cooling Energy", "MasterRoom")
-                handles["Kids_Heat_J"]   = api.exchange.get_variable_handle(state, "Zone Air System Sensible Heating Energy", "KidsRoom")
-                handles["Kids_Cool_J"]   = api.exchange.get_variable_handle(state, "Zone Air System Sensible Cooling Energy", "KidsRoom")
-                handles["Living_SP"] = api.exchange.get_actuator_handle(state, "Schedule:Compact", "Schedule Value", "Living_Heat_Sch")
-                handles["Master_SP"] = api.exchange.get_actuator_handle(state, "Schedule:Compact", "Schedule Value", "Master_Heat_Sch")
-                handles["Kids_SP"]   = api.exchange.get_actuator_handle(state, "Schedule:Compact", "Schedule Value", "Kids_Heat_Sch")
-                handles["Living_Cool_SP"] = api.exchange.get_actuator_handle(state, "Schedule:Compact", "Schedule Value", "Living_Cool_Sch")
-                handles["Master_Cool_SP"] = api.exchange.get_actuator_handle(state, "Schedule:Compact", "Schedule Value", "Master_Cool_Sch")
-                handles["Kids_Cool_SP"]   = api.exchange.get_actuator_handle(state, "Schedule:Compact", "Schedule Value", "Kids_Cool_Sch")
-
-                # 搜寻室外温度句柄
-                handles["Outdoor_T"] = api.exchange.get_variable_handle(state, "Site Outdoor Air Drybulb Temperature", "Environment")
-                
-                # 如果没找到 (-1)，尝试备用 Key
-                if handles["Outdoor_T"] == -1:
-                    print("❌ Error: Outdoor Temp handle is -1. Dumping available output variables...")
-                    handles["Outdoor_T"] = api.exchange.get_variable_handle(state, "Site Outdoor Air Drybulb Temperature", "")
-                    if handles["Outdoor_T"] != -1:
-                        print("✅ Found Outdoor Temp with empty key!")
-                
+                resolve_handles()
                 handles["init"] = True
-                shared_array[9] = 0.0
+                shared_array[SLOT_BILL] = 0.0
+                shared_array[ZONE_COST:ZONE_COST + n] = [0.0] * n
                 return
 
+            get = api.exchange.get_variable_value
+
             # Warmup Check
             if api.exchange.warmup_flag(state):
-                shared_array[0] = -1.0
+                shared_array[SLOT_HOUR] = -1.0
                 if handles["Outdoor_T"] != -1:
-                    val = api.exchange.get_variable_value(state, handles["Outdoor_T"])
-                    shared_array[13] = val
+                    shared_array[SLOT_OUT_T] = get(state, handles["Outdoor_T"])
                 return
 
-            # Read Data
-            shared_array[1] = api.exchange.get_variable_value(state, handles["Living_T"])
-            shared_array[2] = api.exchange.get_variable_value(state, handles["Master_T"])
-            shared_array[3] = api.exchange.get_variable_value(state, handles["Kids_T"])
-            shared_array[10] = api.exchange.get_variable_value(state, handles["Living_RH"])
-            shared_array[11] = api.exchange.get_variable_value(state, handles["Master_RH"])
-            shared_array[12] = api.exchange.get_variable_value(state, handles["Kids_RH"])
+            # 预热完成：通知主进程，并在放行前停在第一个正式时间步
+            if ready_event is not None and not ready_event.is_set():
+                ready_event.set()
+                if hold_event is not None:
+                    while not hold_event.is_set(): time.sleep(0.05)
+
+            # 与智能体锁步 (EnergyPlus 本身不再节流，节奏由主进程的仿真循环决定)
+            wait_for_agents(replay, shared_array)
+            t_start = time.perf_counter()
+
+            # Read Data: 每类量一次切片写入共享内存 (只取一次锁)
+            shared_array[ZONE_T:ZONE_T + n] = [get(state, hd) for hd in handles["temp"]]
+            shared_array[ZONE_RH:ZONE_RH + n] = [get(state, hd) for hd in handles["rh"]]
             
             # 读取室外温度
             if handles["Outdoor_T"] != -1:
-                out_t = api.exchange.get_variable_value(state, handles["Outdoor_T"])
+                out_t = get(state, handles["Outdoor_T"])
                 if out_t > -99: 
-                    shared_array[13] = out_t
-            
-            h = api.exchange.hour(state); shared_array[0] = float(h)
-
-            # Energy Calc
-            j_tot = 0
-            j_tot += api.exchange.get_variable_value(state, handles["Living_Heat_J"]) + api.exchange.get_variable_value(state, handles["Living_Cool_J"])
-            j_tot += api.exchange.get_variable_value(state, handles["Master_Heat_J"]) + api.exchange.get_variable_value(state, handles["Master_Cool_J"])
-            j_tot += api.exchange.get_variable_value(state, handles["Kids_Heat_J"])   + api.exchange.get_variable_value(state, handles["Kids_Cool_J"])
-            kwh = (j_tot / 3600000.0) / 3.0
-            if kwh == 0:
-                for i in range(3):
-                    if shared_array[4+i] > 0 and abs(shared_array[4+i] - shared_array[1+i]) > 0.5: kwh += 0.2
+                    shared_array[SLOT_OUT_T] = out_t
             
-            # ==============================================================================
-            # 💰 电价计算逻辑 (TOU - Time of Use)
-            # ==============================================================================
-            # Valley (0.30): 23:00-07:00 (Hours: 24, 1, 2, 3, 4, 5, 6, 7)
-            # Flat (0.90):   07:00-10:00, 15:00-18:00, 21:00-23:00 (Hours: 8,9,10, 16,17,18, 22,23)
-            # Peak (1.50):   10:00-15:00, 18:00-21:00 (Hours: 11,12,13,14,15, 19,20,21)
-            # ==============================================================================
-            current_h = int(h)
-            
-            if current_h in [24, 1, 2, 3, 4, 5, 6, 7]:
-                price = 0.30  # Valley
-            elif current_h in [11, 12, 13, 14, 15, 19, 20, 21]:
-                price = 1.50  # Peak (High Penalty!)
-            else:
-                price = 0.90  # Flat (Baseline)
-                
-            shared_array[7] = price
-            shared_array[8] = kwh * 6.0 
-            shared_array[9] += kwh * price
-
-            # Write Control
-            l = shared_array[4] if shared_array[4] > 1 else -60.0
-            m = shared_array[5] if shared_array[5] > 1 else -60.0
-            k = shared_array[6] if shared_array[6] > 1 else -60.0
-            api.exchange.set_actuator_value(state, handles["Living_SP"], l)
-            api.exchange.set_actuator_value(state, handles["Master_SP"], m)
-            api.exchange.set_actuator_value(state, handles["Kids_SP"],   k)
-            api.exchange.set_actuator_value(state, handles["Living_Cool_SP"], l + 4.0 if l > 0 else 100.0)
-            api.exchange.set_actuator_value(state, handles["Master_Cool_SP"], m + 4.0 if m > 0 else 100.0)
-            api.exchange.set_actuator_value(state, handles["Kids_Cool_SP"],   k + 4.0 if k > 0 else 100.0)
-
-            time.sleep(0.8)
+            h = api.exchange.hour(state); shared_array[SLOT_HOUR] = float(h)
+
+            # Energy Calc: 每个房间 热量 J -> 电量 kWh (按设备 COP)，空调开着时另计待机功率
+            setpoints = shared_array[ZONE_SP:ZONE_SP + n]
+            zone_kwh = [max(0.0, get(state, hj)) * hk + max(0.0, get(state, cj)) * ck + (sb if sp > HVAC_OFF_SETPOINT else 0.0)
+                        for hj, cj, hk, ck, sb, sp in zip(handles["heat_j"], handles["cool_j"], heat_k, cool_k, standby_kwh, setpoints)]
+            kwh = sum(zone_kwh)
+
+            step = tariff.step_index(h, api.exchange.zone_time_step_number(state))
+            cost = meter.charge(step, kwh, kwh / step_h)
+            shared_array[SLOT_PRICE] = tariff.prices[step]
+            shared_array[SLOT_POWER] = kwh / step_h
+            shared_array[SLOT_BILL] += cost
+            shared_array[ZONE_KW:ZONE_KW + n] = [e / step_h for e in zone_kwh]                  # 房间功率 kW
+            if kwh > 0:                                                                         # 房间累计电费 (需量/阶梯费用按电量分摊)
+                shared_array[ZONE_COST:ZONE_COST + n] = [c + cost * e / kwh for c, e in zip(shared_array[ZONE_COST:ZONE_COST + n], zone_kwh)]
+
+            # Write Control (恢复检查点时先按记录重放 setpoint)；<= HVAC_OFF_SETPOINT 表示关机，制冷 setpoint = 制热 + 4
+            replaying = replay_setpoints(replay, int(shared_array[SLOT_CB_COUNT]) + 1, shared_array)
+            put = api.exchange.set_actuator_value
+            for hs, cs, sp in zip(handles["heat_sp"], handles["cool_sp"], shared_array[ZONE_SP:ZONE_SP + n]):
+                if sp > HVAC_OFF_SETPOINT: put(state, hs, sp); put(state, cs, sp + 4.0)
+                else: put(state, hs, -60.0); put(state, cs, 100.0)
+
+            # 回调耗时 (不含等待智能体的时间)，主进程的帧分析器读取
+            shared_array[SLOT_CB_MS] = (time.perf_counter() - t_start) * 1000.0
+            shared_array[SLOT_CB_COUNT] += 1
+            if replaying and shared_array[SLOT_CB_COUNT] >= replay["until_step"]: pause_event.clear()   # 重放到检查点，停下等主进程恢复完
         except: pass
 
     generate_robust_idf()
     api.runtime.callback_begin_zone_timestep_after_init_heat_balance(state, callback)
-    api.runtime.run_energyplus(state, ['-w', WEATHER_FILE, '-d', 'out_sim', IDF_NAME])
+    api.runtime.run_energyplus(state, ['-w', WEATHER_FILE, '-d', out_dir, IDF_NAME])
 
 # ... (PMVCalculator, CounterfactualSimulator, SimulationProxy 保持不变) ...
 class PMVCalculator:
@@ -231,46 +243,200 @@ class PMVCalculator:
             return max(-3.0, min(3.0, pmv))
         except: return 0.0
 
+def _replay_schedule(args):
+    """子进程入口：从分叉时刻起，在代理模型上按给定 setpoint 日程重放到当天结束"""
+    from thermal_model import ThermalModel, occupant_met_clo
+    from physics_utils import calculate_fanger_pmv
+    temps0, hours, schedule, out_temps, prices, occupancy = args
+    model = ThermalModel()
+    steps = max(1, int(round(3600.0 / THERMAL_DT)))
+    temps = temps0
+    cost = 0.0; kwh_total = 0.0; pmv_sum = 0.0; n = 0
+    for i, h in enumerate(hours):
+        for _ in range(steps):
+            temps, kwh = model.step(temps, schedule[i], out_temps[i])
+            cost += float(kwh.sum()) * prices[i]; kwh_total += float(kwh.sum())
+        met, clo = occupant_met_clo(h)
+        for r, room in enumerate(model.rooms):
+            if occupancy[i].get(room):
+                pmv_sum += abs(calculate_fanger_pmv(float(temps[r]), float(temps[r]), 0.1, 50, met, clo)); n += 1
+    return {"cost": cost, "kwh": kwh_total, "mean_abs_pmv": pmv_sum / max(1, n), "end_temps": [float(t) for t in temps]}
+
 class CounterfactualSimulator:
+    """反事实推演：在某个小时分叉当天的热状态，用不同的 setpoint 日程并行重放剩余时段，
+    与同一代理模型下的"实际日程"对比，给出电费与 PMV 的差值"""
+    def __init__(self, workers=COUNTERFACTUAL_WORKERS):
+        self.workers = workers
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
     @staticmethod
-    def simulate_what_if(action_data, current_context):
-        real_temp = action_data['temp']
-        out_temp = action_data['out_temp']
-        cost = action_data['cost']
-        hypothetical_temp = real_temp + (out_temp - real_temp) * 0.2
-        hypo_pmv = PMVCalculator.calc_pmv(hypothetical_temp, hypothetical_temp, 0.1, 50, 1.2, 1.2)
-        return {"hypothetical_temp": hypothetical_temp, "hypothetical_pmv": hypo_pmv, "saved_money": cost}
+    def fork(hourly_logs, from_hour):
+        """从小时日志中取出分叉点的初始温度，以及之后每小时的实际 setpoint / 室外温度 / 电价 / 占用"""
+        rows = [x for x in hourly_logs if 'temps' in x and x['hour'] >= from_hour]
+        if not rows: return None
+        rooms = list(THERMAL_ZONE_PARAMS.keys())
+        temps0 = [rows[0]['temps'].get(r, 20.0) for r in rooms]
+        base = {
+            "hours": [x['hour'] for x in rows],
+            "schedule": [[x['setpoints'].get(r, 0.0) for r in rooms] for x in rows],
+            "out_temps": [x.get('out_temp', 0.0) for x in rows],
+            "prices": [x.get('price', 0.9) for x in rows],
+            "occupancy": [x.get('occupied', {}) for x in rows],
+        }
+        return temps0, base
 
-cf_engine = CounterfactualSimulator()
+    @staticmethod
+    def apply_override(base_schedule, hours, overrides):
+        """overrides: {room: ("set", 值) | ("delta", 差值)}，对分叉后所有小时生效"""
+        rooms = list(THERMAL_ZONE_PARAMS.keys())
+        out = []
+        for sp_row in base_schedule:
+            row = list(sp_row)
+            for room, (kind, val) in overrides.items():
+                if room not in rooms: continue
+                i = rooms.index(room)
+                if kind == "set": row[i] = val
+                elif row[i] > HVAC_OFF_SETPOINT: row[i] = row[i] + val
+            out.append(row)
+        return out
+
+    def what_if(self, hourly_logs, from_hour, candidates, timeout=None):
+        """candidates: {label: overrides}；返回按省钱多少排序的结果列表
+        timeout 是整批推演的总上限 (不是每个候选各等一次)，到点还没算完的候选直接丢弃"""
+        forked = self.fork(hourly_logs, from_hour)
+        if forked is None: return []
+        temps0, base = forked
+        def job(schedule):
+            return (temps0, base["hours"], schedule, base["out_temps"], base["prices"], base["occupancy"])
+        pool = self._executor()
+        base_f = pool.submit(_replay_schedule, job(base["schedule"]))
+        futs = {label: pool.submit(_replay_schedule, job(self.apply_override(base["schedule"], base["hours"], ov)))
+                for label, ov in candidates.items()}
+        _, not_done = wait([base_f, *futs.values()], timeout=timeout)
+        for f in not_done: f.cancel()
+        if not_done: print(f"⏱️ Counterfactual timeout ({timeout:.1f}s): {len(not_done)} replay(s) dropped")
+        try:
+            if base_f in not_done: raise TimeoutError("baseline replay not finished")
+            baseline = base_f.result()
+        except Exception as e:
+            print(f"Counterfactual baseline failed: {e}")
+            return []
+        results = []
+        for label, f in futs.items():
+            if f in not_done: continue
+            try: r = f.result()
+            except Exception as e:
+                print(f"Counterfactual '{label}' failed: {e}")
+                continue
+            results.append({"label": label, "from_hour": from_hour, "cost": r["cost"], "mean_abs_pmv": r["mean_abs_pmv"],
+                            "cost_delta": r["cost"] - baseline["cost"], "pmv_delta": r["mean_abs_pmv"] - baseline["mean_abs_pmv"]})
+        return sorted(results, key=lambda x: x["cost_delta"])
+
+    @staticmethod
+    def propose(hourly_logs):
+        """根据当天日志生成几条候选：最贵时段起关掉开着的空调 / 整体调低或调高 2°C"""
+        rows = [x for x in hourly_logs if 'setpoints' in x]
+        if not rows: return None, {}
+        peak = max(rows, key=lambda x: x['cost'])
+        cands = {}
+        for room, sp in peak['setpoints'].items():
+            if sp > HVAC_OFF_SETPOINT: cands[f"Turn {room} AC OFF from {peak['hour']}:00"] = {room: ("set", 0.0)}
+        rooms = list(THERMAL_ZONE_PARAMS.keys())
+        cands[f"All ACs 2C lower from {peak['hour']}:00"] = {r: ("delta", -2.0) for r in rooms}
+        cands[f"All ACs 2C higher from {peak['hour']}:00"] = {r: ("delta", 2.0) for r in rooms}
+        return peak['hour'], cands
+
+    def describe(self, results, limit=3):
+        if not results: return "No what-if data."
+        lines = []
+        for r in results[:limit]:
+            money = f"save ${-r['cost_delta']:.2f}" if r['cost_delta'] < 0 else f"cost ${r['cost_delta']:.2f} more"
+            if abs(r['pmv_delta']) < 0.005: comfort = "same comfort"
+            else: comfort = ("less" if r['pmv_delta'] > 0 else "more") + " comfortable"
+            lines.append(f"- {r['label']}: would {money}, {comfort} (|PMV| {r['pmv_delta']:+.2f})")
+        return "\n".join(lines)
+
+def _process_entry(target, *args):
+    """EnergyPlus 子进程入口：恢复默认的 SIGTERM 处理。
+    父进程里 pygame (SDL) 会接管 SIGTERM，fork 出来的子进程继承后 terminate() 杀不掉它"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target(*args)
 
 class SimulationProxy:
     def __init__(self):
         self.shared_array = None; self.p = None; self.lock = threading.Lock() 
         self.pause_event = None
+        self.hold_event = None; self.ready_event = None
+        self.standby = None     # 反思期间预热好的下一天 (shared_array, pause, hold, ready, process)
+        self.ac_plan = {}       # [Optimize_AC] 生成的日程 {room: {hour: setpoint}}
+        self.setpoint_trace = []  # 当天所有 setpoint 改动 (已完成的回调数, 槽位, 值)，检查点据此重放 EnergyPlus
+        self.replay_until = 0     # 正在重放到第几个时间步 (0 = 未重放)
+        self.setpoint_listeners = []  # fn(房间, 值)，setpoint 被改写时调用 (如 waste_tracker)
+        self.run_count = 0
     @property
-    def current_hour(self): return int(self.shared_array[0]) if self.shared_array else 0
+    def current_hour(self): return int(self.shared_array[SLOT_HOUR]) if self.shared_array else 0
     @property
     def zone_data(self):
-        if not self.shared_array: return {"LivingRoom":(20,50), "MasterRoom":(20,50), "KidsRoom":(20,50)}
-        return {
-            "LivingRoom": (self.shared_array[1], self.shared_array[10]),
-            "MasterRoom": (self.shared_array[2], self.shared_array[11]),
-            "KidsRoom":   (self.shared_array[3], self.shared_array[12])
-        }
+        """{房间: (室温, 湿度)}"""
+        if not self.shared_array: return {room: (20, 50) for room, _ in HVAC_ZONE_KEYS}
+        temps = self.shared_array[ZONE_T:ZONE_T + N_ZONES]; rhs = self.shared_array[ZONE_RH:ZONE_RH + N_ZONES]
+        return {room: (temps[i], rhs[i]) for i, (room, _) in enumerate(HVAC_ZONE_KEYS)}
     @property
     def energy_data(self):
         if not self.shared_array: return (0.1, 0.0, 0.0, 0.0)
-        return (self.shared_array[7], self.shared_array[8], self.shared_array[9], self.shared_array[13])
+        a = self.shared_array
+        return (a[SLOT_PRICE], a[SLOT_POWER], a[SLOT_BILL], a[SLOT_OUT_T])
+    @property
+    def callback_stats(self):
+        """(最近一次 EnergyPlus 回调耗时 ms, 回调次数)"""
+        if not self.shared_array: return (0.0, 0)
+        return (self.shared_array[SLOT_CB_MS], int(self.shared_array[SLOT_CB_COUNT]))
+    @property
+    def zone_power(self):
+        """各房间空调当前功率 kW"""
+        if not self.shared_array: return {room: 0.0 for room, _ in HVAC_ZONE_KEYS}
+        return dict(zip(ZONE_INDEX, self.shared_array[ZONE_KW:ZONE_KW + N_ZONES]))
+    @property
+    def zone_cost(self):
+        """各房间当天累计电费"""
+        if not self.shared_array: return {room: 0.0 for room, _ in HVAC_ZONE_KEYS}
+        return dict(zip(ZONE_INDEX, self.shared_array[ZONE_COST:ZONE_COST + N_ZONES]))
     
+    def step_budget(self, sim_steps):
+        """锁步: 智能体在 EnergyPlus 下一个时间步算完之前还能走的物理步数 (没有 EnergyPlus 时为 None = 不限)
+        EnergyPlus 跑完退出后，已算完的最后一个时间步对应的步数仍要走完"""
+        if not self.shared_array or self.p is None: return None
+        return int(self.shared_array[SLOT_CB_COUNT]) * SIM_STEPS_PER_EPLUS_STEP - sim_steps
+
+    def publish_sim_steps(self, sim_steps):
+        if self.shared_array: self.shared_array[SLOT_SIM_STEPS] = float(sim_steps)
+
     def get_setpoint(self, room):
         if not self.shared_array: return 22.0
-        idx_map = {"LivingRoom": 4, "MasterRoom": 5, "KidsRoom": 6}
-        return self.shared_array[idx_map.get(room, 4)]
+        return self.shared_array[ZONE_SP + ZONE_INDEX.get(room, 0)]
     
-    def set_setpoint(self, room, val):
+    def set_setpoint(self, room, val, keep_plan=False):
+        """手动调节会取消该房间剩余的优化日程 (keep_plan=True 供日程自身执行时使用)"""
+        if not keep_plan: self.ac_plan.pop(room, None)
         if not self.shared_array: return
-        idx_map = {"LivingRoom": 4, "MasterRoom": 5, "KidsRoom": 6}
-        if room in idx_map: self.shared_array[idx_map[room]] = float(val)
+        if room in ZONE_INDEX:
+            slot = ZONE_SP + ZONE_INDEX[room]
+            self.shared_array[slot] = float(val)
+            self.setpoint_trace.append((int(self.shared_array[SLOT_CB_COUNT]), slot, float(val)))
+            for fn in self.setpoint_listeners: fn(room, float(val))
+
+    def install_plan(self, schedule):
+        self.ac_plan = {room: dict(hours) for room, hours in schedule.items()}
+
+    def apply_plan(self, hour):
+        """每到整点由主循环调用，把日程中该小时的 setpoint 写入共享内存"""
+        for room, hours in list(self.ac_plan.items()):
+            if hour in hours: self.set_setpoint(room, hours[hour], keep_plan=True)
 
     def pause_time(self):
         if self.pause_event: self.pause_event.clear()
@@ -278,24 +444,70 @@ class SimulationProxy:
     def resume_time(self):
         if self.pause_event: self.pause_event.set()
 
-    def start(self):
-        self.shared_array = multiprocessing.Array('d', SHARED_ARRAY_SIZE)
-        self.pause_event = multiprocessing.Event()
-        self.pause_event.set()
-        for i in range(SHARED_ARRAY_SIZE): self.shared_array[i] = 0.0
-        self.shared_array[1]=20.0; self.shared_array[2]=20.0; self.shared_array[3]=20.0
-        self.shared_array[4]=22.0; self.shared_array[5]=20.0; self.shared_array[6]=24.0
-        self.shared_array[7]=0.1
-        self.shared_array[10]=50.0; self.shared_array[11]=50.0; self.shared_array[12]=50.0
-        self.shared_array[13] = -4.0
-        self.p = multiprocessing.Process(target=run_energyplus_process, args=(self.shared_array, self.pause_event))
-        self.p.daemon = True; self.p.start()
+    def _spawn(self, held=False, replay=None):
+        shared_array = multiprocessing.Array('d', SHARED_ARRAY_SIZE)
+        pause_event = multiprocessing.Event(); pause_event.set()
+        hold_event = multiprocessing.Event(); ready_event = multiprocessing.Event()
+        if not held: hold_event.set()
+        for i in range(SHARED_ARRAY_SIZE): shared_array[i] = 0.0
+        shared_array[ZONE_T:ZONE_T + N_ZONES] = [20.0] * N_ZONES
+        shared_array[ZONE_SP:ZONE_SP + N_ZONES] = [z["init_sp"] for z in HVAC_ZONES]
+        shared_array[ZONE_RH:ZONE_RH + N_ZONES] = [50.0] * N_ZONES
+        shared_array[SLOT_PRICE] = 0.1
+        shared_array[SLOT_OUT_T] = -4.0
+        # 新旧两个进程可能同时存在，轮流使用两个输出目录避免文件冲突
+        self.run_count += 1
+        out_dir = f"{EPLUS_OUT_DIR}_{self.run_count % 2}"
+        p = multiprocessing.Process(target=_process_entry, args=(run_energyplus_process, shared_array, pause_event, hold_event, ready_event, out_dir, replay))
+        p.daemon = True; p.start()
+        return shared_array, pause_event, hold_event, ready_event, p
 
-    def restart(self):
+    def _kill_current(self):
         if self.p and self.p.is_alive():
             print("🔄 Killing old EnergyPlus process...")
             self.p.terminate(); self.p.join()
+
+    def start(self, replay=None):
+        """replay: 从检查点恢复 {"until_step": N, "trace": [...]}，EnergyPlus 全速重放到第 N 个时间步"""
+        arr, pause, hold, ready, p = self._spawn(replay=replay)
+        with self.lock:
+            self.shared_array, self.pause_event, self.hold_event, self.ready_event, self.p = arr, pause, hold, ready, p
+            self.setpoint_trace = list(replay["trace"]) if replay else []
+            self.replay_until = replay["until_step"] if replay else 0
+
+    def wait_replay(self, timeout=EPLUS_REPLAY_TIMEOUT):
+        """阻塞到检查点重放完成 (EnergyPlus 停在检查点的下一个时间步前)，然后放行；返回是否按时完成"""
+        deadline = time.time() + timeout
+        ok = True
+        while self.replay_until and self.callback_stats[1] < self.replay_until:
+            if not self.p.is_alive() or time.time() > deadline:
+                print("❌ EnergyPlus replay did not reach the checkpoint")
+                ok = False; break
+            time.sleep(0.01)
+        self.replay_until = 0
+        self.resume_time()
+        return ok
+
+    def prepare_next(self):
+        """后台启动并预热下一天，停在第一个时间步，直到 restart() 放行"""
+        if self.standby is not None: return
+        print("🔥 Warming up next day's EnergyPlus in background...")
+        self.standby = self._spawn(held=True)
+
+    def restart(self):
+        standby, self.standby = self.standby, None
+        self.ac_plan = {}; self.setpoint_trace = []
+        if standby is not None and standby[4].is_alive():
+            self._kill_current()
+            print("🔄 Switching to pre-warmed EnergyPlus...")
+            with self.lock:
+                self.shared_array, self.pause_event, self.hold_event, self.ready_event, self.p = standby
+            self.hold_event.set()
+            return
+        if standby is not None: standby[4].join(timeout=1.0)
+        self._kill_current()
         print("🔄 Restarting EnergyPlus...")
         self.start()
 
-sim_manager = SimulationProxy()
\ No newline at end of file
+# sim_manager / cf_engine 在第一次被访问时才构造
+__getattr__ = lazy_singletons(__name__, {"sim_manager": SimulationProxy, "cf_engine": CounterfactualSimulator})
\ No newline at end of file
@@ -0,0 +1,37 @@
+from config import *
+
+# ==============================================================================
+# 🧭 均匀网格空间哈希
+# 格子边长 cell，每个格子一个 set[下标]；位置变化时只有跨格子才改动两个桶 (O(1))。
+# 半径查询只访问与圆外接正方形相交的格子，返回候选，由调用方用精确距离过滤
+# ==============================================================================
+
+class SpatialHash:
+    def __init__(self, cell=SPATIAL_CELL_SIZE):
+        self.cell = float(cell)
+        self.buckets = {}    # (cx, cy) -> set[下标]
+        self.cell_of = {}    # 下标 -> (cx, cy)
+
+    def _key(self, x, y):
+        return (int(x // self.cell), int(y // self.cell))
+
+    def update(self, i, x, y):
+        key = self._key(x, y)
+        old = self.cell_of.get(i)
+        if old == key: return
+        if old is not None:
+            bucket = self.buckets[old]; bucket.discard(i)
+            if not bucket: del self.buckets[old]
+        self.buckets.setdefault(key, set()).add(i)
+        self.cell_of[i] = key
+
+    def candidates(self, x, y, r):
+        x0, y0 = self._key(x - r, y - r)
+        x1, y1 = self._key(x + r, y + r)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                bucket = self.buckets.get((cx, cy))
+                if bucket: yield from bucket
+
+    def clear(self):
+        self.buckets.clear(); self.cell_of.clear()
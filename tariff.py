@@ -0,0 +1,74 @@
+import numpy as np
+from config import *
+
+# ==============================================================================
+# 💰 电价引擎
+# 仿真开始前把 config.TARIFFS 中的方案 (分时档位 / 工作日与周末 / 季节价格 /
+# 阶梯电量 / 需量电费) 编译成当天逐时间步的电价向量，计费时只做数组查表。
+# 同一个向量也提供给 Agent 的提示词和 MPC 优化器做前瞻
+# ==============================================================================
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+def compile_prices(spec, month=RUN_MONTH, weekday=RUN_WEEKDAY, steps_per_hour=EPLUS_TIMESTEPS_PER_HOUR):
+    """返回长度 24 * steps_per_hour 的电价向量 (第 i 个元素对应第 i // steps_per_hour 小时)"""
+    bands = dict(spec["bands"])
+    for season in spec.get("seasons", []):
+        if month in season["months"]: bands.update(season["bands"])
+
+    day_type = "weekend" if WEEKDAYS.index(weekday) >= 5 else "weekday"
+    hours = spec["hours"].get(day_type) or spec["hours"]["weekday"]
+    hourly = np.full(24, bands[spec["default"]], dtype=float)
+    for band, hs in hours.items():
+        hourly[[h % 24 for h in hs]] = bands[band]
+    return np.repeat(hourly, steps_per_hour)
+
+class BillMeter:
+    """单日计费器：电量电费查表，阶梯加价按当日累计 kWh，需量电费按当日最大功率的增量计入"""
+    def __init__(self, tariff):
+        self.tariff = tariff
+        self.kwh = 0.0
+        self.peak_kw = 0.0
+        self.bill = 0.0
+
+    def charge(self, step, kwh, kw):
+        """计入一个时间步的用电，返回该步新增的费用"""
+        cost = kwh * self.tariff.prices[step]
+        before, self.kwh = self.kwh, self.kwh + kwh
+        for limit, extra in self.tariff.tiers:
+            cost += max(0.0, self.kwh - max(before, limit)) * extra
+        if kw > self.peak_kw:
+            cost += (kw - self.peak_kw) * self.tariff.demand_charge
+            self.peak_kw = kw
+        self.bill += cost
+        return cost
+
+class Tariff:
+    def __init__(self, name=TARIFF_NAME, spec=None, month=RUN_MONTH, weekday=RUN_WEEKDAY,
+                 steps_per_hour=EPLUS_TIMESTEPS_PER_HOUR):
+        spec = spec or TARIFFS[name]
+        self.name = name
+        self.steps_per_hour = steps_per_hour
+        self.prices = compile_prices(spec, month, weekday, steps_per_hour)
+        self.tiers = sorted(spec.get("tiers", []))
+        self.demand_charge = spec.get("demand_charge", 0.0)
+
+    def step_index(self, hour, timestep=1):
+        """EnergyPlus 的 hour (0-23) 与 zone_time_step_number (1-N) -> 电价向量下标"""
+        return min(len(self.prices) - 1, int(hour) * self.steps_per_hour + max(0, int(timestep) - 1))
+
+    def price_at(self, hour):
+        return float(self.prices[self.step_index(hour)])
+
+    def hourly(self):
+        """24 个整点的电价 (优化器的前瞻输入)"""
+        return self.prices[::self.steps_per_hour].tolist()
+
+    def outlook(self, hour, n=4):
+        """提示词用：当前及之后 n 小时的电价"""
+        return " | ".join(f"{(int(hour) + i) % 24}h ${self.price_at((int(hour) + i) % 24):.2f}" for i in range(n + 1))
+
+    def meter(self):
+        return BillMeter(self)
+
+tariff = Tariff()
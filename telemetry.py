@@ -0,0 +1,121 @@
+import os
+import csv
+import time
+import queue
+import threading
+from config import *
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# ==============================================================================
+# 📈 逐步长遥测日志 (列式缓冲 + 后台刷盘)
+# 仿真线程只做 list.append；攒够 TELEMETRY_FLUSH_ROWS 行后整批交给后台线程写盘，
+# 每次运行一个目录 TELEMETRY_DIR/<run_id>/，每天滚动一个文件 (Parquet / Arrow IPC；没有 pyarrow 时退化为 CSV)；
+# 从检查点恢复的那一天另起一个分段文件 day_NNN_from_hHH，不覆盖原运行已写下的数据
+# ==============================================================================
+
+class TelemetryWriter:
+    def __init__(self, out_dir=TELEMETRY_DIR, fmt=TELEMETRY_FORMAT, flush_rows=TELEMETRY_FLUSH_ROWS):
+        self.out_dir = out_dir
+        self.fmt = fmt if pa is not None else "csv"
+        self.flush_rows = flush_rows
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"   # 同一秒内启动的多个进程也不会撞目录
+        self.day = None
+        self._columns = None   # {列名: [值...]}，第一行决定当天的列
+        self._rows = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    # ---------------- 仿真线程侧 (必须便宜) ----------------
+    def start_day(self, day, from_hour=None):
+        """切换到新的一天: 先把旧的一天刷完，再让后台滚动文件
+        from_hour: 从检查点恢复时检查点所在的小时，当天剩余的行写进单独的分段文件"""
+        self.flush()
+        self.day = day
+        self._columns = None
+        self._queue.put(("roll", day, from_hour))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, daemon=True)
+            self._thread.start()
+
+    def record(self, row):
+        if self.day is None: return
+        if self._columns is None:
+            self._columns = {k: [] for k in row}
+        for k, col in self._columns.items():
+            col.append(row.get(k))
+        self._rows += 1
+        if self._rows >= self.flush_rows: self.flush()
+
+    def flush(self):
+        if not self._rows: return
+        batch, self._columns = self._columns, {k: [] for k in self._columns}
+        self._rows = 0
+        self._queue.put(("rows", self.day, batch))
+
+    def close(self):
+        self.flush()
+        if self._thread is not None:
+            self._queue.put(("close", None, None))
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    # ---------------- 后台线程侧 ----------------
+    def _path(self, day, from_hour=None):
+        ext = {"parquet": "parquet", "arrow": "arrow", "csv": "csv"}[self.fmt]
+        part = "" if from_hour is None else f"_from_h{from_hour:02d}"
+        return os.path.join(self.out_dir, self.run_id, f"day_{day:03d}{part}.{ext}")
+
+    def _worker(self):
+        writer = None; fh = None; schema = None; path = None
+        def finish():
+            nonlocal writer, fh, schema
+            if writer is not None and self.fmt != "csv":
+                try: writer.close()
+                except Exception as e: print(f"Telemetry close error: {e}")
+            if fh is not None: fh.close()
+            writer = None; fh = None; schema = None
+
+        while True:
+            kind, day, batch = self._queue.get()
+            if kind == "close":
+                finish(); return
+            if kind == "roll":
+                finish(); path = self._path(day, batch); continue
+            try:
+                if self.fmt == "csv":
+                    if writer is None:
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        fh = open(path, 'w', newline='', encoding='utf-8')
+                        writer = csv.writer(fh); writer.writerow(list(batch.keys()))
+                    writer.writerows(zip(*batch.values()))
+                    fh.flush()
+                    continue
+                table = pa.table(batch)
+                if writer is None:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    schema = table.schema
+                    if self.fmt == "parquet":
+                        writer = pq.ParquetWriter(path, schema)
+                    else:
+                        fh = pa.OSFile(path, 'wb')
+                        writer = pa_ipc.new_file(fh, schema)
+                writer.write_table(table.cast(schema))
+            except Exception as e:
+                print(f"Telemetry write error: {e}")
+
+    def append_day_summary(self, record, path=CSV_LOG_FILE):
+        """每天结束时追加一行汇总 (Pareto 分析的输入)，一天一次，直接同步写"""
+        record = {"run": self.run_id, **record}
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            w = csv.DictWriter(f, fieldnames=list(record))
+            if new_file: w.writeheader()
+            w.writerow(record)
+
+telemetry = TelemetryWriter()
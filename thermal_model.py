@@ -0,0 +1,53 @@
+import numpy as np
+from config import *
+
+# ==============================================================================
+# 🏠 快速热力学代理模型 (每个房间一个一阶 RC 节点)
+#   C dT/dt = UA (T_out - T) + Q_gain + Q_hvac
+# HVAC 与 IDF 中的 IdealLoads 一致：制热到 setpoint，制冷到 setpoint + 4，
+# 功率受容量限制，setpoint <= HVAC_OFF_SETPOINT 表示关机；耗电按 HVAC_EQUIPMENT 的制热 / 制冷 COP 折算，
+# 开机时另计待机功率 (与 EnergyPlus 回调里的计费一致)。用于反事实推演和 MPC 优化
+# ==============================================================================
+
+def occupant_met_clo(hour):
+    """按作息估计室内人员的代谢率 / 服装热阻：夜间睡觉 (盖被子)，白天在家活动"""
+    if hour >= 22 or hour < 6: return 0.7, 1.0
+    return 1.0, 0.5
+
+class ThermalModel:
+    def __init__(self, params=THERMAL_ZONE_PARAMS, equipment=HVAC_EQUIPMENT):
+        self.rooms = list(params.keys())
+        self.ua = np.array([params[r]["ua"] for r in self.rooms], dtype=float)         # W/K
+        self.cap = np.array([params[r]["c"] for r in self.rooms], dtype=float)         # J/K
+        self.hvac_w = np.array([params[r]["hvac_w"] for r in self.rooms], dtype=float) # W
+        self.gain_w = np.array([params[r].get("gain_w", 0.0) for r in self.rooms], dtype=float)
+        self.heat_cop = np.array([equipment[r]["heat_cop"] for r in self.rooms], dtype=float)
+        self.cool_cop = np.array([equipment[r]["cool_cop"] for r in self.rooms], dtype=float)
+        self.standby_w = np.array([equipment[r]["standby_w"] for r in self.rooms], dtype=float)
+
+    def step(self, temps, setpoints, out_temp, dt=THERMAL_DT):
+        """推进 dt 秒；temps / setpoints 为按 self.rooms 排列的数组 (可带前导 batch 维)
+        返回 (新温度, 每个房间的耗电 kWh)"""
+        temps = np.asarray(temps, dtype=float)
+        sp = np.asarray(setpoints, dtype=float)
+        # 自由漂移 (隐式欧拉，dt 较大时也稳定)
+        k = self.ua * dt / self.cap
+        free = (temps + k * out_temp + self.gain_w * dt / self.cap) / (1 + k)
+
+        on = sp > HVAC_OFF_SETPOINT
+        heat_need = np.where(on & (free < sp), (sp - free) * (self.cap + self.ua * dt) / dt, 0.0)
+        cool_need = np.where(on & (free > sp + 4.0), (free - sp - 4.0) * (self.cap + self.ua * dt) / dt, 0.0)
+        q_heat = np.minimum(heat_need, self.hvac_w)
+        q_cool = np.minimum(cool_need, self.hvac_w)
+        new_temps = free + (q_heat - q_cool) * dt / (self.cap + self.ua * dt)
+        kwh = (q_heat / self.heat_cop + q_cool / self.cool_cop + np.where(on, self.standby_w, 0.0)) * dt / 3.6e6
+        return new_temps, kwh
+
+    def simulate(self, temps, schedule, out_temps, dt=THERMAL_DT):
+        """schedule / out_temps 逐步给出 (长度相同)；返回逐步的温度和耗电序列"""
+        temps = np.asarray(temps, dtype=float)
+        t_hist = []; e_hist = []
+        for sp, out in zip(schedule, out_temps):
+            temps, kwh = self.step(temps, sp, out, dt)
+            t_hist.append(temps); e_hist.append(kwh)
+        return np.array(t_hist), np.array(e_hist)
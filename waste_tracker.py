@@ -0,0 +1,92 @@
+import threading
+from config import *
+
+# ==============================================================================
+# 🗑️ 空调浪费追踪 (事件驱动)
+# 只在两类事件发生时更新：房间人数变化 (agent_store) 与 setpoint 改变 (sim_manager)。
+# "空调开着且房间没人" 的每一段都记成精确区间 (EnergyPlus 仿真小时)，
+# 区间内该房间累计电费的增量就是这段浪费的钱；日终报告直接汇总这些区间
+# ==============================================================================
+
+class WasteTracker:
+    def __init__(self, rooms=None):
+        self.rooms = rooms or [room for room, _ in HVAC_ZONE_KEYS]
+        self.lock = threading.Lock()
+        self._clock = lambda: 0.0             # -> 当前仿真小时 (从当天 0 点起)
+        self._costs = lambda: {}              # -> {房间: 当天累计电费}
+        self.start_day({}, {})
+
+    def bind(self, clock, costs):
+        self._clock = clock; self._costs = costs
+
+    def start_day(self, setpoints, occupancy):
+        """setpoints: {房间: 值}，occupancy: {房间: 人数}"""
+        with self.lock:
+            self.ac_on = {r: setpoints.get(r, 0.0) > HVAC_OFF_SETPOINT for r in self.rooms}
+            self.occupied = {r: occupancy.get(r, 0) > 0 for r in self.rooms}
+            self.open = {}           # 房间 -> (开始小时, 开始时的累计电费)
+            self.intervals = []      # [{"room", "start", "end", "cost"}]
+            self._alert = "None"
+            for r in self.rooms: self._update(r)
+
+    # ---------------- 事件 ----------------
+    def on_occupancy(self, room, count):
+        with self.lock:
+            if room not in self.occupied: return
+            occupied = count > 0
+            if occupied == self.occupied[room]: return
+            self.occupied[room] = occupied
+            self._update(room)
+
+    def on_setpoint(self, room, value):
+        with self.lock:
+            if room not in self.ac_on: return
+            on = value > HVAC_OFF_SETPOINT
+            if on == self.ac_on[room]: return
+            self.ac_on[room] = on
+            self._update(room)
+
+    def _update(self, room):
+        wasting = self.ac_on[room] and not self.occupied[room]
+        if wasting and room not in self.open:
+            self.open[room] = (self._clock(), self._costs().get(room, 0.0))
+        elif not wasting and room in self.open:
+            start, cost0 = self.open.pop(room)
+            self.intervals.append({"room": room, "start": start, "end": self._clock(),
+                                   "cost": max(0.0, self._costs().get(room, 0.0) - cost0)})
+        else:
+            return
+        rooms = [r for r in self.rooms if r in self.open]
+        self._alert = " | ".join(f"{r} AC is ON but EMPTY!" for r in rooms) if rooms else "None"
+
+    # ---------------- 查询 ----------------
+    def alert(self):
+        """当前警告字符串 (只在事件发生时重建)"""
+        return self._alert
+
+    def report(self):
+        """({房间: 浪费小时}, {房间: 浪费电费}, 区间列表)，未结束的区间按当前时刻截断"""
+        with self.lock:
+            now = self._clock(); costs = self._costs()
+            intervals = list(self.intervals) + [
+                {"room": r, "start": s, "end": now, "cost": max(0.0, costs.get(r, 0.0) - c0)}
+                for r, (s, c0) in self.open.items()]
+        hours = {r: 0.0 for r in self.rooms}; money = {r: 0.0 for r in self.rooms}
+        for iv in intervals:
+            hours[iv["room"]] += iv["end"] - iv["start"]; money[iv["room"]] += iv["cost"]
+        return hours, money, intervals
+
+    # ---------------- 检查点 ----------------
+    def state(self):
+        with self.lock:
+            return {"ac_on": dict(self.ac_on), "occupied": dict(self.occupied),
+                    "open": dict(self.open), "intervals": list(self.intervals)}
+
+    def load_state(self, st):
+        with self.lock:
+            self.ac_on = dict(st["ac_on"]); self.occupied = dict(st["occupied"])
+            self.open = dict(st["open"]); self.intervals = list(st["intervals"])
+            rooms = [r for r in self.rooms if r in self.open]
+            self._alert = " | ".join(f"{r} AC is ON but EMPTY!" for r in rooms) if rooms else "None"
+
+waste_tracker = WasteTracker()
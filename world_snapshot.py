@@ -0,0 +1,59 @@
+import time
+import threading
+from collections import namedtuple
+
+# ==============================================================================
+# 📸 世界快照 (仿真循环 -> 渲染循环)
+# 仿真循环按自己的 tick 频率发布只读快照，渲染循环取最近两帧做插值，
+# 两边互不阻塞：慢帧不会拖慢仿真，仿真卡顿也不会卡住画面
+# ==============================================================================
+
+AgentSnapshot = namedtuple("AgentSnapshot", [
+    "name", "x", "y", "direction", "frame", "status",
+    "hunger", "energy", "clothing", "comfort", "thought", "show_bubble", "color",
+])
+
+WorldSnapshot = namedtuple("WorldSnapshot", [
+    "tick", "stamp", "day", "mode", "hour",
+    "zones",        # {room: (temp, rh, setpoint)}
+    "price", "power", "bill", "out_temp", "food",
+    "waste_alert", "reflections_ready",
+    "fast_forward", # 夜间快进中 (渲染循环只画进度)
+    "agents",       # tuple[AgentSnapshot]
+])
+
+class SnapshotBuffer:
+    """只保留最近两帧快照，发布/读取都是 O(1) 的引用交换"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prev = None
+        self.curr = None
+
+    def publish(self, snap):
+        with self.lock:
+            self.prev = self.curr if self.curr is not None else snap
+            self.curr = snap
+
+    def latest(self):
+        with self.lock:
+            return self.prev, self.curr
+
+def interpolation_alpha(prev, curr, now=None):
+    """渲染落后一个 tick: 在 prev -> curr 之间按发布时间线性插值"""
+    if prev is None or curr is None or curr.stamp <= prev.stamp: return 1.0
+    now = time.perf_counter() if now is None else now
+    alpha = (now - curr.stamp) / (curr.stamp - prev.stamp)
+    return max(0.0, min(1.0, alpha))
+
+def interpolate_agents(prev, curr, alpha):
+    """返回插值后的 AgentSnapshot 列表 (位置插值，其余字段取最新帧)"""
+    if prev is None or alpha >= 1.0: return list(curr.agents)
+    old = {a.name: a for a in prev.agents}
+    out = []
+    for a in curr.agents:
+        p = old.get(a.name)
+        if p is None:
+            out.append(a)
+            continue
+        out.append(a._replace(x=p.x + (a.x - p.x) * alpha, y=p.y + (a.y - p.y) * alpha))
+    return out